@@ -0,0 +1,21 @@
+"""
+Perfil ASGI: gunicorn administra los procesos y cada uno es un worker de
+uvicorn, que atiende muchas conexiones a la vez (clientes lentos, esperas
+a la base de datos) con un solo proceso.
+
+    gunicorn veterinaria_sistema.asgi:application -c gunicorn_asgi.conf.py
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = 'uvicorn_worker.UvicornWorker'
+workers = int(os.environ.get('WEB_CONCURRENCY', min(4, multiprocessing.cpu_count())))
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+# Bajo ASGI cada petición usa su propio hilo para el ORM, así que las
+# conexiones persistentes no se reutilizan y quedarían abiertas: se cierran
+# al final de cada petición. Para reutilizarlas, use PgBouncer (DB_PGBOUNCER).
+raw_env = [f"DB_CONN_MAX_AGE={os.environ.get('DB_CONN_MAX_AGE', '0')}"]
@@ -0,0 +1,74 @@
+// Autocompletado para los select con data-autocompletar (ver veterinaria/widgets.py).
+// El select solo trae la opción elegida; al escribir en el buscador se
+// piden las coincidencias al servidor y reemplazan las opciones del select.
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('select[data-autocompletar]').forEach(prepararAutocompletar);
+});
+
+function prepararAutocompletar(select) {
+    const minimo = parseInt(select.dataset.minimo || '2', 10);
+    const buscador = document.createElement('input');
+    buscador.type = 'search';
+    buscador.className = 'form-control mb-2';
+    buscador.placeholder = 'Buscar por nombre, propietario o microchip...';
+    buscador.autocomplete = 'off';
+    buscador.setAttribute('aria-label', 'Buscar');
+    select.parentNode.insertBefore(buscador, select);
+
+    let espera = null;
+    let ultimaConsulta = '';
+    let controlador = null;
+
+    function mostrarResultados(resultados) {
+        const elegida = select.options[select.selectedIndex];
+        const vacia = Array.from(select.options).find(opcion => opcion.value === '');
+        select.innerHTML = '';
+        if (vacia) {
+            select.appendChild(vacia);
+        }
+        if (elegida && elegida.value && !resultados.some(r => String(r.id) === elegida.value)) {
+            select.appendChild(elegida);
+        }
+        resultados.forEach(resultado => {
+            select.appendChild(new Option(resultado.texto, resultado.id));
+        });
+        if (elegida && elegida.value) {
+            select.value = elegida.value;
+        } else if (resultados.length) {
+            select.value = String(resultados[0].id);
+        }
+        select.size = Math.min(8, Math.max(2, select.options.length));
+    }
+
+    function buscar() {
+        const texto = buscador.value.trim();
+        if (texto.length < minimo || texto === ultimaConsulta) {
+            return;
+        }
+        ultimaConsulta = texto;
+        if (controlador) {
+            controlador.abort();
+        }
+        controlador = new AbortController();
+        fetch(select.dataset.autocompletar + '?' + new URLSearchParams({q: texto}), {signal: controlador.signal})
+            .then(respuesta => respuesta.json())
+            .then(datos => mostrarResultados(datos.resultados || []))
+            .catch(() => {});
+    }
+
+    buscador.addEventListener('input', function() {
+        clearTimeout(espera);
+        espera = setTimeout(buscar, 250);
+    });
+    buscador.addEventListener('keydown', function(evento) {
+        // Enter no envía el formulario: pasa a la lista de resultados
+        if (evento.key === 'Enter') {
+            evento.preventDefault();
+            select.focus();
+        }
+    });
+    select.addEventListener('change', function() {
+        select.size = 1;
+    });
+}
@@ -5,7 +5,11 @@ from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
 from django.utils.translation import gettext_lazy as _
 from django import forms
-from .models import Categoria, TipoAnimal, Cita, Mascota, Veterinario
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path
+from .models import Categoria, TipoAnimal, Cita, Mascota, MovimientoStock, Veterinario
+from .importacion import importar_productos
 
 # Parchear el validador de username en el modelo User
 def validador_flexible(self):
@@ -126,12 +130,25 @@ admin.site.index_title = "Panel de Administración Veterinaria"
 # Personalizar más textos del admin
 admin.site.empty_value_display = '(Vacío)'
 
+# Formulario para la carga masiva de productos (listas de precios de proveedores)
+class ImportarProductosForm(forms.Form):
+    archivo = forms.FileField(
+        label="Archivo CSV",
+        help_text="Columnas: codigo, nombre, categoria, tipo_producto y opcionalmente descripcion, precio, "
+                  "stock, principio_activo, concentracion, laboratorio, activo. UTF-8, separado por comas o punto y coma."
+    )
+    solo_crear = forms.BooleanField(label="Solo crear (no actualizar códigos existentes)", required=False)
+    simular = forms.BooleanField(label="Simular (validar sin guardar)", required=False)
+
 @admin.register(Categoria)
 class CategoriaAdmin(admin.ModelAdmin):
     """
     Configuración del admin para Categorías.
-    Solo las categorías se gestionan desde el Django Admin.
+    Solo las categorías se gestionan desde el Django Admin; desde aquí
+    también se importan productos en masa (el modelo Producto no se registra).
     """
+    change_list_template = 'admin/veterinaria/categoria/change_list.html'
+
     list_display = ['nombre', 'activo', 'fecha_creacion']
     list_filter = ['activo', 'fecha_creacion']
     search_fields = ['nombre', 'descripcion']
@@ -151,7 +168,49 @@ class CategoriaAdmin(admin.ModelAdmin):
         })
     )
 
-# Nota: El modelo Producto NO se registra aquí
+    def get_urls(self):
+        urls = [
+            path(
+                'importar-productos/',
+                self.admin_site.admin_view(self.importar_productos_view),
+                name='veterinaria_categoria_importar_productos',
+            ),
+        ]
+        return urls + super().get_urls()
+    
+    def importar_productos_view(self, request):
+        """Carga un CSV de productos y muestra el reporte de errores por fila"""
+        if not (request.user.has_perm('veterinaria.add_producto')
+                and request.user.has_perm('veterinaria.change_producto')):
+            raise PermissionDenied
+        resultado = None
+        if request.method == 'POST':
+            form = ImportarProductosForm(request.POST, request.FILES)
+            if form.is_valid():
+                try:
+                    resultado = importar_productos(
+                        form.cleaned_data['archivo'],
+                        actualizar=not form.cleaned_data['solo_crear'],
+                        simular=form.cleaned_data['simular'],
+                    )
+                except UnicodeDecodeError:
+                    form.add_error('archivo', 'El archivo debe estar codificado en UTF-8.')
+                else:
+                    self.message_user(request, resultado.resumen())
+        else:
+            form = ImportarProductosForm()
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Importar productos desde CSV',
+            'opts': self.model._meta,
+            'form': form,
+            'resultado': resultado,
+            # El reporte completo puede ser enorme; se muestran los primeros errores
+            'errores': resultado.errores[:500] if resultado else [],
+        }
+        return TemplateResponse(request, 'admin/veterinaria/categoria/importar_productos.html', context)
+
+# Nota: El modelo Producto NO se registra aquí (se importa en masa desde Categorías)
 
 @admin.register(TipoAnimal)
 class TipoAnimalAdmin(admin.ModelAdmin):
@@ -181,8 +240,9 @@ class CitaAdmin(admin.ModelAdmin):
     Permite gestionar citas con filtros y búsqueda avanzada.
     """
     list_display = ('mascota', 'fecha_hora', 'tipo_cita', 'estado', 'veterinario', 'propietario_mascota')
-    list_filter = ('estado', 'tipo_cita', 'fecha_hora', 'mascota__tipo_animal')
-    search_fields = ('mascota__nombre', 'mascota__propietario_nombre', 'motivo', 'veterinario')
+    list_filter = ('estado', 'tipo_cita', 'veterinario', 'fecha_hora', 'mascota__tipo_animal')
+    search_fields = ('mascota__nombre', 'mascota__propietario_nombre', 'motivo', 'veterinario__nombre')
+    list_select_related = ('mascota', 'veterinario')
     date_hierarchy = 'fecha_hora'
     ordering = ('-fecha_hora',)
     
@@ -230,6 +290,27 @@ class VeterinarioAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         return qs.filter(activo=True) if not request.GET.get('activo__exact') else qs
 
+@admin.register(MovimientoStock)
+class MovimientoStockAdmin(admin.ModelAdmin):
+    """
+    Historial de movimientos de stock, solo de consulta: los movimientos se
+    registran desde inventario.py y nunca se modifican ni eliminan.
+    """
+    list_display = ('fecha', 'producto', 'tipo', 'cantidad', 'cantidad_reservada', 'motivo')
+    list_filter = ('tipo', 'fecha')
+    search_fields = ('producto__codigo', 'producto__nombre', 'motivo')
+    list_select_related = ('producto', 'producto__categoria')
+    date_hierarchy = 'fecha'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 # Nota: El modelo Mascota NO se registra aquí - se gestiona por formularios web
 
 # Personalizar el admin para mostrar texto en español
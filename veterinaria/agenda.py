@@ -0,0 +1,182 @@
+"""
+Agenda de los veterinarios: duración de las citas y detección de choques.
+
+Cada cita guarda su intervalo ``[fecha_hora, fecha_hora_fin)``, calculado
+a partir de la duración de su tipo. Dos citas chocan si son del mismo
+veterinario, ambas están activas y sus intervalos se solapan.
+
+La consulta de choques está acotada por ambos lados sobre el índice
+``(veterinario, fecha_hora, fecha_hora_fin)``: como ninguna cita dura más
+que DURACION_MAXIMA, solo pueden solaparse las que empiezan dentro de
+``(inicio - DURACION_MAXIMA, fin)``. El costo no crece con el tamaño de la
+agenda, y dos veterinarios distintos pueden atender en el mismo horario.
+
+La disponibilidad (horarios libres) se calcula con una sola consulta por
+rango y luego restando en memoria los intervalos ocupados a las jornadas
+de atención definidas en validators.py.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from .models import Cita, Veterinario
+from .referencias import obtener_referencia, obtener_referencias
+from .validators import DIAS_SIN_ATENCION, HORA_APERTURA, HORA_CIERRE
+
+# Duración (minutos) de cada tipo de cita
+DURACION_POR_TIPO = {
+    'consulta_general': 30,
+    'vacunacion': 15,
+    'cirugia': 120,
+    'control': 20,
+    'emergencia': 60,
+    'estetica': 60,
+    'otros': 30,
+}
+
+DURACION_POR_DEFECTO = 30
+
+DURACION_MAXIMA = timedelta(minutes=max(DURACION_POR_TIPO.values()))
+
+# Estados en que la cita ocupa la agenda del veterinario
+ESTADOS_ACTIVOS = ('programada', 'confirmada', 'en_curso')
+
+# Separación entre los horarios sugeridos
+PASO_HORARIOS = timedelta(minutes=15)
+
+# Máximo de días que se puede consultar de una vez
+MAX_DIAS_DISPONIBILIDAD = 14
+
+
+def duracion_para(tipo_cita):
+    """Duración en minutos de un tipo de cita"""
+    return DURACION_POR_TIPO.get(tipo_cita, DURACION_POR_DEFECTO)
+
+
+def asignar_intervalo(cita):
+    """Calcula la duración y la hora de término de la cita según su tipo"""
+    cita.duracion_minutos = duracion_para(cita.tipo_cita)
+    cita.fecha_hora_fin = (
+        cita.fecha_hora + timedelta(minutes=cita.duracion_minutos) if cita.fecha_hora else None
+    )
+
+
+def citas_en_conflicto(veterinario, inicio, fin, excluir_pk=None):
+    """
+    Citas activas del veterinario (registro o id) que se solapan con
+    ``[inicio, fin)``.
+
+    Las citas sin veterinario asignado no ocupan agenda, así que nunca
+    generan conflicto.
+    """
+    if not veterinario:
+        return Cita.objects.none()
+    citas = Cita.objects.filter(
+        veterinario=veterinario,
+        fecha_hora__gt=inicio - DURACION_MAXIMA,
+        fecha_hora__lt=fin,
+        fecha_hora_fin__gt=inicio,
+        estado__in=ESTADOS_ACTIVOS,
+    )
+    if excluir_pk:
+        citas = citas.exclude(pk=excluir_pk)
+    return citas
+
+
+def buscar_conflicto(veterinario, inicio, tipo_cita, excluir_pk=None):
+    """Primera cita que choca con una nueva cita de ese tipo, o None"""
+    fin = inicio + timedelta(minutes=duracion_para(tipo_cita))
+    return citas_en_conflicto(veterinario, inicio, fin, excluir_pk).order_by('fecha_hora').first()
+
+
+def jornadas_atencion(desde, hasta, ahora=None):
+    """
+    Intervalos ``(apertura, cierre)`` de cada día de atención entre las
+    fechas ``desde`` y ``hasta`` (inclusive), sin la parte ya transcurrida.
+    """
+    ahora = ahora or timezone.now()
+    jornadas = []
+    dia = desde
+    while dia <= hasta:
+        if dia.weekday() not in DIAS_SIN_ATENCION:
+            apertura = timezone.make_aware(datetime.combine(dia, time(HORA_APERTURA)))
+            cierre = timezone.make_aware(datetime.combine(dia, time(HORA_CIERRE)))
+            apertura = max(apertura, ahora)
+            if apertura < cierre:
+                jornadas.append((apertura, cierre))
+        dia += timedelta(days=1)
+    return jornadas
+
+
+def restar_intervalos(base, ocupados):
+    """
+    Partes de los intervalos ``base`` que no cubre ningún intervalo de
+    ``ocupados``. ``base`` debe venir ordenado y sin solapes; ``ocupados``
+    puede venir en cualquier orden y solaparse entre sí.
+    """
+    ocupados = sorted(ocupados)
+    libres = []
+    primero = 0
+    for inicio, fin in base:
+        while primero < len(ocupados) and ocupados[primero][1] <= inicio:
+            primero += 1
+        cursor = inicio
+        for ocupado_inicio, ocupado_fin in ocupados[primero:]:
+            if ocupado_inicio >= fin:
+                break
+            if ocupado_inicio > cursor:
+                libres.append((cursor, ocupado_inicio))
+            cursor = max(cursor, ocupado_fin)
+        if cursor < fin:
+            libres.append((cursor, fin))
+    return libres
+
+
+def horarios_en(libres, duracion):
+    """Inicios alineados a PASO_HORARIOS en que cabe una cita de ``duracion``"""
+    paso = int(PASO_HORARIOS.total_seconds())
+    horarios = []
+    for inicio, fin in libres:
+        # Redondear hacia arriba al siguiente múltiplo del paso
+        segundos = inicio.timestamp()
+        candidato = inicio + timedelta(seconds=-segundos % paso)
+        while candidato + duracion <= fin:
+            horarios.append(candidato)
+            candidato += PASO_HORARIOS
+    return horarios
+
+
+def disponibilidad(desde, hasta, veterinario=None, tipo_cita='consulta_general'):
+    """
+    Horarios libres por veterinario entre dos fechas.
+
+    ``veterinario`` es un id; sin él se consideran todos los veterinarios
+    activos. Devuelve un diccionario ``{Veterinario: {'libres': [(inicio,
+    fin)], 'horarios': [inicio]}}`` con los registros de referencias.py.
+    """
+    duracion = timedelta(minutes=duracion_para(tipo_cita))
+    if veterinario:
+        registro = obtener_referencia(Veterinario, veterinario)
+        veterinarios = [registro] if registro else []
+    else:
+        veterinarios = obtener_referencias(Veterinario)
+    jornadas = jornadas_atencion(desde, hasta)
+
+    ocupados = {registro.pk: [] for registro in veterinarios}
+    if jornadas and veterinarios:
+        inicio_rango, fin_rango = jornadas[0][0], jornadas[-1][1]
+        citas = Cita.objects.filter(
+            veterinario__in=list(ocupados),
+            fecha_hora__gt=inicio_rango - DURACION_MAXIMA,
+            fecha_hora__lt=fin_rango,
+            fecha_hora_fin__gt=inicio_rango,
+            estado__in=ESTADOS_ACTIVOS,
+        ).values_list('veterinario_id', 'fecha_hora', 'fecha_hora_fin')
+        for veterinario_id, inicio, fin in citas:
+            ocupados[veterinario_id].append((inicio, fin))
+
+    resultado = {}
+    for registro in veterinarios:
+        libres = restar_intervalos(jornadas, ocupados[registro.pk])
+        resultado[registro] = {'libres': libres, 'horarios': horarios_en(libres, duracion)}
+    return resultado
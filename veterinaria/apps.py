@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class VeterinariaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'veterinaria'
+
+    def ready(self):
+        from . import signals
+        post_migrate.connect(signals.reparar_indices_busqueda, sender=self)
@@ -0,0 +1,304 @@
+"""
+Búsqueda de texto completo sobre productos y citas.
+
+- SQLite (desarrollo): tabla virtual FTS5 con contenido externo, sincronizada
+  con la tabla original mediante triggers.
+- PostgreSQL (producción): columna ``tsvector`` generada con diccionario
+  español e índice GIN, más un índice ``varchar_pattern_ops`` para buscar
+  códigos por prefijo.
+- Otros motores: se mantiene la búsqueda con ``icontains``.
+
+Los índices se crean en la migración 0007 y se verifican después de cada
+``migrate`` (ver ``apps.py``), porque SQLite elimina los triggers cuando
+Django reconstruye una tabla al alterar sus columnas.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+# Términos de búsqueda: letras, números, guiones y guiones bajos (códigos)
+PATRON_TERMINO = re.compile(r'[\w\-]+', re.UNICODE)
+
+# Máximo de términos considerados por búsqueda
+MAX_TERMINOS = 8
+
+# Peso de cada columna en el ranking (bm25 en SQLite, setweight en PostgreSQL)
+PESOS_BM25 = {'A': 10.0, 'B': 5.0, 'C': 1.0}
+
+
+class IndiceTextoCompleto:
+    """
+    Describe el índice de texto completo de una tabla.
+
+    ``columnas`` es una lista de tuplas ``(columna, peso, diccionario)``;
+    el diccionario solo se usa en PostgreSQL ('spanish' aplica stemming,
+    'simple' deja el término intacto, útil para códigos).
+    ``columnas_prefijo`` son columnas que además se buscan por prefijo
+    exacto en mayúsculas (códigos de producto).
+    """
+
+    def __init__(self, tabla, columnas, columnas_prefijo=()):
+        self.tabla = tabla
+        self.columnas = columnas
+        self.columnas_prefijo = columnas_prefijo
+
+    @property
+    def tabla_fts(self):
+        return f'{self.tabla}_fts'
+
+    @property
+    def nombres_columnas(self):
+        return [columna for columna, _peso, _dic in self.columnas]
+
+    # ------------------------------------------------------------------
+    # SQL de creación
+    # ------------------------------------------------------------------
+
+    def sql_sqlite(self):
+        """Sentencias para crear la tabla FTS5 y sus triggers (idempotentes)"""
+        columnas = ', '.join(self.nombres_columnas)
+        nuevas = ', '.join(f'new.{c}' for c in self.nombres_columnas)
+        viejas = ', '.join(f'old.{c}' for c in self.nombres_columnas)
+        fts = self.tabla_fts
+        return [
+            f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {columnas},
+                content='{self.tabla}', content_rowid='id',
+                tokenize="unicode61 remove_diacritics 2 tokenchars '-_'",
+                prefix='2 3'
+            )""",
+            f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {self.tabla} BEGIN
+                INSERT INTO {fts}(rowid, {columnas}) VALUES (new.id, {nuevas});
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {self.tabla} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {columnas}) VALUES ('delete', old.id, {viejas});
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columnas} ON {self.tabla} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {columnas}) VALUES ('delete', old.id, {viejas});
+                INSERT INTO {fts}(rowid, {columnas}) VALUES (new.id, {nuevas});
+            END""",
+        ]
+
+    def sql_postgresql(self):
+        """Sentencias para crear la columna tsvector generada y sus índices"""
+        partes = ' || '.join(
+            f"setweight(to_tsvector('{diccionario}', coalesce({columna}, '')), '{peso}')"
+            for columna, peso, diccionario in self.columnas
+        )
+        sentencias = [
+            f"""ALTER TABLE {self.tabla} ADD COLUMN IF NOT EXISTS busqueda tsvector
+                GENERATED ALWAYS AS ({partes}) STORED""",
+            f"CREATE INDEX IF NOT EXISTS {self.tabla}_busqueda_gin ON {self.tabla} USING gin (busqueda)",
+        ]
+        for columna in self.columnas_prefijo:
+            sentencias.append(
+                f"CREATE INDEX IF NOT EXISTS {self.tabla}_{columna}_prefijo "
+                f"ON {self.tabla} ({columna} varchar_pattern_ops)"
+            )
+        return sentencias
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def expresion_sqlite(self, terminos):
+        """Expresión MATCH de FTS5: todos los términos, cada uno por prefijo"""
+        return ' '.join(f'"{_raiz(t)}"*' for t in terminos)
+
+    def expresion_postgresql(self, terminos):
+        """Texto para to_tsquery: todos los términos, cada uno por prefijo"""
+        return ' & '.join(f"'{t}':*" for t in terminos)
+
+    def filtrar(self, queryset, texto, por_relevancia=True):
+        """
+        Filtra ``queryset`` por ``texto``.
+
+        Con ``por_relevancia`` los resultados se ordenan por ranking; si no,
+        se conserva el orden del queryset original. Las consultas vacías
+        (sin términos útiles) devuelven el queryset sin modificar.
+        """
+        terminos = extraer_terminos(texto)
+        if not terminos:
+            return queryset
+
+        vendor = connection.vendor
+        if vendor == 'sqlite':
+            expresion = self.expresion_sqlite(terminos)
+            fts = self.tabla_fts
+            queryset = queryset.filter(
+                pk__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [expresion])
+            )
+            if not por_relevancia:
+                return queryset
+            pesos = ', '.join(str(PESOS_BM25[peso]) for _c, peso, _d in self.columnas)
+            return queryset.annotate(
+                relevancia=RawSQL(
+                    f'SELECT -bm25({fts}, {pesos}) FROM {fts} '
+                    f'WHERE {fts} MATCH %s AND rowid = {self.tabla}.id',
+                    [expresion],
+                    output_field=FloatField(),
+                )
+            ).order_by('-relevancia', 'pk')
+
+        if vendor == 'postgresql':
+            expresion = self.expresion_postgresql(terminos)
+            consulta = Q(coincide_texto=True)
+            for columna in self.columnas_prefijo:
+                consulta |= Q(**{f'{columna}__startswith': texto.strip().upper()})
+            queryset = queryset.annotate(
+                coincide_texto=RawSQL(
+                    f"{self.tabla}.busqueda @@ to_tsquery('spanish', %s)",
+                    [expresion],
+                    output_field=BooleanField(),
+                ),
+            ).filter(consulta)
+            if not por_relevancia:
+                return queryset
+            return queryset.annotate(
+                relevancia=RawSQL(
+                    f"ts_rank({self.tabla}.busqueda, to_tsquery('spanish', %s))",
+                    [expresion],
+                    output_field=FloatField(),
+                ),
+            ).order_by('-relevancia', 'pk')
+
+        # Motores sin soporte: búsqueda tradicional
+        consulta = Q()
+        for columna in self.nombres_columnas:
+            consulta |= Q(**{f'{columna}__icontains': texto})
+        return queryset.filter(consulta)
+
+    def tabla_lista(self, conexion):
+        """Indica si la tabla ya tiene todas las columnas indexadas"""
+        with conexion.cursor() as cursor:
+            if self.tabla not in conexion.introspection.table_names(cursor):
+                return False
+            existentes = {
+                c.name for c in conexion.introspection.get_table_description(cursor, self.tabla)
+            }
+        return set(self.nombres_columnas) <= existentes
+
+    def crear(self, conexion):
+        """Crea (si no existen) los objetos de base de datos del índice"""
+        if conexion.vendor == 'sqlite':
+            with conexion.cursor() as cursor:
+                cursor.execute(
+                    "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+                    [f'{self.tabla_fts}_a_'],
+                )
+                triggers_completos = cursor.fetchone()[0] == 3
+                for sentencia in self.sql_sqlite():
+                    cursor.execute(sentencia)
+                if not triggers_completos:
+                    # Reindexar lo que se haya escrito mientras faltaban triggers
+                    cursor.execute(f"INSERT INTO {self.tabla_fts}({self.tabla_fts}) VALUES ('rebuild')")
+        elif conexion.vendor == 'postgresql':
+            with conexion.cursor() as cursor:
+                for sentencia in self.sql_postgresql():
+                    cursor.execute(sentencia)
+
+    def eliminar(self, conexion):
+        """Elimina los objetos de base de datos del índice"""
+        if conexion.vendor == 'sqlite':
+            with conexion.cursor() as cursor:
+                for sufijo in ('ai', 'ad', 'au'):
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {self.tabla_fts}_{sufijo}')
+                cursor.execute(f'DROP TABLE IF EXISTS {self.tabla_fts}')
+        elif conexion.vendor == 'postgresql':
+            with conexion.cursor() as cursor:
+                for columna in self.columnas_prefijo:
+                    cursor.execute(f'DROP INDEX IF EXISTS {self.tabla}_{columna}_prefijo')
+                cursor.execute(f'ALTER TABLE {self.tabla} DROP COLUMN IF EXISTS busqueda')
+
+
+def extraer_terminos(texto):
+    """Divide el texto de búsqueda en términos normalizados"""
+    if not texto:
+        return []
+    return PATRON_TERMINO.findall(texto.lower())[:MAX_TERMINOS]
+
+
+def _raiz(termino):
+    """
+    Raíz ligera para español (plurales), usada solo en SQLite.
+
+    FTS5 no trae stemming en español; quitando el plural y buscando por
+    prefijo "vacunas" encuentra "vacuna" y "vacunación".
+    """
+    if len(termino) > 4 and termino.endswith('es'):
+        return termino[:-2]
+    if len(termino) > 3 and termino.endswith('s'):
+        return termino[:-1]
+    return termino
+
+
+INDICE_PRODUCTOS = IndiceTextoCompleto(
+    tabla='veterinaria_producto',
+    columnas=[
+        ('nombre', 'A', 'spanish'),
+        ('codigo', 'A', 'simple'),
+        ('descripcion', 'C', 'spanish'),
+    ],
+    columnas_prefijo=('codigo',),
+)
+
+# Las citas se indexan sobre un documento desnormalizado (ver
+# Cita.documento_busqueda), que incluye datos de la mascota.
+INDICE_CITAS = IndiceTextoCompleto(
+    tabla='veterinaria_cita',
+    columnas=[
+        ('documento_busqueda', 'A', 'spanish'),
+    ],
+)
+
+# Autocompletado de mascotas en el formulario de citas: nombres sin
+# stemming (son nombres propios) y el microchip también por prefijo exacto.
+INDICE_MASCOTAS = IndiceTextoCompleto(
+    tabla='veterinaria_mascota',
+    columnas=[
+        ('nombre', 'A', 'simple'),
+        ('numero_chip', 'A', 'simple'),
+        ('propietario_nombre', 'B', 'simple'),
+    ],
+    columnas_prefijo=('numero_chip',),
+)
+
+INDICES = [INDICE_PRODUCTOS, INDICE_CITAS, INDICE_MASCOTAS]
+
+
+def buscar_productos(queryset, texto):
+    """Aplica la búsqueda de texto completo a un queryset de Producto"""
+    return INDICE_PRODUCTOS.filtrar(queryset, texto)
+
+
+def buscar_citas(queryset, texto):
+    """
+    Aplica la búsqueda de texto completo a un queryset de Cita.
+
+    Conserva el orden del queryset (las citas se listan por fecha).
+    """
+    return INDICE_CITAS.filtrar(queryset, texto, por_relevancia=False)
+
+
+def buscar_mascotas(queryset, texto):
+    """
+    Aplica la búsqueda por prefijo a un queryset de Mascota.
+
+    Conserva el orden del queryset: con prefijos cortos coinciden miles de
+    mascotas y calcular la relevancia de cada una cuesta más que ordenarlas.
+    """
+    return INDICE_MASCOTAS.filtrar(queryset, texto, por_relevancia=False)
+
+
+def crear_indices_busqueda(conexion):
+    """Crea o repara todos los índices de texto completo"""
+    for indice in INDICES:
+        if indice.tabla_lista(conexion):
+            indice.crear(conexion)
+
+
+def eliminar_indices_busqueda(conexion):
+    for indice in INDICES:
+        indice.eliminar(conexion)
@@ -0,0 +1,119 @@
+"""
+Caché de páginas y fragmentos del catálogo con claves versionadas.
+
+Cada grupo de datos ('categorias', 'catalogo') tiene un número de versión
+guardado en la caché. Las claves de páginas y fragmentos incluyen esa
+versión, así que invalidar es solo incrementarla (ver signals.py): las
+entradas viejas dejan de usarse y expiran solas. Funciona igual con la caché
+en memoria local y con la caché en archivos, que no permiten borrar por
+patrón.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .routers import leer_desde, restaurar_lectura
+
+# Duración de las páginas y fragmentos cacheados
+SEGUNDOS_CACHE_PAGINAS = getattr(settings, 'VETERINARIA_SEGUNDOS_CACHE_PAGINAS', 60 * 60 * 24)
+
+
+def _clave_version(grupo):
+    return f'veterinaria:version:{grupo}'
+
+
+def obtener_version(grupo):
+    """Versión actual del grupo de datos"""
+    # Si la clave se perdió (expulsión LRU, reinicio) se parte de un valor
+    # nuevo basado en la hora, para no reutilizar entradas de una versión vieja.
+    return cache.get_or_set(_clave_version(grupo), time.time_ns(), None)
+
+
+async def aobtener_version(grupo):
+    """Versión asíncrona de obtener_version"""
+    return await cache.aget_or_set(_clave_version(grupo), time.time_ns(), None)
+
+
+def invalidar(*grupos):
+    """Descarta las páginas y fragmentos cacheados de los grupos indicados"""
+    for grupo in grupos:
+        try:
+            cache.incr(_clave_version(grupo))
+        except ValueError:
+            cache.set(_clave_version(grupo), time.time_ns(), None)
+
+
+def _clave_pagina(grupo, version, request):
+    ruta = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'veterinaria:pagina:{grupo}:{version}:{ruta}'
+
+
+def _cacheable(respuesta):
+    return respuesta.status_code == 200 and not respuesta.streaming
+
+
+def cache_por_version(grupo):
+    """
+    Decorador que cachea la respuesta GET de una vista según la versión
+    del grupo y la URL completa. Acepta vistas síncronas y asíncronas.
+
+    No se cachea si hay mensajes pendientes para el usuario (se mostrarían
+    a otros) ni respuestas distintas de 200. Las páginas que se guardan se
+    renderizan leyendo de la primaria: una réplica atrasada dejaría datos
+    viejos guardados bajo la versión nueva hasta el próximo cambio.
+    """
+    def decorador(vista):
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envoltura_asincrona(request, *args, **kwargs):
+                # Los mensajes pueden estar en la sesión (consulta a la base de datos)
+                if request.method != 'GET' or await sync_to_async(len)(get_messages(request)):
+                    return await vista(request, *args, **kwargs)
+
+                clave = _clave_pagina(grupo, await aobtener_version(grupo), request)
+                guardada = await cache.aget(clave)
+                if guardada is not None:
+                    contenido, tipo = guardada
+                    return HttpResponse(contenido, content_type=tipo)
+
+                token = leer_desde(None)
+                try:
+                    respuesta = await vista(request, *args, **kwargs)
+                    if _cacheable(respuesta):
+                        if hasattr(respuesta, 'render'):
+                            respuesta = await sync_to_async(respuesta.render)()
+                        await cache.aset(clave, (respuesta.content, respuesta['Content-Type']), SEGUNDOS_CACHE_PAGINAS)
+                finally:
+                    restaurar_lectura(token)
+                return respuesta
+            return envoltura_asincrona
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method != 'GET' or len(get_messages(request)):
+                return vista(request, *args, **kwargs)
+
+            clave = _clave_pagina(grupo, obtener_version(grupo), request)
+            guardada = cache.get(clave)
+            if guardada is not None:
+                contenido, tipo = guardada
+                return HttpResponse(contenido, content_type=tipo)
+
+            token = leer_desde(None)
+            try:
+                respuesta = vista(request, *args, **kwargs)
+                if _cacheable(respuesta):
+                    if hasattr(respuesta, 'render'):
+                        respuesta = respuesta.render()
+                    cache.set(clave, (respuesta.content, respuesta['Content-Type']), SEGUNDOS_CACHE_PAGINAS)
+            finally:
+                restaurar_lectura(token)
+            return respuesta
+        return envoltura
+    return decorador
@@ -0,0 +1,391 @@
+"""
+Generación de datos sintéticos en volumen (pruebas de carga y benchmarks).
+
+Todo se inserta con ``bulk_create`` por lotes y a partir de una semilla,
+así que la misma semilla produce el mismo conjunto de datos. Como
+``bulk_create`` no dispara señales, al final se recalculan los datos
+derivados que normalmente mantienen (resúmenes de inventario y de citas,
+saldos iniciales de stock, versiones de caché); los documentos de búsqueda
+e intervalos de las citas se calculan al construir cada fila.
+
+Las citas respetan el horario de atención (validators.py) y no se solapan
+en la agenda de cada veterinario.
+"""
+import multiprocessing
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connections
+from django.utils import timezone
+
+from .agenda import duracion_para
+from .cache import invalidar
+from .inventario import conciliar_stock
+from .models import Categoria, Cita, Mascota, Producto, TipoAnimal, Veterinario
+from .referencias import invalidar_referencias
+from .resumenes import recalcular_resumen_citas, recalcular_resumen_inventario
+from .validators import (
+    DIAS_SIN_ATENCION, EDAD_MAXIMA_POR_TIPO, HORA_APERTURA, HORA_CIERRE, PESO_MAXIMO_POR_TIPO,
+)
+
+TAMANO_LOTE = 5000
+
+TIPOS_ANIMAL = {
+    'Perro': ['Mestizo', 'Labrador', 'Pastor Alemán', 'Poodle', 'Beagle', 'Bulldog', 'Golden Retriever'],
+    'Gato': ['Mestizo', 'Siamés', 'Persa', 'Maine Coon', 'Bengalí'],
+    'Conejo': ['Cabeza de León', 'Belier', 'Rex'],
+    'Hámster': ['Sirio', 'Ruso', 'Roborovski'],
+    'Ave': ['Canario', 'Periquito', 'Cacatúa', 'Loro'],
+    'Reptil': ['Iguana', 'Tortuga', 'Gecko'],
+}
+
+# Peso (kg, mínimo y máximo) y edad máxima (años) de cada tipo; se acotan
+# además con los límites de validators.py para que los datos pasen MascotaForm
+RANGOS_POR_TIPO = {
+    'Perro': (2, 60, 16),
+    'Gato': (2, 8, 20),
+    'Conejo': (1, 6, 10),
+    'Hámster': (0.05, 0.2, 3),
+    'Ave': (0.02, 1.5, 15),
+    'Reptil': (0.05, 8, 30),
+}
+RANGO_POR_DEFECTO = (0.1, 10, 15)
+
+CATEGORIAS = ['Medicamentos', 'Alimentos', 'Accesorios', 'Higiene', 'Servicios', 'Equipamiento']
+
+NOMBRES_MASCOTA = [
+    'Luna', 'Max', 'Rocky', 'Nala', 'Simba', 'Coco', 'Toby', 'Kira', 'Bruno', 'Mia',
+    'Lola', 'Thor', 'Canela', 'Chispa', 'Oliver', 'Milo', 'Frida', 'Pelusa', 'Manchas', 'Copito',
+]
+
+NOMBRES = [
+    'María', 'José', 'Camila', 'Juan', 'Valentina', 'Diego', 'Catalina', 'Felipe', 'Javiera', 'Matías',
+    'Fernanda', 'Sebastián', 'Constanza', 'Nicolás', 'Daniela', 'Benjamín', 'Francisca', 'Tomás',
+]
+
+APELLIDOS = [
+    'González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva', 'Martínez',
+    'Sepúlveda', 'Morales', 'Rodríguez', 'López', 'Fuentes', 'Hernández', 'Torres', 'Araya',
+]
+
+ESPECIALIDADES = ['Medicina general', 'Cirugía', 'Dermatología', 'Odontología', 'Animales exóticos']
+
+MOTIVOS = [
+    'Control de rutina y revisión general',
+    'Vacunación anual y desparasitación',
+    'Revisión post-operatoria de la herida',
+    'Consulta por síntomas digestivos y vómitos',
+    'Chequeo general de salud del paciente',
+    'Revisión dental y limpieza de sarro',
+    'Control de peso y ajuste de dieta',
+    'Consulta dermatológica por picazón',
+    'Examen de sangre preoperatorio',
+    'Cojera en extremidad posterior',
+]
+
+PRODUCTOS_POR_TIPO = {
+    'medicamento': ['Antiparasitario', 'Antibiótico', 'Antiinflamatorio', 'Vitaminas', 'Analgésico'],
+    'alimento': ['Alimento seco adulto', 'Alimento cachorro', 'Snack dental', 'Alimento senior'],
+    'servicio': ['Baño y corte', 'Consulta a domicilio', 'Hospitalización diaria'],
+    'accesorio': ['Collar', 'Correa', 'Cama', 'Transportadora', 'Juguete'],
+    'equipo': ['Termómetro digital', 'Jeringa dosificadora', 'Nebulizador'],
+}
+
+# Rango de precio estimado (CLP) por tipo de cita
+PRECIOS_CITA = {
+    'consulta_general': (15000, 30000),
+    'vacunacion': (12000, 25000),
+    'cirugia': (120000, 450000),
+    'control': (10000, 20000),
+    'emergencia': (40000, 120000),
+    'estetica': (15000, 35000),
+    'otros': (10000, 40000),
+}
+
+# Frecuencia relativa de cada tipo de cita
+PESOS_TIPO_CITA = {
+    'consulta_general': 35, 'vacunacion': 20, 'control': 20, 'estetica': 10,
+    'emergencia': 7, 'cirugia': 5, 'otros': 3,
+}
+
+
+def insertar_por_lotes(modelo, objetos, tamano_lote=TAMANO_LOTE):
+    """Consume un iterable de instancias y las inserta en lotes; devuelve el total"""
+    total = 0
+    lote = []
+    for objeto in objetos:
+        lote.append(objeto)
+        if len(lote) >= tamano_lote:
+            modelo.objects.bulk_create(lote)
+            total += len(lote)
+            lote = []
+    if lote:
+        modelo.objects.bulk_create(lote)
+        total += len(lote)
+    return total
+
+
+def _nombre_persona(rng):
+    return f'{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}'
+
+
+def asegurar_referencias(rng, veterinarios=10, tipos_animal=None):
+    """
+    Crea (si faltan) las categorías, los tipos de animal y los veterinarios.
+
+    ``tipos_animal`` limita (o amplía con tipos numerados) el catálogo de
+    TIPOS_ANIMAL. Devuelve ``(categoria_ids, tipos {id: nombre},
+    veterinarios [(id, nombre)])``; los veterinarios se identifican por id
+    porque puede haber nombres repetidos.
+    """
+    for nombre in CATEGORIAS:
+        Categoria.objects.get_or_create(
+            nombre=nombre, defaults={'descripcion': f'Productos de la categoría {nombre.lower()}'}
+        )
+    nombres_tipos = list(TIPOS_ANIMAL)
+    if tipos_animal is not None:
+        nombres_tipos = nombres_tipos[:tipos_animal] + [
+            f'Exótico {numero}' for numero in range(1, tipos_animal - len(nombres_tipos) + 1)
+        ]
+    for nombre in nombres_tipos:
+        TipoAnimal.objects.get_or_create(
+            nombre=nombre, defaults={'descripcion': f'Pacientes de tipo {nombre.lower()}'}
+        )
+    faltantes = veterinarios - Veterinario.objects.filter(activo=True).count()
+    if faltantes > 0:
+        insertar_por_lotes(Veterinario, (
+            Veterinario(
+                nombre=_nombre_persona(rng),
+                especialidad=rng.choice(ESPECIALIDADES),
+                numero_colegiado=f'MV-{rng.randrange(10**6):06d}',
+            )
+            for _ in range(faltantes)
+        ))
+        # bulk_create no envía post_save: las opciones de los formularios se recargan aquí
+        invalidar_referencias(Veterinario)
+    categoria_ids = list(Categoria.objects.filter(activo=True).values_list('id', flat=True))
+    tipos = dict(TipoAnimal.objects.filter(activo=True, nombre__in=nombres_tipos).values_list('id', 'nombre'))
+    lista_veterinarios = list(
+        Veterinario.objects.filter(activo=True).order_by('id').values_list('id', 'nombre')[:veterinarios]
+    )
+    return categoria_ids, tipos, lista_veterinarios
+
+
+def generar_productos(cantidad, rng, categoria_ids, prefijo='S', inicio=0, tamano_lote=TAMANO_LOTE):
+    """Inserta ``cantidad`` productos con códigos ``{prefijo}{n}`` únicos"""
+    tipos = list(PRODUCTOS_POR_TIPO)
+
+    def filas():
+        for numero in range(inicio, inicio + cantidad):
+            tipo = rng.choice(tipos)
+            nombre = f'{rng.choice(PRODUCTOS_POR_TIPO[tipo])} {rng.choice(["Plus", "Forte", "Pro", "Max", "Basic"])} {numero}'
+            yield Producto(
+                categoria_id=rng.choice(categoria_ids),
+                nombre=nombre,
+                descripcion=f'{nombre}: producto de uso veterinario para pruebas de carga.',
+                tipo_producto=tipo,
+                precio=Decimal(rng.randrange(1000, 150000, 10)),
+                codigo=f'{prefijo}{numero:08d}',
+                stock=rng.choice([0, rng.randint(1, 5), rng.randint(6, 500)]),
+                activo=rng.random() > 0.05,
+            )
+
+    return insertar_por_lotes(Producto, filas(), tamano_lote)
+
+
+def _peso_y_edad(rng, tipo):
+    """Peso y edad plausibles para el tipo de animal, dentro de los límites de validación"""
+    peso_minimo, peso_maximo, edad_maxima = RANGOS_POR_TIPO.get(tipo, RANGO_POR_DEFECTO)
+    limite_peso = PESO_MAXIMO_POR_TIPO.get(tipo.lower())
+    if limite_peso:
+        peso_maximo = min(peso_maximo, limite_peso[1])
+    limite_edad = EDAD_MAXIMA_POR_TIPO.get(tipo.lower())
+    if limite_edad:
+        edad_maxima = min(edad_maxima, limite_edad[1])
+    peso = Decimal(rng.randint(round(peso_minimo * 100), round(peso_maximo * 100))) / 100
+    return peso, rng.randint(0, edad_maxima)
+
+
+def generar_mascotas(cantidad, rng, tipos, veterinarios, prefijo_chip='A', inicio=0,
+                     tamano_lote=TAMANO_LOTE):
+    """Inserta ``cantidad`` mascotas; ~70 % con microchip único"""
+    tipo_ids = list(tipos)
+    veterinario_ids = [veterinario_id for veterinario_id, _nombre in veterinarios]
+
+    def filas():
+        for numero in range(inicio, inicio + cantidad):
+            tipo_id = rng.choice(tipo_ids)
+            peso, edad = _peso_y_edad(rng, tipos[tipo_id])
+            yield Mascota(
+                tipo_animal_id=tipo_id,
+                nombre=rng.choice(NOMBRES_MASCOTA),
+                raza=rng.choice(TIPOS_ANIMAL.get(tipos[tipo_id], ['Mestizo'])),
+                edad=edad,
+                sexo=rng.choice(['macho', 'hembra']),
+                peso=peso,
+                propietario_nombre=_nombre_persona(rng),
+                propietario_telefono=f'+569{rng.randrange(10**8):08d}',
+                veterinario_encargado_id=rng.choice(veterinario_ids) if veterinario_ids else None,
+                numero_chip=f'{prefijo_chip}{numero:014X}' if rng.random() < 0.7 else None,
+                activo=rng.random() > 0.02,
+            )
+
+    return insertar_por_lotes(Mascota, filas(), tamano_lote)
+
+
+def generar_citas(cantidad, rng, veterinarios, desde=None, fraccion_futura=0.25,
+                  tamano_lote=TAMANO_LOTE):
+    """
+    Inserta ``cantidad`` citas recorriendo día a día la agenda de cada
+    veterinario (``[(id, nombre)]``), de lunes a sábado y entre
+    HORA_APERTURA y HORA_CIERRE.
+
+    Sin ``desde`` el rango se elige para que ~``fraccion_futura`` de las
+    citas quede en el futuro.
+    """
+    mascotas = list(Mascota.objects.filter(activo=True).values_list('id', 'nombre', 'propietario_nombre'))
+    if not mascotas or not veterinarios:
+        return 0
+    tipos = list(PESOS_TIPO_CITA)
+    pesos = list(PESOS_TIPO_CITA.values())
+    # Con las duraciones y huecos usados caben unas 13 citas por veterinario
+    # y día hábil; 7/6 convierte días hábiles en días corridos.
+    dias = max(1, cantidad // (13 * len(veterinarios)) * 7 // 6 + 1)
+    if desde is None:
+        desde = timezone.localdate() - timedelta(days=int(dias * (1 - fraccion_futura)))
+    ahora = timezone.now()
+
+    def filas():
+        restantes = cantidad
+        dia = desde
+        while restantes:
+            if dia.weekday() not in DIAS_SIN_ATENCION:
+                cierre = timezone.make_aware(datetime.combine(dia, time(HORA_CIERRE)))
+                for veterinario_id, veterinario in veterinarios:
+                    inicio = timezone.make_aware(datetime.combine(dia, time(HORA_APERTURA)))
+                    inicio += timedelta(minutes=rng.choice([0, 15, 30, 45, 60]))
+                    while restantes:
+                        tipo = rng.choices(tipos, pesos)[0]
+                        duracion = duracion_para(tipo)
+                        fin = inicio + timedelta(minutes=duracion)
+                        if fin > cierre:
+                            break
+                        mascota_id, nombre, propietario = rng.choice(mascotas)
+                        motivo = rng.choice(MOTIVOS)
+                        if inicio < ahora:
+                            estado = rng.choices(['completada', 'cancelada', 'no_asistio'], [85, 10, 5])[0]
+                        else:
+                            estado = rng.choices(['programada', 'confirmada', 'cancelada'], [60, 35, 5])[0]
+                        minimo, maximo = PRECIOS_CITA[tipo]
+                        yield Cita(
+                            mascota_id=mascota_id,
+                            fecha_hora=inicio,
+                            fecha_hora_fin=fin,
+                            duracion_minutos=duracion,
+                            tipo_cita=tipo,
+                            estado=estado,
+                            motivo=motivo,
+                            veterinario_id=veterinario_id,
+                            precio_estimado=Decimal(rng.randrange(minimo, maximo, 500)),
+                            documento_busqueda=f'{nombre} {propietario} {motivo} {veterinario}',
+                        )
+                        restantes -= 1
+                        # Hueco aleatorio entre citas
+                        inicio = fin + timedelta(minutes=rng.choice([0, 0, 15, 30, 45]))
+                    if not restantes:
+                        break
+            dia += timedelta(days=1)
+
+    return insertar_por_lotes(Cita, filas(), tamano_lote)
+
+
+def repartir(total, partes):
+    """Divide ``total`` en ``partes`` enteros que difieren a lo sumo en uno"""
+    base, resto = divmod(total, partes)
+    return [base + (1 if i < resto else 0) for i in range(partes)]
+
+
+def _generar_fragmento(tarea):
+    """
+    Ejecuta una parte de la generación; se usa tanto en el proceso
+    principal como en los procesos hijos (ver generar_datos).
+    """
+    modelo, indice, cantidad, inicio, semilla, parametros, tamano_lote = tarea
+    rng = random.Random(f'{semilla}-{modelo}-{indice}')
+    if modelo == 'productos':
+        return modelo, generar_productos(cantidad, rng, parametros['categoria_ids'], parametros['prefijo'],
+                                         inicio, tamano_lote)
+    if modelo == 'mascotas':
+        return modelo, generar_mascotas(cantidad, rng, parametros['tipos'], parametros['veterinarios'],
+                                        parametros['prefijo_chip'], inicio, tamano_lote)
+    return modelo, generar_citas(cantidad, rng, parametros['veterinarios'], tamano_lote=tamano_lote)
+
+
+def _ejecutar(tareas, procesos):
+    """Ejecuta las tareas en serie o repartidas en procesos (fork)"""
+    totales = {}
+    if procesos <= 1 or len(tareas) <= 1:
+        resultados = map(_generar_fragmento, tareas)
+    else:
+        # Los hijos heredan la configuración de Django pero no deben
+        # compartir las conexiones abiertas del padre.
+        connections.close_all()
+        contexto = multiprocessing.get_context('fork')
+        with contexto.Pool(procesos) as pool:
+            resultados = pool.map(_generar_fragmento, tareas)
+    for modelo, cantidad in resultados:
+        totales[modelo] = totales.get(modelo, 0) + cantidad
+    return totales
+
+
+def generar_datos(mascotas=0, citas=0, productos=0, veterinarios=10, tipos_animal=None, semilla=0,
+                  tamano_lote=TAMANO_LOTE, procesos=1, inicio=0):
+    """
+    Genera un conjunto de datos completo y devuelve los totales insertados.
+
+    Con ``procesos`` > 1 cada modelo se reparte en fragmentos que se
+    insertan en paralelo: productos y mascotas por rangos de numeración,
+    y citas por grupos de veterinarios (así las agendas no se solapan).
+    ``inicio`` desplaza la numeración de códigos y microchips para poder
+    generar más datos con la misma semilla sin chocar con los anteriores.
+    """
+    rng = random.Random(semilla)
+    categoria_ids, tipos, lista_veterinarios = asegurar_referencias(rng, veterinarios, tipos_animal)
+    parametros = {
+        'categoria_ids': categoria_ids,
+        'tipos': tipos,
+        'veterinarios': lista_veterinarios,
+        'prefijo': f'S{semilla % 1000:03d}',
+        'prefijo_chip': f'{semilla % 4096:03X}',
+    }
+    partes = max(1, procesos)
+
+    tareas = []
+    for modelo, total in (('productos', productos), ('mascotas', mascotas)):
+        desplazamiento = inicio
+        for indice, cantidad in enumerate(repartir(total, partes)):
+            if cantidad:
+                tareas.append((modelo, indice, cantidad, desplazamiento, semilla, parametros, tamano_lote))
+            desplazamiento += cantidad
+    totales = {'productos': 0, 'mascotas': 0, 'citas': 0}
+    totales.update(_ejecutar(tareas, procesos))
+
+    # Las citas necesitan las mascotas ya insertadas. Se reparten por
+    # veterinario y cada proceso recibe un grupo disjunto de agendas.
+    tareas = []
+    grupos = max(1, min(partes, len(lista_veterinarios)))
+    por_veterinario = repartir(citas, max(1, len(lista_veterinarios)))
+    for indice in range(grupos):
+        cantidad = sum(por_veterinario[indice::grupos])
+        if cantidad:
+            tareas.append(('citas', indice, cantidad, 0, semilla,
+                           dict(parametros, veterinarios=lista_veterinarios[indice::grupos]), tamano_lote))
+    totales.update(_ejecutar(tareas, procesos))
+
+    # bulk_create no dispara señales: recalcular los datos derivados
+    recalcular_resumen_inventario(categoria_ids)
+    recalcular_resumen_citas()
+    conciliar_stock(motivo='Saldo inicial')
+    invalidar('categorias', 'catalogo')
+    return totales
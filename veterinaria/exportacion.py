@@ -0,0 +1,120 @@
+"""
+Exportación de citas en CSV o JSON Lines, transmitida por partes.
+
+Las filas se leen con ``values_list(...).iterator(chunk_size=...)`` (en
+PostgreSQL, un cursor del lado del servidor) y se envían a medida que se
+convierten, así que la memoria no crece con el tamaño del historial y la
+descarga empieza de inmediato. Bajo ASGI la respuesta necesita un iterador
+asíncrono (con uno síncrono Django lee todo antes de enviar):
+contenido_exportacion_asincrono pide cada bloque al mismo generador en el
+hilo de la base de datos.
+"""
+import csv
+import json
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from .models import Cita
+
+# Filas leídas de la base de datos por cada viaje
+TAMANO_BLOQUE_EXPORTACION = 2000
+
+# Líneas que se envían juntas al servidor (menos llamadas por fila)
+LINEAS_POR_ENVIO = 200
+
+# (columna exportada, campo de values_list)
+COLUMNAS_CITAS = (
+    ('id', 'id'),
+    ('fecha_hora', 'fecha_hora'),
+    ('fecha_hora_fin', 'fecha_hora_fin'),
+    ('mascota', 'mascota__nombre'),
+    ('tipo_animal', 'mascota__tipo_animal__nombre'),
+    ('propietario', 'mascota__propietario_nombre'),
+    ('telefono', 'mascota__propietario_telefono'),
+    ('tipo_cita', 'tipo_cita'),
+    ('estado', 'estado'),
+    ('veterinario', 'veterinario__nombre'),
+    ('motivo', 'motivo'),
+    ('precio_estimado', 'precio_estimado'),
+)
+
+FORMATOS_EXPORTACION = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'jsonl': ('application/x-ndjson; charset=utf-8', 'jsonl'),
+}
+
+
+class _Eco:
+    """Objeto tipo archivo que devuelve lo escrito, para usar csv.writer sin búfer"""
+
+    def write(self, valor):
+        return valor
+
+
+def _valores_citas(queryset):
+    """Tuplas con los valores ya convertidos a texto o tipos JSON"""
+    tipos = dict(Cita.TIPO_CITA_CHOICES)
+    estados = dict(Cita.ESTADO_CHOICES)
+    campos = [campo for _columna, campo in COLUMNAS_CITAS]
+    filas = queryset.order_by().order_by('-fecha_hora', '-id').values_list(*campos)
+    for fila in filas.iterator(chunk_size=TAMANO_BLOQUE_EXPORTACION):
+        (pk, inicio, fin, mascota, tipo_animal, propietario, telefono,
+         tipo_cita, estado, veterinario, motivo, precio) = fila
+        yield (
+            pk,
+            timezone.localtime(inicio).isoformat(timespec='minutes'),
+            timezone.localtime(fin).isoformat(timespec='minutes'),
+            mascota, tipo_animal, propietario, telefono,
+            tipos.get(tipo_cita, tipo_cita),
+            estados.get(estado, estado),
+            veterinario or '', motivo,
+            None if precio is None else str(precio),
+        )
+
+
+def _agrupar(lineas):
+    """Junta las líneas en bloques de LINEAS_POR_ENVIO"""
+    bloque = []
+    for linea in lineas:
+        bloque.append(linea)
+        if len(bloque) >= LINEAS_POR_ENVIO:
+            yield ''.join(bloque)
+            bloque = []
+    if bloque:
+        yield ''.join(bloque)
+
+
+def exportar_citas_csv(queryset):
+    """Genera el CSV línea a línea (con BOM para que Excel detecte UTF-8)"""
+    escritor = csv.writer(_Eco())
+    yield '\ufeff' + escritor.writerow([columna for columna, _campo in COLUMNAS_CITAS])
+    for fila in _valores_citas(queryset):
+        yield escritor.writerow(['' if valor is None else valor for valor in fila])
+
+
+def exportar_citas_jsonl(queryset):
+    """Genera un objeto JSON por línea"""
+    columnas = [columna for columna, _campo in COLUMNAS_CITAS]
+    for fila in _valores_citas(queryset):
+        yield json.dumps(dict(zip(columnas, fila)), ensure_ascii=False) + '\n'
+
+
+def contenido_exportacion(queryset, formato):
+    """Iterador de texto con las citas en el formato pedido ('csv' o 'jsonl')"""
+    if formato == 'jsonl':
+        return _agrupar(exportar_citas_jsonl(queryset))
+    return _agrupar(exportar_citas_csv(queryset))
+
+
+async def contenido_exportacion_asincrono(queryset, formato):
+    """contenido_exportacion como iterador asíncrono, para StreamingHttpResponse bajo ASGI"""
+    bloques = contenido_exportacion(queryset, formato)
+    # thread_sensitive: todos los bloques se leen en el mismo hilo y con la
+    # misma conexión, que mantiene abierto el cursor del lado del servidor
+    siguiente = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (bloque := await siguiente(bloques, None)) is not None:
+            yield bloque
+    finally:
+        await sync_to_async(bloques.close, thread_sensitive=True)()
@@ -1,5 +1,7 @@
 from django import forms
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.urls import reverse_lazy
 from django.utils import timezone
 import re
 from decimal import Decimal
@@ -7,6 +9,13 @@ from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Submit, Row, Column, Div, HTML
 from crispy_forms.bootstrap import Field
 from .models import Producto, Categoria, Mascota, TipoAnimal, Cita, Veterinario
+from .agenda import ESTADOS_ACTIVOS, buscar_conflicto
+from .inventario import ajustar
+from .referencias import CampoReferencia
+from .widgets import SelectAutocompletar
+from .validators import (
+    validar_edad_por_tipo, validar_horario_atencion, validar_nombre_producto, validar_peso_por_tipo,
+)
 
 class ProductoForm(forms.ModelForm):
     """
@@ -39,6 +48,8 @@ class ProductoForm(forms.ModelForm):
             'concentracion': 'Concentración (solo medicamentos)',
             'laboratorio': 'Laboratorio (solo medicamentos)',
         }
+        # Opciones desde la caché de tablas de referencia (ver referencias.py)
+        field_classes = {'categoria': CampoReferencia}
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -48,8 +59,17 @@ class ProductoForm(forms.ModelForm):
         self.helper.label_class = 'col-lg-3'
         self.helper.field_class = 'col-lg-9'
         
-        # Solo mostrar categorías activas
+        # Solo mostrar categorías activas (CampoReferencia las toma de la caché)
         self.fields['categoria'].queryset = Categoria.objects.filter(activo=True)
+
+        # Al editar, el stock mostrado viaja en un campo oculto para registrar
+        # solo la diferencia que escribió el usuario (ver save)
+        if self.instance.pk:
+            self.fields['stock'].show_hidden_initial = True
+            self.fields['stock'].help_text = (
+                'El cambio se registra como un ajuste sobre el stock actual, '
+                'sin descartar las ventas o reposiciones hechas mientras se editaba.'
+            )
         
         # Configurar el layout del formulario
         self.helper.layout = Layout(
@@ -93,19 +113,7 @@ class ProductoForm(forms.ModelForm):
     def clean_nombre(self):
         """Validar nombre del producto"""
         nombre = self.cleaned_data.get('nombre')
-        if nombre:
-            # Verificar longitud mínima
-            if len(nombre.strip()) < 3:
-                raise ValidationError('El nombre debe tener al menos 3 caracteres.')
-            
-            # Verificar que no sea solo números
-            if nombre.strip().isdigit():
-                raise ValidationError('El nombre no puede ser solo números.')
-            
-            # Verificar caracteres especiales excesivos
-            if len(re.sub(r'[a-zA-Z0-9\s\-_áéíóúñüÁÉÍÓÚÑÜ]', '', nombre)) > 3:
-                raise ValidationError('El nombre contiene demasiados caracteres especiales.')
-        
+        validar_nombre_producto(nombre)
         return nombre.strip() if nombre else nombre
     
     def clean_codigo(self):
@@ -148,7 +156,44 @@ class ProductoForm(forms.ModelForm):
                 raise ValidationError('El stock no puede ser negativo.')
             if stock > 100000:
                 raise ValidationError('El stock es demasiado alto. Máximo: 100,000 unidades.')
+            if self.instance.pk and stock < self.instance.stock_reservado:
+                raise ValidationError(
+                    f'El stock no puede ser menor que las unidades reservadas ({self.instance.stock_reservado}).'
+                )
         return stock
+
+    def diferencia_stock(self):
+        """Unidades que el usuario sumó o restó al stock que se le mostró"""
+        campo = self.fields['stock']
+        try:
+            mostrado = campo.to_python(self.data.get(self.add_initial_prefix('stock')))
+        except ValidationError:
+            mostrado = None
+        if mostrado is None:
+            mostrado = self.initial.get('stock')
+        return (self.cleaned_data.get('stock') or 0) - (mostrado or 0)
+
+    def save(self, commit=True):
+        """
+        Al editar no se sobrescribe el stock: la diferencia con el valor
+        mostrado se registra como un ajuste (inventario.py), así no se
+        pierden los movimientos hechos mientras el formulario estaba abierto.
+        """
+        if not self.instance.pk:
+            return super().save(commit)
+        diferencia = self.diferencia_stock()
+        producto = super().save(commit=False)
+        if commit:
+            with transaction.atomic():
+                producto.refresh_from_db(fields=['stock', 'stock_reservado'])
+                producto.save(update_fields=[
+                    campo.name for campo in Producto._meta.concrete_fields
+                    if not campo.primary_key and campo.name not in ('stock', 'stock_reservado')
+                ])
+                self._save_m2m()
+                if diferencia:
+                    ajustar(producto, diferencia, motivo='Edición del producto')
+        return producto
     
     def clean_descripcion(self):
         """Validar descripción"""
@@ -263,6 +308,8 @@ class MascotaForm(forms.ModelForm):
             'observaciones': 'Observaciones Médicas (opcional)',
             'imagen': 'Foto de la Mascota (opcional)',
         }
+        # Opciones desde la caché de tablas de referencia (ver referencias.py)
+        field_classes = {'tipo_animal': CampoReferencia, 'veterinario_encargado': CampoReferencia}
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -272,10 +319,10 @@ class MascotaForm(forms.ModelForm):
         self.helper.label_class = 'col-lg-3'
         self.helper.field_class = 'col-lg-9'
         
-        # Solo mostrar tipos de animal activos
+        # Solo mostrar tipos de animal activos (CampoReferencia los toma de la caché)
         self.fields['tipo_animal'].queryset = TipoAnimal.objects.filter(activo=True)
         
-        # Solo mostrar veterinarios activos
+        # Solo mostrar veterinarios activos (también desde la caché)
         self.fields['veterinario_encargado'].queryset = Veterinario.objects.filter(activo=True)
         
         # Configurar el layout del formulario
@@ -356,12 +403,7 @@ class MascotaForm(forms.ModelForm):
             
             # Validaciones específicas por tipo de animal
             if tipo_animal:
-                if tipo_animal.nombre.lower() == 'gato' and peso > 15:
-                    raise ValidationError('El peso para un gato parece muy alto (máximo recomendado: 15 kg).')
-                elif tipo_animal.nombre.lower() == 'perro' and peso > 100:
-                    raise ValidationError('El peso para un perro parece muy alto (máximo recomendado: 100 kg).')
-                elif tipo_animal.nombre.lower() in ['ave', 'pájaro'] and peso > 5:
-                    raise ValidationError('El peso para un ave parece muy alto (máximo recomendado: 5 kg).')
+                validar_peso_por_tipo(peso, tipo_animal.nombre)
         
         return peso
     
@@ -378,10 +420,7 @@ class MascotaForm(forms.ModelForm):
             
             # Validaciones específicas por tipo de animal
             if tipo_animal:
-                if tipo_animal.nombre.lower() == 'gato' and edad > 25:
-                    raise ValidationError('La edad para un gato parece muy alta (máximo típico: 25 años).')
-                elif tipo_animal.nombre.lower() == 'perro' and edad > 20:
-                    raise ValidationError('La edad para un perro parece muy alta (máximo típico: 20 años).')
+                validar_edad_por_tipo(edad, tipo_animal.nombre)
         
         return edad
     
@@ -463,6 +502,8 @@ class CitaForm(forms.ModelForm):
             'motivo', 'observaciones', 'veterinario', 'precio_estimado'
         ]
         widgets = {
+            # Solo la mascota elegida va en el HTML; el resto se busca al escribir
+            'mascota': SelectAutocompletar(url=reverse_lazy('autocompletar_mascotas')),
             'fecha_hora': forms.DateTimeInput(attrs={
                 'type': 'datetime-local',
                 'class': 'form-control'
@@ -481,6 +522,8 @@ class CitaForm(forms.ModelForm):
             'veterinario': 'Veterinario Asignado (opcional)',
             'precio_estimado': 'Precio Estimado CLP $ (opcional)',
         }
+        # Opciones desde la caché de tablas de referencia (ver referencias.py)
+        field_classes = {'veterinario': CampoReferencia}
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -490,8 +533,12 @@ class CitaForm(forms.ModelForm):
         self.helper.label_class = 'col-lg-3'
         self.helper.field_class = 'col-lg-9'
         
-        # Solo mostrar mascotas activas
-        self.fields['mascota'].queryset = Mascota.objects.filter(activo=True).order_by('nombre')
+        # Solo mascotas activas; la etiqueta de la opción elegida (__str__)
+        # usa el tipo de animal, que se trae en la misma consulta
+        self.fields['mascota'].queryset = Mascota.objects.filter(activo=True).select_related('tipo_animal')
+        
+        # Solo veterinarios activos (CampoReferencia los toma de la caché)
+        self.fields['veterinario'].queryset = Veterinario.objects.filter(activo=True)
         
         # Configurar el layout del formulario
         self.helper.layout = Layout(
@@ -540,31 +587,8 @@ class CitaForm(forms.ModelForm):
             if fecha_hora > ahora.replace(year=ahora.year + 1):
                 raise ValidationError('No se pueden programar citas con más de 1 año de anticipación.')
             
-            # Validar horario de atención (8 AM - 8 PM)
-            if fecha_hora.hour < 8 or fecha_hora.hour >= 20:
-                raise ValidationError('Las citas deben programarse entre las 8:00 AM y las 8:00 PM.')
-            
-            # Validar que no sea domingo
-            if fecha_hora.weekday() == 6:  # Domingo = 6
-                raise ValidationError('No se atiende los domingos.')
-            
-            # Verificar conflictos de horario (opcional - solo para citas confirmadas)
-            estado = self.cleaned_data.get('estado')
-            if estado in ['confirmada', 'en_curso']:
-                # Buscar citas en la misma hora ±30 minutos
-                inicio = fecha_hora - timezone.timedelta(minutes=30)
-                fin = fecha_hora + timezone.timedelta(minutes=30)
-                
-                citas_conflicto = Cita.objects.filter(
-                    fecha_hora__range=(inicio, fin),
-                    estado__in=['confirmada', 'en_curso']
-                )
-                
-                if self.instance.pk:
-                    citas_conflicto = citas_conflicto.exclude(pk=self.instance.pk)
-                
-                if citas_conflicto.exists():
-                    raise ValidationError('Ya existe una cita confirmada en este horario (±30 minutos).')
+            # Validar horario de atención (8 AM - 8 PM, sin domingos)
+            validar_horario_atencion(fecha_hora)
         
         return fecha_hora
     
@@ -578,16 +602,6 @@ class CitaForm(forms.ModelForm):
                 raise ValidationError('El motivo es demasiado largo. Máximo 500 caracteres.')
         return motivo.strip() if motivo else motivo
     
-    def clean_veterinario(self):
-        """Validar nombre del veterinario"""
-        veterinario = self.cleaned_data.get('veterinario')
-        if veterinario:
-            if len(veterinario.strip()) < 3:
-                raise ValidationError('El nombre del veterinario debe tener al menos 3 caracteres.')
-            if not re.match(r'^[a-zA-ZáéíóúñüÁÉÍÓÚÑÜ\s\-\'\.]+$', veterinario):
-                raise ValidationError('El nombre del veterinario solo puede contener letras, espacios, guiones y apostrofes.')
-        return veterinario.strip() if veterinario else veterinario
-    
     def clean_precio_estimado(self):
         """Validar precio estimado"""
         precio = self.cleaned_data.get('precio_estimado')
@@ -621,4 +635,18 @@ class CitaForm(forms.ModelForm):
         if tipo_cita == 'cirugia' and not cleaned_data.get('veterinario'):
             self.add_error('veterinario', 'Es obligatorio asignar un veterinario para cirugías.')
         
+        # Verificar que el veterinario no tenga otra cita en ese intervalo
+        # (la duración depende del tipo de cita, ver agenda.py)
+        veterinario = cleaned_data.get('veterinario')
+        if fecha_hora and tipo_cita and veterinario and estado in ESTADOS_ACTIVOS:
+            conflicto = buscar_conflicto(veterinario, fecha_hora, tipo_cita, excluir_pk=self.instance.pk)
+            if conflicto:
+                inicio = timezone.localtime(conflicto.fecha_hora)
+                fin = timezone.localtime(conflicto.fecha_hora_fin)
+                self.add_error(
+                    'fecha_hora',
+                    f'{veterinario.nombre} ya tiene una cita de {inicio:%H:%M} a {fin:%H:%M} '
+                    f'({conflicto.get_tipo_cita_display()}) que se superpone con este horario.'
+                )
+        
         return cleaned_data
@@ -0,0 +1,167 @@
+"""
+Variantes redimensionadas de las imágenes subidas.
+
+Por cada imagen original (``productos/foo.jpg``) se generan copias de ancho
+fijo en WebP, y en AVIF si Pillow lo soporta, junto al original:
+``productos/foo_jpg__w320.webp``, ``productos/foo_jpg__w640.avif``, etc.
+El nombre conserva la extensión del original para que ``foo.jpg`` y
+``foo.png`` en la misma carpeta no compartan variantes. Las
+plantillas las ofrecen con ``srcset`` (ver ``templatetags/imagenes.py``)
+y el navegador descarga solo la que necesita.
+
+Las variantes se generan al guardar el modelo (ver ``signals.py``) y se
+pueden regenerar con ``python manage.py generar_miniaturas``. Al reemplazar
+o eliminar la imagen se borran las variantes de la anterior.
+
+Los anchos generados de cada imagen se anotan en la caché de Django, así
+que mostrar un listado no consulta el storage por cada variante; si la
+entrada no está (imágenes anteriores, caché reiniciada) se revisa el
+storage una vez y se vuelve a anotar.
+"""
+import hashlib
+import io
+import os
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+# Anchos (px) de las variantes; nunca se amplía una imagen más pequeña
+ANCHOS_VARIANTES = getattr(settings, 'VETERINARIA_ANCHOS_IMAGEN', (320, 640, 1024))
+
+CALIDAD = {'webp': 80, 'avif': 60}
+
+TIPOS_MIME = {'webp': 'image/webp', 'avif': 'image/avif'}
+
+
+def _soporta_avif():
+    try:
+        return features.check('avif')
+    except ValueError:
+        # Pillow anterior a 11.3 no conoce la característica
+        return False
+
+
+# Formatos a generar, del más eficiente al más compatible
+FORMATOS = (('avif',) if getattr(settings, 'VETERINARIA_IMAGENES_AVIF', True) and _soporta_avif() else ()) + ('webp',)
+
+
+# Variante: <base>_<extensión del original>__w<ancho>.<formato>
+PATRON_VARIANTE = re.compile(r'_[A-Za-z0-9]+__w\d+\.(?:%s)$' % '|'.join(TIPOS_MIME))
+
+
+def nombre_variante(nombre, ancho, formato):
+    """Nombre en el storage de la variante de ``nombre`` con ese ancho y formato"""
+    base, extension = os.path.splitext(nombre)
+    return f'{base}{extension.replace(".", "_")}__w{ancho}.{formato}'
+
+
+def es_variante(nombre):
+    """Indica si ``nombre`` corresponde a una variante generada"""
+    return bool(PATRON_VARIANTE.search(os.path.basename(nombre)))
+
+
+def _clave_registro(nombre):
+    # v2: variantes con la extensión del original en el nombre
+    return f'veterinaria:variantes:v2:{hashlib.md5(nombre.encode()).hexdigest()}'
+
+
+def _anotar_variantes(nombre, existentes):
+    """Guarda en la caché los anchos generados por formato: ``{formato: [ancho, ...]}``"""
+    registro = {
+        formato: [ancho for ancho in ANCHOS_VARIANTES if (ancho, formato) in existentes]
+        for formato in FORMATOS
+    }
+    cache.set(_clave_registro(nombre), registro, None)
+    return registro
+
+
+def _preparar(imagen):
+    """Aplica la orientación EXIF y deja la imagen en un modo que WebP/AVIF acepten"""
+    imagen = ImageOps.exif_transpose(imagen)
+    if imagen.mode in ('RGBA', 'LA') or (imagen.mode == 'P' and 'transparency' in imagen.info):
+        return imagen.convert('RGBA')
+    return imagen.convert('RGB')
+
+
+def generar_variantes(archivo, forzar=False):
+    """
+    Genera las variantes de un ``FieldFile`` y devuelve los nombres creados.
+
+    Las variantes existentes se conservan salvo con ``forzar``. Los anchos
+    mayores que el original se omiten.
+    """
+    if not archivo or not archivo.name:
+        return []
+    storage = archivo.storage
+    existentes = set() if forzar else {
+        (ancho, formato)
+        for ancho in ANCHOS_VARIANTES
+        for formato in FORMATOS
+        if storage.exists(nombre_variante(archivo.name, ancho, formato))
+    }
+    pendientes = [
+        (ancho, formato)
+        for ancho in ANCHOS_VARIANTES
+        for formato in FORMATOS
+        if (ancho, formato) not in existentes
+    ]
+
+    creadas = []
+    if pendientes:
+        with storage.open(archivo.name, 'rb') as origen:
+            with Image.open(origen) as imagen:
+                imagen = _preparar(imagen)
+
+        for ancho, formato in pendientes:
+            if ancho > imagen.width:
+                continue
+            alto = round(imagen.height * ancho / imagen.width)
+            reducida = imagen.resize((ancho, alto), Image.Resampling.LANCZOS)
+            contenido = io.BytesIO()
+            reducida.save(contenido, format=formato.upper(), quality=CALIDAD[formato])
+            nombre = nombre_variante(archivo.name, ancho, formato)
+            if storage.exists(nombre):
+                storage.delete(nombre)
+            creadas.append(storage.save(nombre, ContentFile(contenido.getvalue())))
+            existentes.add((ancho, formato))
+    _anotar_variantes(archivo.name, existentes)
+    return creadas
+
+
+def eliminar_variantes(nombre, storage):
+    """Elimina las variantes de la imagen ``nombre`` (cuando se reemplaza o borra)"""
+    for ancho in ANCHOS_VARIANTES:
+        for formato in TIPOS_MIME:
+            variante = nombre_variante(nombre, ancho, formato)
+            if storage.exists(variante):
+                storage.delete(variante)
+    cache.delete(_clave_registro(nombre))
+
+
+def variantes_disponibles(archivo):
+    """
+    Variantes existentes de un ``FieldFile``, agrupadas por formato.
+
+    Devuelve ``{formato: [(url, ancho), ...]}`` con los anchos en orden
+    ascendente; los formatos sin variantes no aparecen.
+    """
+    if not archivo or not archivo.name:
+        return {}
+    storage = archivo.storage
+    registro = cache.get(_clave_registro(archivo.name))
+    if registro is None:
+        registro = _anotar_variantes(archivo.name, {
+            (ancho, formato)
+            for ancho in ANCHOS_VARIANTES
+            for formato in FORMATOS
+            if storage.exists(nombre_variante(archivo.name, ancho, formato))
+        })
+    resultado = {}
+    for formato in FORMATOS:
+        anchos = registro.get(formato)
+        if anchos:
+            resultado[formato] = [(storage.url(nombre_variante(archivo.name, ancho, formato)), ancho) for ancho in anchos]
+    return resultado
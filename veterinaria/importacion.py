@@ -0,0 +1,584 @@
+"""
+Importación masiva desde archivos CSV.
+
+Cada fila se valida con las mismas reglas que el formulario equivalente,
+pero por columnas: primero se convierten todas las filas y luego cada
+columna se valida de una vez con los validadores por columnas de
+validators.py, que devuelven los errores sin lanzar una excepción por
+fila. Las verificaciones que consultan la base de datos también se hacen
+una sola vez para todo el archivo: los códigos existentes
+se obtienen con una consulta ``IN`` y las referencias (categorías) se
+resuelven desde un diccionario en memoria. Las filas válidas se escriben
+con ``bulk_create``/``bulk_update`` por lotes dentro de una transacción;
+las inválidas se informan en un reporte por fila y no se importan.
+
+Como ``bulk_create`` y ``bulk_update`` no disparan señales, al final se
+recalculan los resúmenes de inventario, el stock importado se registra en
+el libro de movimientos y se invalida la caché del catálogo.
+"""
+import csv
+import io
+import unicodedata
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import invalidar
+from .inventario import conciliar_stock
+from .models import Categoria, Cita, Mascota, Producto, TipoAnimal, Veterinario
+from .resumenes import recalcular_resumen_inventario
+from .validators import (
+    validar_columna_codigo_producto, validar_columna_concentracion, validar_columna_descripcion_producto,
+    validar_columna_edad, validar_columna_edad_por_tipo, validar_columna_email, validar_columna_laboratorio,
+    validar_columna_nombre_mascota, validar_columna_nombre_producto, validar_columna_nombre_propietario,
+    validar_columna_numero_chip, validar_columna_peso, validar_columna_peso_por_tipo, validar_columna_precio,
+    validar_columna_principio_activo, validar_columna_stock, validar_columna_telefono,
+)
+
+TAMANO_LOTE_IMPORTACION = 1000
+
+VALORES_VERDADEROS = {'1', 'si', 'sí', 's', 'true', 'verdadero', 'x'}
+VALORES_FALSOS = {'0', 'no', 'n', 'false', 'falso'}
+
+# Columnas del CSV de productos; los encabezados se comparan sin tildes ni mayúsculas
+COLUMNAS_PRODUCTO = (
+    'codigo', 'nombre', 'categoria', 'tipo_producto', 'descripcion', 'precio', 'stock',
+    'principio_activo', 'concentracion', 'laboratorio', 'activo',
+)
+ALIAS_PRODUCTO = {'tipo': 'tipo_producto'}
+
+# Columnas del CSV de mascotas
+COLUMNAS_MASCOTA = (
+    'tipo_animal', 'nombre', 'raza', 'edad', 'sexo', 'tamaño', 'peso', 'color', 'propietario_nombre',
+    'propietario_telefono', 'propietario_email', 'propietario_direccion', 'veterinario_encargado',
+    'numero_chip', 'observaciones',
+)
+COLUMNAS_OBLIGATORIAS_MASCOTA = ('tipo_animal', 'nombre', 'sexo', 'propietario_nombre')
+ALIAS_MASCOTA = {
+    'tipo': 'tipo_animal',
+    'tamano': 'tamaño',
+    'propietario': 'propietario_nombre',
+    'telefono': 'propietario_telefono',
+    'email': 'propietario_email',
+    'direccion': 'propietario_direccion',
+    'veterinario': 'veterinario_encargado',
+    'chip': 'numero_chip',
+    'microchip': 'numero_chip',
+}
+
+
+class ResultadoImportacion:
+    """Totales y errores por fila de una importación"""
+
+    def __init__(self, simulado=False):
+        self.simulado = simulado
+        self.creados = 0
+        self.actualizados = 0
+        self.errores = []  # (fila, columna, mensaje)
+
+    def agregar_error(self, fila, columna, mensaje):
+        self.errores.append((fila, columna, mensaje))
+
+    @property
+    def filas_con_error(self):
+        return len({fila for fila, _columna, _mensaje in self.errores})
+
+    def resumen(self):
+        prefijo = 'Simulación: se crearían' if self.simulado else 'Se crearon'
+        verbo = 'actualizarían' if self.simulado else 'actualizaron'
+        return (
+            f'{prefijo} {self.creados} y se {verbo} {self.actualizados} registros; '
+            f'{self.filas_con_error} filas con errores.'
+        )
+
+    def reporte_csv(self):
+        """Errores en CSV (fila, columna, mensaje)"""
+        salida = io.StringIO()
+        escritor = csv.writer(salida)
+        escritor.writerow(['fila', 'columna', 'error'])
+        escritor.writerows(self.errores)
+        return salida.getvalue()
+
+
+def normalizar_encabezado(nombre):
+    """'Código ' -> 'codigo' (también se usa para comparar opciones)"""
+    sin_tildes = unicodedata.normalize('NFKD', nombre or '').encode('ascii', 'ignore').decode()
+    return sin_tildes.strip().lower().replace(' ', '_')
+
+
+def leer_csv(archivo, alias=None):
+    """
+    Lee un CSV (archivo binario, en UTF-8 con o sin BOM) separado por comas
+    o por punto y coma; ``alias`` traduce encabezados alternativos.
+    Devuelve ``(encabezados, filas)``, donde ``filas`` es un iterador de
+    ``(número de línea, {columna: valor})``.
+    """
+    alias = alias or {}
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    primera = texto.readline()
+    delimitador = ';' if primera.count(';') > primera.count(',') else ','
+    encabezados = [
+        alias.get(normalizar_encabezado(nombre), normalizar_encabezado(nombre))
+        for nombre in next(csv.reader([primera], delimiter=delimitador))
+    ]
+    lector = csv.reader(texto, delimiter=delimitador)
+
+    def filas():
+        for valores in lector:
+            if not any(valor.strip() for valor in valores):
+                continue
+            # line_num cuenta desde la segunda línea (la primera ya se leyó)
+            yield lector.line_num + 1, dict(zip(encabezados, (valor.strip() for valor in valores)))
+
+    return encabezados, filas()
+
+
+def _decimal(valor):
+    try:
+        numero = Decimal(valor.replace(' ', '').replace('$', ''))
+    except InvalidOperation:
+        raise ValidationError('Ingrese un número.')
+    if not numero.is_finite():
+        raise ValidationError('Ingrese un número.')
+    return numero
+
+
+def _entero(valor):
+    try:
+        return int(valor.replace(' ', ''))
+    except ValueError:
+        raise ValidationError('Ingrese un número entero.')
+
+
+def _booleano(valor):
+    valor = valor.lower()
+    if valor in VALORES_VERDADEROS:
+        return True
+    if valor in VALORES_FALSOS:
+        return False
+    raise ValidationError('Use sí o no.')
+
+
+def _obligatorio(funcion):
+    def convertir(valor):
+        if not valor:
+            raise ValidationError('Este campo es obligatorio.')
+        return funcion(valor)
+    return convertir
+
+
+def _texto(modelo, campo):
+    """Texto limitado al largo máximo del campo"""
+    maximo = modelo._meta.get_field(campo).max_length
+
+    def convertir(valor):
+        if maximo and len(valor) > maximo:
+            raise ValidationError(f'Máximo {maximo} caracteres.')
+        return valor
+    return convertir
+
+
+def _opcion(opciones, mensaje):
+    """Convierte con un diccionario ``{texto normalizado: valor}``"""
+    def convertir(valor):
+        if not valor:
+            return ''
+        opcion = opciones.get(normalizar_encabezado(valor))
+        if opcion is None:
+            raise ValidationError(mensaje)
+        return opcion
+    return convertir
+
+
+def _mapa_opciones(choices):
+    """``{valor o etiqueta normalizados: valor}`` a partir de un ``choices``"""
+    opciones = {}
+    for valor, etiqueta in choices:
+        opciones[normalizar_encabezado(valor)] = valor
+        opciones[normalizar_encabezado(str(etiqueta))] = valor
+    return opciones
+
+
+def _convertir_fila(fila, conversiones):
+    """
+    Aplica ``conversiones`` (``[(columna, funcion)]``) a una fila.
+    Devuelve ``(datos, errores {columna: mensaje})``.
+    """
+    datos = {}
+    errores = {}
+    for columna, funcion in conversiones:
+        try:
+            datos[columna] = funcion(fila.get(columna, ''))
+        except ValidationError as error:
+            errores[columna] = ' '.join(error.messages)
+    return datos, errores
+
+
+def _validar_columna(filas, columna, validador, *otras):
+    """
+    Valida ``columna`` en todas las filas convertidas (``[(número, datos,
+    errores)]``) con un validador por columnas; ``otras`` son columnas
+    adicionales que recibe el validador (p. ej. el tipo de animal). Se
+    omiten las filas donde alguna de ellas no se pudo convertir o la
+    columna ya tiene un error.
+    """
+    columnas = (columna, *otras)
+    posiciones = [
+        indice for indice, (_numero, datos, errores) in enumerate(filas)
+        if columna not in errores and all(nombre in datos for nombre in columnas)
+    ]
+    valores = [[filas[indice][1][nombre] for indice in posiciones] for nombre in columnas]
+    for indice, mensaje in zip(posiciones, validador(*valores)):
+        if mensaje is not None:
+            filas[indice][2][columna] = mensaje
+
+
+def _convertir_producto(fila, categorias, tipos):
+    """Convierte una fila de productos; la validación se hace por columnas"""
+
+    def codigo(valor):
+        return valor.upper()
+
+    def categoria(valor):
+        categoria_id = categorias.get(valor.lower())
+        if categoria_id is None:
+            raise ValidationError('Categoría inexistente o inactiva.')
+        return categoria_id
+
+    def precio(valor):
+        if not valor:
+            return None
+        numero = _decimal(valor)
+        if numero.as_tuple().exponent < -2:
+            raise ValidationError('El precio admite como máximo 2 decimales.')
+        return numero
+
+    def stock(valor):
+        if not valor:
+            return 0
+        return _entero(valor)
+
+    conversiones = [
+        ('codigo', _obligatorio(codigo)),
+        ('nombre', _obligatorio(_texto(Producto, 'nombre'))),
+        ('categoria', _obligatorio(categoria)),
+        ('tipo_producto', _obligatorio(_opcion(tipos, 'Seleccione un tipo de producto válido.'))),
+        ('precio', precio),
+        ('stock', stock),
+        ('descripcion', _texto(Producto, 'descripcion')),
+        ('principio_activo', _texto(Producto, 'principio_activo')),
+        ('concentracion', _texto(Producto, 'concentracion')),
+        ('laboratorio', _texto(Producto, 'laboratorio')),
+    ]
+    if fila.get('activo'):
+        conversiones.append(('activo', _booleano))
+    return _convertir_fila(fila, conversiones)
+
+
+# Mismas reglas que ProductoForm (clean_codigo, clean_nombre, clean_precio,
+# clean_stock, clean_descripcion); los datos de medicamentos dependen del tipo
+VALIDACIONES_PRODUCTO = (
+    ('codigo', validar_columna_codigo_producto),
+    ('nombre', validar_columna_nombre_producto),
+    ('precio', validar_columna_precio),
+    ('stock', validar_columna_stock),
+    ('descripcion', validar_columna_descripcion_producto),
+)
+VALIDACIONES_MEDICAMENTO = (
+    ('principio_activo', validar_columna_principio_activo),
+    ('concentracion', validar_columna_concentracion),
+    ('laboratorio', validar_columna_laboratorio),
+)
+
+
+def importar_productos(archivo, actualizar=True, simular=False, tamano_lote=TAMANO_LOTE_IMPORTACION):
+    """
+    Importa productos desde un CSV identificándolos por ``codigo``.
+
+    Los códigos nuevos se crean; los existentes se actualizan (solo en las
+    columnas presentes en el archivo) o, con ``actualizar=False``, se
+    informan como error igual que en ProductoForm. Con ``simular`` se
+    valida todo sin escribir. Devuelve un ResultadoImportacion.
+    """
+    resultado = ResultadoImportacion(simulado=simular)
+    encabezados, filas = leer_csv(archivo, ALIAS_PRODUCTO)
+    faltantes = [columna for columna in ('codigo', 'nombre', 'categoria', 'tipo_producto') if columna not in encabezados]
+    if faltantes:
+        resultado.agregar_error(1, ', '.join(faltantes), 'Faltan columnas obligatorias en el encabezado.')
+        return resultado
+    # Al actualizar solo se escriben las columnas que trae el archivo
+    campos = [
+        'categoria_id' if columna == 'categoria' else columna
+        for columna in COLUMNAS_PRODUCTO if columna in encabezados and columna != 'codigo'
+    ]
+
+    # Referencias en memoria: categorías activas por nombre o id y tipos por valor o etiqueta
+    categorias = {}
+    for categoria_id, nombre in Categoria.objects.filter(activo=True).values_list('id', 'nombre'):
+        categorias[nombre.lower()] = categoria_id
+        categorias[str(categoria_id)] = categoria_id
+    tipos = _mapa_opciones(Producto.TIPO_PRODUCTO_CHOICES)
+
+    convertidas = [(numero, *_convertir_producto(fila, categorias, tipos)) for numero, fila in filas]
+    # Unicidad del código y stock reservado: una sola consulta para todo el archivo
+    existentes = Producto.objects.in_bulk(
+        {datos['codigo'] for _numero, datos, _errores in convertidas if datos.get('codigo')},
+        field_name='codigo',
+    )
+    # Los datos de medicamento que no trae el archivo se conservan al actualizar
+    ausentes = [columna for columna, _validador in VALIDACIONES_MEDICAMENTO if columna not in encabezados]
+    for _numero, datos, _errores in convertidas:
+        producto = existentes.get(datos.get('codigo'))
+        if producto is not None:
+            for columna in ausentes:
+                datos[columna] = getattr(producto, columna)
+
+    for columna, validador in VALIDACIONES_PRODUCTO:
+        _validar_columna(convertidas, columna, validador)
+    for columna, validador in VALIDACIONES_MEDICAMENTO:
+        _validar_columna(convertidas, columna, validador, 'tipo_producto')
+
+    validas = {}  # codigo -> (fila, datos)
+    for numero, datos, errores in convertidas:
+        codigo = datos.get('codigo')
+        if codigo and 'codigo' not in errores and codigo in validas:
+            errores['codigo'] = f'Código repetido (ya aparece en la fila {validas[codigo][0]}).'
+        for columna, mensaje in errores.items():
+            resultado.agregar_error(numero, columna, mensaje)
+        if not errores:
+            datos['categoria_id'] = datos.pop('categoria')
+            validas[codigo] = (numero, datos)
+
+    nuevos = []
+    modificados = []
+    categorias_afectadas = set()
+    ahora = timezone.now()
+    for codigo, (numero, datos) in validas.items():
+        producto = existentes.get(codigo)
+        if producto is None:
+            nuevos.append(Producto(**datos))
+            categorias_afectadas.add(datos['categoria_id'])
+            continue
+        if not actualizar:
+            resultado.agregar_error(numero, 'codigo', 'Ya existe un producto con este código.')
+            continue
+        if 'stock' in campos and datos['stock'] < producto.stock_reservado:
+            resultado.agregar_error(
+                numero, 'stock',
+                f'El stock no puede ser menor que las unidades reservadas ({producto.stock_reservado}).',
+            )
+            continue
+        categorias_afectadas.update((producto.categoria_id, datos['categoria_id']))
+        for campo in campos:
+            if campo in datos:
+                setattr(producto, campo, datos[campo])
+        producto.fecha_modificacion = ahora
+        modificados.append(producto)
+
+    resultado.creados = len(nuevos)
+    resultado.actualizados = len(modificados)
+    if simular or not (nuevos or modificados):
+        return resultado
+
+    with transaction.atomic():
+        Producto.objects.bulk_create(nuevos, batch_size=tamano_lote)
+        if modificados:
+            Producto.objects.bulk_update(modificados, campos + ['fecha_modificacion'], batch_size=tamano_lote)
+        recalcular_resumen_inventario(categorias_afectadas)
+        if nuevos or 'stock' in campos:
+            # El stock importado queda como movimiento (saldo inicial o ajuste)
+            codigos = [producto.codigo for producto in nuevos + modificados]
+            for inicio in range(0, len(codigos), tamano_lote):
+                conciliar_stock(
+                    Producto.objects.filter(codigo__in=codigos[inicio:inicio + tamano_lote]),
+                    motivo='Importación CSV',
+                )
+    invalidar('catalogo')
+    return resultado
+
+
+def _valores_existentes(modelo, campo, valores):
+    """
+    Valores de ``campo`` que ya existen entre ``valores``, con una consulta
+    ``IN`` (dividida solo si el motor limita los parámetros, como SQLite).
+    """
+    valores = list(valores)
+    tamano = connection.features.max_query_params or len(valores) or 1
+    existentes = set()
+    for inicio in range(0, len(valores), tamano):
+        existentes.update(
+            modelo.objects.filter(**{f'{campo}__in': valores[inicio:inicio + tamano]})
+            .values_list(campo, flat=True)
+        )
+    return existentes
+
+
+def _convertir_mascota(fila, tipos, veterinarios, sexos, tamanos):
+    """Convierte una fila de mascotas; la validación se hace por columnas"""
+
+    def tipo_animal(valor):
+        tipo = tipos.get(valor.lower())
+        if tipo is None:
+            raise ValidationError('Tipo de animal inexistente o inactivo.')
+        return tipo
+
+    def veterinario(valor):
+        if not valor:
+            return None
+        veterinario_id = veterinarios.get(valor.lower())
+        if veterinario_id is None:
+            raise ValidationError('Veterinario inexistente o inactivo.')
+        return veterinario_id
+
+    def edad(valor):
+        if not valor:
+            return None
+        return _entero(valor)
+
+    def peso(valor):
+        if not valor:
+            return None
+        numero = _decimal(valor.replace(',', '.'))
+        if numero.as_tuple().exponent < -2:
+            raise ValidationError('El peso admite como máximo 2 decimales.')
+        return numero
+
+    def numero_chip(valor):
+        return valor.upper() or None
+
+    def email(valor):
+        return valor.lower()
+
+    return _convertir_fila(fila, [
+        ('tipo_animal', _obligatorio(tipo_animal)),
+        ('nombre', _obligatorio(_texto(Mascota, 'nombre'))),
+        ('raza', _texto(Mascota, 'raza')),
+        ('edad', edad),
+        ('sexo', _obligatorio(_opcion(sexos, 'Seleccione macho o hembra.'))),
+        ('tamaño', _opcion(tamanos, 'Seleccione un tamaño válido.')),
+        ('peso', peso),
+        ('color', _texto(Mascota, 'color')),
+        ('propietario_nombre', _obligatorio(_texto(Mascota, 'propietario_nombre'))),
+        ('propietario_telefono', _texto(Mascota, 'propietario_telefono')),
+        ('propietario_email', email),
+        ('propietario_direccion', _texto(Mascota, 'propietario_direccion')),
+        ('veterinario_encargado', veterinario),
+        ('numero_chip', numero_chip),
+        ('observaciones', _texto(Mascota, 'observaciones')),
+    ])
+
+
+# Mismas reglas que MascotaForm; los límites por especie (clean_peso y
+# clean_edad) se validan aparte porque dependen del tipo de animal
+VALIDACIONES_MASCOTA = (
+    ('nombre', validar_columna_nombre_mascota),
+    ('edad', validar_columna_edad),
+    ('peso', validar_columna_peso),
+    ('propietario_nombre', validar_columna_nombre_propietario),
+    ('propietario_telefono', validar_columna_telefono),
+    ('propietario_email', validar_columna_email),
+    ('numero_chip', validar_columna_numero_chip),
+)
+
+
+def importar_mascotas(archivo, actualizar=False, simular=False, tamano_lote=TAMANO_LOTE_IMPORTACION):
+    """
+    Importa mascotas (pacientes de otra clínica) desde un CSV.
+
+    El tipo de animal y el veterinario encargado se indican por nombre. Los
+    microchips repetidos dentro del archivo se informan como error; los que
+    ya existen en la base de datos también, salvo con ``actualizar``, que
+    actualiza esas mascotas (solo en las columnas presentes en el archivo).
+    Si alguna fila tiene errores no se importa ninguna, para poder corregir
+    el archivo y repetir la carga completa; con ``simular`` solo se valida.
+    Devuelve un ResultadoImportacion.
+    """
+    resultado = ResultadoImportacion(simulado=simular)
+    encabezados, filas = leer_csv(archivo, ALIAS_MASCOTA)
+    faltantes = [columna for columna in COLUMNAS_OBLIGATORIAS_MASCOTA if columna not in encabezados]
+    if faltantes:
+        resultado.agregar_error(1, ', '.join(faltantes), 'Faltan columnas obligatorias en el encabezado.')
+        return resultado
+    # Al actualizar solo se escriben las columnas que trae el archivo
+    campos = [
+        f'{columna}_id' if columna in ('tipo_animal', 'veterinario_encargado') else columna
+        for columna in COLUMNAS_MASCOTA if columna in encabezados and columna != 'numero_chip'
+    ]
+
+    # Referencias en memoria: una consulta por tabla para todo el archivo
+    # El tipo se convierte a su nombre registrado (lo usan los límites por especie) y al final a su id
+    ids_tipo = {
+        nombre: tipo_id for tipo_id, nombre in TipoAnimal.objects.filter(activo=True).values_list('id', 'nombre')
+    }
+    tipos = {nombre.lower(): nombre for nombre in ids_tipo}
+    veterinarios = {}
+    for veterinario_id, nombre in Veterinario.objects.filter(activo=True).order_by('-id').values_list('id', 'nombre'):
+        veterinarios[nombre.lower()] = veterinario_id
+    sexos = _mapa_opciones(Mascota.SEXO_CHOICES)
+    sexos.update({'m': 'macho', 'h': 'hembra', 'f': 'hembra'})
+    tamanos = _mapa_opciones(Mascota.TAMAÑO_CHOICES)
+
+    convertidas = [
+        (numero, *_convertir_mascota(fila, tipos, veterinarios, sexos, tamanos)) for numero, fila in filas
+    ]
+    for columna, validador in VALIDACIONES_MASCOTA:
+        _validar_columna(convertidas, columna, validador)
+    _validar_columna(convertidas, 'peso', validar_columna_peso_por_tipo, 'tipo_animal')
+    _validar_columna(convertidas, 'edad', validar_columna_edad_por_tipo, 'tipo_animal')
+
+    validas = []
+    chips = {}  # numero_chip -> fila
+    for numero, datos, errores in convertidas:
+        chip = datos.get('numero_chip')
+        if chip and 'numero_chip' not in errores:
+            if chip in chips:
+                errores['numero_chip'] = f'Microchip repetido (ya aparece en la fila {chips[chip]}).'
+            else:
+                chips[chip] = numero
+        for columna, mensaje in errores.items():
+            resultado.agregar_error(numero, columna, mensaje)
+        if not errores:
+            datos['tipo_animal_id'] = ids_tipo[datos.pop('tipo_animal')]
+            datos['veterinario_encargado_id'] = datos.pop('veterinario_encargado')
+            validas.append((numero, datos))
+
+    # Unicidad del microchip: una consulta para todos los chips del archivo
+    existentes = {}
+    if actualizar:
+        existentes = Mascota.objects.in_bulk(list(chips), field_name='numero_chip')
+    else:
+        for chip in _valores_existentes(Mascota, 'numero_chip', chips):
+            resultado.agregar_error(chips[chip], 'numero_chip', 'Ya existe una mascota con este número de chip.')
+    resultado.errores.sort(key=lambda error: error[0])
+
+    if resultado.errores:
+        return resultado
+    nuevas = []
+    modificadas = []
+    ahora = timezone.now()
+    for _numero, datos in validas:
+        mascota = existentes.get(datos['numero_chip'])
+        if mascota is None:
+            nuevas.append(Mascota(**datos))
+            continue
+        for campo in campos:
+            setattr(mascota, campo, datos[campo])
+        mascota.fecha_modificacion = ahora
+        modificadas.append(mascota)
+
+    resultado.creados = len(nuevas)
+    resultado.actualizados = len(modificadas)
+    if simular:
+        return resultado
+    with transaction.atomic():
+        Mascota.objects.bulk_create(nuevas, batch_size=tamano_lote)
+        if modificadas:
+            Mascota.objects.bulk_update(modificadas, campos + ['fecha_modificacion'], batch_size=tamano_lote)
+            # bulk_update no emite post_save: el documento de búsqueda de sus citas se actualiza aquí
+            for inicio in range(0, len(modificadas), tamano_lote):
+                Cita.objects.filter(mascota__in=modificadas[inicio:inicio + tamano_lote]).update(
+                    documento_busqueda=Cita.expresion_documento_busqueda()
+                )
+    return resultado
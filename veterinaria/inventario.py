@@ -0,0 +1,171 @@
+"""
+Libro de movimientos de stock de los productos.
+
+Cada cambio de stock queda registrado como un MovimientoStock (tabla de
+solo inserción) y se aplica con un único UPDATE condicional sobre el
+producto, por ejemplo ``SET stock = stock - n WHERE stock - stock_reservado
+>= n``. El stock nunca se lee para volver a escribirlo, así que dos
+procesos que venden o reponen el mismo producto a la vez no se pisan.
+Dentro de la transacción primero se inserta el movimiento y al final se
+hace el UPDATE: la fila del producto queda bloqueada solo desde ese UPDATE
+hasta el commit. Si la condición no se cumple (stock insuficiente) se
+revierte todo y se lanza ValidationError.
+
+El resumen de inventario solo cambia cuando el stock cruza los umbrales de
+"con stock" o "stock bajo", y ese ajuste se hace después del commit para
+no alargar el bloqueo. También después del commit se invalidan las
+páginas cacheadas del catálogo, porque el UPDATE no emite post_save. El
+comando conciliar_stock compara periódicamente el stock de cada producto
+con la suma de sus movimientos, registra como ajuste las diferencias
+(cambios hechos fuera de este módulo, como las cargas masivas) y
+recalcula los resúmenes de inventario.
+"""
+from functools import partial
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import invalidar
+from .models import MovimientoStock, Producto
+from .resumenes import aplicar_cambio_inventario
+
+CAMPOS_SALDO = ('categoria_id', 'activo', 'precio', 'stock', 'stock_reservado')
+
+
+def _cantidad_positiva(cantidad):
+    if not isinstance(cantidad, int) or cantidad <= 0:
+        raise ValueError(f'La cantidad debe ser un entero positivo: {cantidad!r}')
+    return cantidad
+
+
+def _mover(producto, tipo, cantidad=0, cantidad_reservada=0, motivo='', condicion=None, error=''):
+    """
+    Registra el movimiento y aplica las variaciones al producto (instancia
+    o id). Si el producto no cumple ``condicion`` no se guarda nada y se
+    lanza ValidationError con ``error``. Devuelve el MovimientoStock.
+    """
+    producto_id = getattr(producto, 'pk', producto)
+    cambios = {}
+    if cantidad:
+        cambios['stock'] = F('stock') + cantidad
+    if cantidad_reservada:
+        cambios['stock_reservado'] = F('stock_reservado') + cantidad_reservada
+
+    with transaction.atomic():
+        movimiento = MovimientoStock.objects.create(
+            producto_id=producto_id, tipo=tipo, cantidad=cantidad,
+            cantidad_reservada=cantidad_reservada, motivo=motivo[:200],
+        )
+        # Último paso de la transacción: el bloqueo de la fila dura hasta el commit
+        productos = Producto.objects.filter(pk=producto_id)
+        if condicion is not None:
+            productos = productos.filter(condicion)
+        if not productos.update(fecha_modificacion=timezone.now(), **cambios):
+            raise ValidationError(error or 'Producto inexistente.', code='stock_insuficiente')
+        despues = Producto.objects.filter(pk=producto_id).values(*CAMPOS_SALDO).get()
+        if cantidad:
+            antes = dict(despues, stock=despues['stock'] - cantidad)
+            transaction.on_commit(partial(aplicar_cambio_inventario, antes, despues))
+        # update() no emite post_save: las páginas del catálogo se invalidan aquí
+        transaction.on_commit(partial(invalidar, 'catalogo'))
+
+    if isinstance(producto, Producto):
+        producto.stock = despues['stock']
+        producto.stock_reservado = despues['stock_reservado']
+    return movimiento
+
+
+def reponer(producto, cantidad, motivo=''):
+    """Ingreso de unidades (compra, devolución de un cliente)"""
+    return _mover(producto, 'reposicion', cantidad=_cantidad_positiva(cantidad), motivo=motivo)
+
+
+def reservar(producto, cantidad, motivo=''):
+    """Aparta unidades libres (por ejemplo, para una cita o un pedido)"""
+    _cantidad_positiva(cantidad)
+    return _mover(
+        producto, 'reserva', cantidad_reservada=cantidad, motivo=motivo,
+        condicion=Q(stock__gte=F('stock_reservado') + cantidad),
+        error=f'No hay {cantidad} unidades libres para reservar.',
+    )
+
+
+def liberar_reserva(producto, cantidad, motivo=''):
+    """Devuelve a libres unidades reservadas que no se usarán"""
+    _cantidad_positiva(cantidad)
+    return _mover(
+        producto, 'liberacion', cantidad_reservada=-cantidad, motivo=motivo,
+        condicion=Q(stock_reservado__gte=cantidad),
+        error=f'No hay {cantidad} unidades reservadas para liberar.',
+    )
+
+
+def consumir(producto, cantidad, motivo='', reservado=False):
+    """
+    Descuenta unidades vendidas o usadas. Con ``reservado`` se toman de una
+    reserva previa; si no, de las unidades libres.
+    """
+    _cantidad_positiva(cantidad)
+    if reservado:
+        return _mover(
+            producto, 'consumo', cantidad=-cantidad, cantidad_reservada=-cantidad, motivo=motivo,
+            condicion=Q(stock_reservado__gte=cantidad),
+            error=f'No hay {cantidad} unidades reservadas.',
+        )
+    return _mover(
+        producto, 'consumo', cantidad=-cantidad, motivo=motivo,
+        condicion=Q(stock__gte=F('stock_reservado') + cantidad),
+        error=f'No hay {cantidad} unidades disponibles.',
+    )
+
+
+def ajustar(producto, diferencia, motivo=''):
+    """Corrige el stock en ``diferencia`` unidades (inventario físico, mermas)"""
+    if not isinstance(diferencia, int) or not diferencia:
+        raise ValueError(f'La diferencia debe ser un entero distinto de cero: {diferencia!r}')
+    condicion = None
+    if diferencia < 0:
+        condicion = Q(stock__gte=F('stock_reservado') - diferencia)
+    return _mover(
+        producto, 'ajuste', cantidad=diferencia, motivo=motivo, condicion=condicion,
+        error='El stock no puede quedar bajo las unidades reservadas ni ser negativo.',
+    )
+
+
+def conciliar_stock(productos=None, registrar=True, motivo='Conciliación'):
+    """
+    Compara el stock y el stock reservado de los productos (queryset, por
+    defecto todos) con la suma de sus movimientos, en una sola consulta.
+
+    Devuelve las diferencias como diccionarios con id, codigo, stock,
+    stock_reservado, stock_registrado y reservado_registrado. Con
+    ``registrar`` cada diferencia se guarda como un ajuste: el stock del
+    producto se toma como el valor correcto.
+    """
+    if productos is None:
+        productos = Producto.objects.all()
+    diferencias = list(
+        productos.order_by().annotate(
+            stock_registrado=Coalesce(Sum('movimientos_stock__cantidad'), 0),
+            reservado_registrado=Coalesce(Sum('movimientos_stock__cantidad_reservada'), 0),
+        ).exclude(
+            stock=F('stock_registrado'), stock_reservado=F('reservado_registrado'),
+        ).values('id', 'codigo', 'stock', 'stock_reservado', 'stock_registrado', 'reservado_registrado')
+    )
+    if registrar and diferencias:
+        MovimientoStock.objects.bulk_create(
+            (
+                MovimientoStock(
+                    producto_id=fila['id'], tipo='ajuste', motivo=motivo,
+                    cantidad=fila['stock'] - fila['stock_registrado'],
+                    cantidad_reservada=fila['stock_reservado'] - fila['reservado_registrado'],
+                )
+                for fila in diferencias
+            ),
+            batch_size=1000,
+        )
+        transaction.on_commit(partial(invalidar, 'catalogo'))
+    return diferencias
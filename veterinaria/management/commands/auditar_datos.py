@@ -0,0 +1,92 @@
+import csv
+import time
+from collections import Counter
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from veterinaria.models import Mascota, Producto
+from veterinaria.validators import (
+    validar_columna_codigo_producto, validar_columna_edad, validar_columna_edad_por_tipo,
+    validar_columna_email, validar_columna_nombre_mascota, validar_columna_nombre_producto,
+    validar_columna_nombre_propietario, validar_columna_numero_chip, validar_columna_peso,
+    validar_columna_peso_por_tipo, validar_columna_precio, validar_columna_stock, validar_columna_telefono,
+)
+
+# modelo -> (columnas leídas, [(columna informada, validador, columnas que recibe)])
+AUDITORIAS = {
+    'mascotas': (Mascota, (
+        'nombre', 'propietario_nombre', 'propietario_telefono', 'propietario_email', 'numero_chip',
+        'peso', 'edad', 'tipo_animal__nombre',
+    ), [
+        ('nombre', validar_columna_nombre_mascota, ('nombre',)),
+        ('propietario_nombre', validar_columna_nombre_propietario, ('propietario_nombre',)),
+        ('propietario_telefono', validar_columna_telefono, ('propietario_telefono',)),
+        ('propietario_email', validar_columna_email, ('propietario_email',)),
+        ('numero_chip', validar_columna_numero_chip, ('numero_chip',)),
+        ('peso', validar_columna_peso, ('peso',)),
+        ('edad', validar_columna_edad, ('edad',)),
+        ('peso', validar_columna_peso_por_tipo, ('peso', 'tipo_animal__nombre')),
+        ('edad', validar_columna_edad_por_tipo, ('edad', 'tipo_animal__nombre')),
+    ]),
+    'productos': (Producto, ('codigo', 'nombre', 'precio', 'stock'), [
+        ('codigo', validar_columna_codigo_producto, ('codigo',)),
+        ('nombre', validar_columna_nombre_producto, ('nombre',)),
+        ('precio', validar_columna_precio, ('precio',)),
+        ('stock', validar_columna_stock, ('stock',)),
+    ]),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Revisa los registros guardados con las reglas actuales de los formularios (datos anteriores '
+        'a una regla, importados o editados fuera de la aplicación) e informa los errores por columna'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('modelo', nargs='*', help=f'{", ".join(AUDITORIAS)} (por defecto, todos)')
+        parser.add_argument('--lote', type=int, default=5000, help='Registros leídos y validados por vez')
+        parser.add_argument('--reporte', help='Guarda cada error (modelo, id, columna, error) en este CSV')
+
+    def handle(self, *args, **options):
+        desconocidos = set(options['modelo']) - set(AUDITORIAS)
+        if desconocidos:
+            raise CommandError(f'Modelos desconocidos: {", ".join(sorted(desconocidos))}')
+        reporte = open(options['reporte'], 'w', encoding='utf-8', newline='') if options['reporte'] else None
+        escritor = csv.writer(reporte) if reporte else None
+        if escritor:
+            escritor.writerow(['modelo', 'id', 'columna', 'error'])
+        try:
+            for nombre in options['modelo'] or AUDITORIAS:
+                self.auditar(nombre, max(1, options['lote']), escritor)
+        finally:
+            if reporte:
+                reporte.close()
+
+    def auditar(self, nombre, lote, escritor):
+        modelo, columnas, validaciones = AUDITORIAS[nombre]
+        inicio = time.perf_counter()
+        filas = modelo.objects.order_by('pk').values_list('pk', *columnas).iterator(chunk_size=lote)
+        posicion = {columna: indice for indice, columna in enumerate(columnas, start=1)}
+        total = 0
+        errores = Counter()
+        while True:
+            bloque = list(islice(filas, lote))
+            if not bloque:
+                break
+            total += len(bloque)
+            # Una lista por columna y una pasada de cada validador sobre todo el bloque
+            valores = list(zip(*bloque))
+            for columna, validador, entradas in validaciones:
+                mascara = validador(*(valores[posicion[entrada]] for entrada in entradas))
+                for pk, mensaje in zip(valores[0], mascara):
+                    if mensaje is not None:
+                        errores[columna] += 1
+                        if escritor:
+                            escritor.writerow([nombre, pk, columna, mensaje])
+
+        segundos = time.perf_counter() - inicio
+        for columna, cantidad in sorted(errores.items()):
+            self.stdout.write(f'  {nombre}.{columna}: {cantidad} errores')
+        mensaje = f'{nombre}: {total} registros revisados, {sum(errores.values())} errores ({segundos:.1f} s)'
+        self.stdout.write(self.style.WARNING(mensaje) if errores else self.style.SUCCESS(mensaje))
@@ -0,0 +1,164 @@
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from veterinaria.models import Categoria
+
+PERFILES = {
+    'wsgi': ['veterinaria_sistema.wsgi:application', '--worker-class', 'sync'],
+    'asgi': ['veterinaria_sistema.asgi:application', '--worker-class', 'uvicorn_worker.UvicornWorker'],
+}
+
+class Command(BaseCommand):
+    help = (
+        'Levanta gunicorn con workers síncronos (WSGI) y con workers de uvicorn (ASGI) sobre la '
+        'base de datos configurada, envía la misma carga concurrente a los listados y compara '
+        'peticiones por segundo y latencia (p50/p95) en JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Procesos de gunicorn en ambos perfiles')
+        parser.add_argument('--concurrencia', type=int, default=32, help='Clientes simultáneos')
+        parser.add_argument('--peticiones', type=int, default=400, help='Peticiones por URL y perfil')
+        parser.add_argument('--cliente-lento', type=int, default=0, metavar='MS',
+                            help='Pausa de cada cliente a mitad de la petición, para simular redes lentas')
+        parser.add_argument('--puerto', type=int, default=8765)
+        parser.add_argument('--perfil', action='append', choices=sorted(PERFILES),
+                            help='Perfiles a medir (por defecto, ambos)')
+        parser.add_argument('--salida', help='Archivo JSON de salida (por defecto, la salida estándar)')
+
+    def handle(self, *args, **options):
+        try:
+            import gunicorn  # noqa: F401
+            import uvicorn_worker  # noqa: F401
+        except ImportError as error:
+            raise CommandError(f'Falta {error.name}: instale requirements.txt') from error
+        if options['concurrencia'] < 1 or options['peticiones'] < 1:
+            raise CommandError('--concurrencia y --peticiones deben ser mayores que cero.')
+
+        categoria = Categoria.objects.filter(activo=True).order_by('id').first()
+        urls = [reverse('home'), reverse('mascota_list'), reverse('cita_list')]
+        if categoria:
+            urls.insert(1, reverse('productos_categoria', args=[categoria.pk]))
+
+        resultado = {
+            'entorno': {
+                'workers': options['workers'],
+                'concurrencia': options['concurrencia'],
+                'peticiones': options['peticiones'],
+                'cliente_lento_ms': options['cliente_lento'],
+                'settings': os.environ.get('DJANGO_SETTINGS_MODULE'),
+            },
+        }
+        for perfil in options['perfil'] or sorted(PERFILES, reverse=True):
+            self.stderr.write(f'Perfil {perfil}...')
+            with _Servidor(perfil, options['puerto'], options['workers']) as puerto:
+                resultado[perfil] = {
+                    url: self.medir(puerto, url, options) for url in urls
+                }
+
+        salida = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(salida)
+            self.stdout.write(self.style.SUCCESS(f'Resultado guardado en {options["salida"]}'))
+        else:
+            self.stdout.write(salida)
+
+    def medir(self, puerto, url, options):
+        pausa = options['cliente_lento'] / 1000
+        # Calentamiento: cachés, conexiones y plantillas de cada worker
+        for _ in range(options['workers'] * 2):
+            _peticion(puerto, url, 0)
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrencia']) as ejecutor:
+            mediciones = list(ejecutor.map(
+                lambda _indice: _peticion(puerto, url, pausa), range(options['peticiones'])
+            ))
+        segundos = time.perf_counter() - inicio
+
+        duraciones = [duracion for duracion, estado in mediciones if estado == 200]
+        errores = len(mediciones) - len(duraciones)
+        resumen = {
+            'peticiones_por_segundo': round(len(duraciones) / segundos, 1),
+            'p50_ms': round(_percentil(duraciones, 50) * 1000, 2) if duraciones else None,
+            'p95_ms': round(_percentil(duraciones, 95) * 1000, 2) if duraciones else None,
+            'errores': errores,
+        }
+        self.stderr.write(f'  {url}: {resumen}')
+        return resumen
+
+
+class _Servidor:
+    """gunicorn en un subproceso, mientras dura el bloque with"""
+
+    def __init__(self, perfil, puerto, workers):
+        self.comando = [
+            sys.executable, '-m', 'gunicorn', *PERFILES[perfil],
+            '--bind', f'127.0.0.1:{puerto}', '--workers', str(workers),
+            '--chdir', str(settings.BASE_DIR), '--log-level', 'warning',
+        ]
+        self.puerto = puerto
+        self.proceso = None
+
+    def __enter__(self):
+        entorno = dict(os.environ, DB_CONN_MAX_AGE=os.environ.get('DB_CONN_MAX_AGE', '0'))
+        self.proceso = subprocess.Popen(self.comando, env=entorno)
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite:
+            if self.proceso.poll() is not None:
+                raise CommandError(f'gunicorn terminó con código {self.proceso.returncode}')
+            try:
+                socket.create_connection(('127.0.0.1', self.puerto), timeout=1).close()
+                return self.puerto
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise CommandError('gunicorn no respondió en 30 segundos')
+
+    def __exit__(self, *exc):
+        self.proceso.terminate()
+        try:
+            self.proceso.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.proceso.kill()
+            self.proceso.wait()
+
+
+def _peticion(puerto, url, pausa):
+    """
+    GET con una conexión nueva; con ``pausa`` el cliente envía la primera
+    línea, espera y luego el resto, como un cliente en una red lenta.
+    Devuelve (segundos, código de estado), con estado 0 si la conexión falló.
+    """
+    inicio = time.perf_counter()
+    try:
+        with socket.create_connection(('127.0.0.1', puerto), timeout=60) as conexion:
+            conexion.sendall(f'GET {url} HTTP/1.1\r\n'.encode())
+            if pausa:
+                time.sleep(pausa)
+            conexion.sendall(b'Host: localhost\r\nConnection: close\r\n\r\n')
+            respuesta = bytearray()
+            while True:
+                bloque = conexion.recv(65536)
+                if not bloque:
+                    break
+                respuesta += bloque
+    except OSError:
+        return time.perf_counter() - inicio, 0
+    estado = int(respuesta[9:12]) if respuesta[:5] == b'HTTP/' else 0
+    return time.perf_counter() - inicio, estado
+
+
+def _percentil(valores, percentil):
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(percentil / 100 * len(ordenados)) - 1)]
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from veterinaria.inventario import conciliar_stock
+from veterinaria.models import Categoria
+from veterinaria.resumenes import recalcular_resumen_inventario
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el stock de cada producto con la suma de sus movimientos, registra las diferencias '
+        'como ajustes y recalcula el resumen de inventario (para ejecutar periódicamente)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--simular', action='store_true', help='Solo informa las diferencias, sin registrar ajustes')
+        parser.add_argument('--mostrar', type=int, default=20, help='Diferencias que se detallan en la salida')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        diferencias = conciliar_stock(registrar=not options['simular'])
+        for fila in diferencias[:options['mostrar']]:
+            self.stdout.write(
+                f"  {fila['codigo'] or fila['id']}: stock {fila['stock']} (movimientos {fila['stock_registrado']}), "
+                f"reservado {fila['stock_reservado']} (movimientos {fila['reservado_registrado']})"
+            )
+        if len(diferencias) > options['mostrar']:
+            self.stdout.write(f'  ... y {len(diferencias) - options["mostrar"]} más')
+
+        if not options['simular']:
+            recalcular_resumen_inventario(Categoria.objects.values_list('id', flat=True))
+        segundos = time.perf_counter() - inicio
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS(f'Stock conciliado: sin diferencias ({segundos:.1f} s).'))
+        elif options['simular']:
+            self.stdout.write(self.style.WARNING(f'{len(diferencias)} productos con diferencias ({segundos:.1f} s).'))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'{len(diferencias)} productos con diferencias registradas como ajuste ({segundos:.1f} s).'
+            ))
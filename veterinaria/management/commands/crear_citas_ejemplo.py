@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import datetime, timedelta
-from veterinaria.models import Cita, Mascota
+from veterinaria.models import Cita, Mascota, Veterinario
 import random
 
 class Command(BaseCommand):
@@ -31,13 +31,8 @@ class Command(BaseCommand):
             'Consulta dermatológica',
             'Examen de sangre'
         ]
-        veterinarios = [
-            'Dr. García López',
-            'Dra. María Rodríguez',
-            'Dr. Carlos Mendoza',
-            'Dra. Ana Pérez',
-            'Dr. Luis Hernández'
-        ]
+        # Veterinarios registrados (ver crear_veterinarios); sin ellos las citas quedan sin asignar
+        veterinarios = list(Veterinario.objects.filter(activo=True)) or [None]
 
         # Crear citas de ejemplo
         citas_creadas = 0
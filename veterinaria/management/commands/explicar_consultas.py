@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.utils import timezone
+from veterinaria import views
+from veterinaria.agenda import citas_en_conflicto
+from veterinaria.models import Categoria, Cita, MovimientoStock, Producto, Veterinario
+from veterinaria.resumenes import STOCK_BAJO_MAXIMO
+
+class Command(BaseCommand):
+    help = 'Muestra el plan de ejecución (EXPLAIN) de las consultas de las vistas más usadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categoria', type=int, help='Categoría usada en las vistas por categoría (por defecto, la primera activa)')
+        parser.add_argument('--analizar', action='store_true', help='Ejecuta las consultas (EXPLAIN ANALYZE, solo PostgreSQL)')
+
+    def _listado(self, vista, ruta, **parametros):
+        """Queryset de una ListView tal como la pagina KeysetPaginationMixin"""
+        instancia = vista()
+        instancia.setup(RequestFactory().get(ruta, parametros))
+        queryset = instancia.get_queryset().order_by(*instancia.campos_keyset)
+        return queryset[:instancia.paginate_by + 1]
+
+    def handle(self, *args, **options):
+        categoria_id = options['categoria'] or (
+            Categoria.objects.filter(activo=True).values_list('id', flat=True).first() or 0
+        )
+        veterinario_id = Veterinario.objects.filter(activo=True).values_list('id', flat=True).first() or 0
+        producto_id = Producto.objects.filter(activo=True).values_list('id', flat=True).first() or 0
+        ahora = timezone.now()
+        consultas = [
+            ('Productos de una categoría (catálogo y mantenedor)',
+             Producto.objects.filter(categoria_id=categoria_id, activo=True).order_by('nombre')),
+            ('Listado de productos',
+             views.ProductoListView().get_queryset()[:views.ProductoListView.paginate_by]),
+            ('Productos activos con stock bajo',
+             Producto.objects.filter(activo=True, stock__gt=0, stock__lte=STOCK_BAJO_MAXIMO)),
+            ('Últimos movimientos de stock de un producto',
+             MovimientoStock.objects.filter(producto_id=producto_id)[:views.ProductoDetailView.movimientos_mostrados]),
+            ('Listado de mascotas', self._listado(views.MascotaListView, '/mascotas/')),
+            ('Listado de citas', self._listado(views.CitaListView, '/citas/')),
+            ('Citas filtradas por estado', self._listado(views.CitaListView, '/citas/', estado='programada')),
+            ('Agenda de un veterinario (próximos 7 días)',
+             Cita.objects.filter(veterinario_id=veterinario_id, fecha_hora__gte=ahora,
+                                 fecha_hora__lt=ahora + timedelta(days=7)).order_by('fecha_hora')),
+            ('Choques en la agenda de un veterinario',
+             citas_en_conflicto(veterinario_id, ahora, ahora + timedelta(minutes=30))),
+        ]
+
+        opciones = {}
+        if options['analizar']:
+            if connection.vendor == 'postgresql':
+                opciones = {'analyze': True, 'buffers': True}
+            else:
+                self.stderr.write('--analizar solo está disponible en PostgreSQL; se muestra el plan estimado.')
+
+        for titulo, queryset in consultas:
+            self.stdout.write(self.style.MIGRATE_HEADING(titulo))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**opciones))
+            self.stdout.write('')
@@ -0,0 +1,61 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection
+from veterinaria.datos_sinteticos import TAMANO_LOTE, generar_datos
+
+class Command(BaseCommand):
+    help = (
+        'Genera datos sintéticos en volumen (tipos de animal, veterinarios, productos, '
+        'mascotas y citas) para pruebas de carga'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mascotas', type=int, default=10000)
+        parser.add_argument('--citas', type=int, default=100000)
+        parser.add_argument('--productos', type=int, default=5000)
+        parser.add_argument('--veterinarios', type=int, default=10)
+        parser.add_argument('--tipos-animal', type=int, help='Cantidad de tipos de animal (por defecto, el catálogo base)')
+        parser.add_argument('--semilla', type=int, default=0, help='Misma semilla, mismos datos')
+        parser.add_argument('--inicio', type=int, default=0,
+                            help='Desplaza la numeración de códigos y microchips (para agregar más datos con la misma semilla)')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por INSERT')
+        parser.add_argument('--workers', type=int, default=1, help='Procesos que insertan en paralelo')
+
+    def handle(self, *args, **options):
+        for opcion in ('mascotas', 'citas', 'productos', 'veterinarios', 'inicio'):
+            if options[opcion] < 0:
+                raise CommandError(f'--{opcion} no puede ser negativo.')
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor que cero.')
+
+        procesos = max(1, options['workers'])
+        if procesos > 1 and connection.vendor == 'sqlite':
+            # SQLite admite un solo escritor a la vez: los procesos solo se bloquearían
+            self.stderr.write('SQLite no admite escrituras en paralelo; se usará un solo proceso.')
+            procesos = 1
+        if procesos > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+            self.stderr.write('Esta plataforma no permite fork; se usará un solo proceso.')
+            procesos = 1
+
+        inicio = time.perf_counter()
+        try:
+            totales = generar_datos(
+                mascotas=options['mascotas'], citas=options['citas'], productos=options['productos'],
+                veterinarios=options['veterinarios'], tipos_animal=options['tipos_animal'],
+                semilla=options['semilla'], tamano_lote=options['lote'], procesos=procesos,
+                inicio=options['inicio'],
+            )
+        except IntegrityError as error:
+            raise CommandError(
+                f'Códigos o microchips repetidos ({error}). Use otra --semilla o un --inicio mayor '
+                'para agregar datos a los ya generados.'
+            )
+        segundos = time.perf_counter() - inicio
+
+        filas = sum(totales.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'{totales["productos"]} productos, {totales["mascotas"]} mascotas y {totales["citas"]} citas '
+            f'generados en {segundos:.1f} s ({filas / max(segundos, 1e-9):.0f} filas/s, {procesos} proceso(s)).'
+        ))
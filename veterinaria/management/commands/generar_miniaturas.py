@@ -0,0 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from veterinaria.imagenes import generar_variantes
+from veterinaria.models import Categoria, Mascota, Producto
+
+class Command(BaseCommand):
+    help = 'Genera las variantes WebP/AVIF de las imágenes ya subidas (categorías, mascotas y productos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Imágenes procesadas en paralelo')
+        parser.add_argument('--forzar', action='store_true', help='Regenera también las variantes existentes')
+
+    def handle(self, *args, **options):
+        archivos = []
+        for modelo in (Categoria, Mascota, Producto):
+            for objeto in modelo.objects.exclude(imagen='').exclude(imagen__isnull=True).only('id', 'imagen'):
+                archivos.append(objeto.imagen)
+
+        creadas = errores = 0
+        # Pillow libera el GIL al decodificar y comprimir, así que los hilos escalan
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as ejecutor:
+            futuros = {
+                ejecutor.submit(generar_variantes, archivo, options['forzar']): archivo.name
+                for archivo in archivos
+            }
+            for futuro in as_completed(futuros):
+                try:
+                    creadas += len(futuro.result())
+                except OSError as error:
+                    errores += 1
+                    self.stderr.write(f'Error en {futuros[futuro]}: {error}')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'{creadas} variantes generadas para {len(archivos)} imágenes ({errores} con errores).')
+        )
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from veterinaria.importacion import TAMANO_LOTE_IMPORTACION, importar_mascotas
+
+class Command(BaseCommand):
+    help = (
+        'Importa mascotas desde un CSV (tipo_animal, nombre, sexo, propietario_nombre, numero_chip, ...). '
+        'Si alguna fila tiene errores no se importa ninguna'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo CSV (UTF-8, separado por comas o punto y coma)')
+        parser.add_argument('--actualizar', action='store_true',
+                            help='Actualiza las mascotas cuyo microchip ya existe en lugar de informarlo como error')
+        parser.add_argument('--simular', action='store_true', help='Valida el archivo sin guardar nada')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE_IMPORTACION, help='Filas por INSERT/UPDATE')
+        parser.add_argument('--reporte', help='Guarda los errores por fila en este archivo CSV')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                resultado = importar_mascotas(
+                    archivo, actualizar=options['actualizar'], simular=options['simular'],
+                    tamano_lote=max(1, options['lote']),
+                )
+        except OSError as error:
+            raise CommandError(f'No se pudo leer el archivo: {error}')
+        except UnicodeDecodeError:
+            raise CommandError('El archivo debe estar codificado en UTF-8.')
+        segundos = time.perf_counter() - inicio
+
+        if options['reporte']:
+            with open(options['reporte'], 'w', encoding='utf-8', newline='') as reporte:
+                reporte.write(resultado.reporte_csv())
+        else:
+            for fila, columna, mensaje in resultado.errores[:50]:
+                self.stderr.write(f'Fila {fila}, {columna}: {mensaje}')
+            if len(resultado.errores) > 50:
+                self.stderr.write(f'... y {len(resultado.errores) - 50} errores más (use --reporte).')
+
+        if resultado.errores:
+            self.stdout.write(self.style.WARNING(f'No se importó ninguna mascota. {resultado.resumen()}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{resultado.resumen()} ({segundos:.1f} s)'))
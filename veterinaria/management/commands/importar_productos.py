@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from veterinaria.importacion import TAMANO_LOTE_IMPORTACION, importar_productos
+
+class Command(BaseCommand):
+    help = (
+        'Importa productos desde un CSV (codigo, nombre, categoria, tipo_producto, precio, stock, ...), '
+        'creando los códigos nuevos y actualizando los existentes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo CSV (UTF-8, separado por comas o punto y coma)')
+        parser.add_argument('--solo-crear', action='store_true',
+                            help='Informa como error los códigos que ya existen en lugar de actualizarlos')
+        parser.add_argument('--simular', action='store_true', help='Valida el archivo sin guardar nada')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE_IMPORTACION, help='Filas por INSERT/UPDATE')
+        parser.add_argument('--reporte', help='Guarda los errores por fila en este archivo CSV')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                resultado = importar_productos(
+                    archivo, actualizar=not options['solo_crear'], simular=options['simular'],
+                    tamano_lote=max(1, options['lote']),
+                )
+        except OSError as error:
+            raise CommandError(f'No se pudo leer el archivo: {error}')
+        except UnicodeDecodeError:
+            raise CommandError('El archivo debe estar codificado en UTF-8.')
+        segundos = time.perf_counter() - inicio
+
+        if options['reporte']:
+            with open(options['reporte'], 'w', encoding='utf-8', newline='') as reporte:
+                reporte.write(resultado.reporte_csv())
+        else:
+            for fila, columna, mensaje in resultado.errores[:50]:
+                self.stderr.write(f'Fila {fila}, {columna}: {mensaje}')
+            if len(resultado.errores) > 50:
+                self.stderr.write(f'... y {len(resultado.errores) - 50} errores más (use --reporte).')
+
+        self.stdout.write(self.style.SUCCESS(f'{resultado.resumen()} ({segundos:.1f} s)'))
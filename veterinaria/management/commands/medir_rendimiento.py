@@ -0,0 +1,265 @@
+import json
+import math
+import platform
+import time
+from datetime import timedelta
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+from veterinaria import urls as urls_veterinaria
+from veterinaria.agenda import disponibilidad
+from veterinaria.datos_sinteticos import generar_datos
+from veterinaria.forms import CitaForm, MascotaForm, ProductoForm
+from veterinaria.models import Categoria, Cita, Mascota, Producto, TipoAnimal, Veterinario
+
+class Command(BaseCommand):
+    help = (
+        'Mide la latencia (p50/p95) y las consultas SQL de todas las vistas y formularios '
+        'sobre un conjunto de datos sintético, y entrega el resultado en JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mascotas', type=int, default=10000)
+        parser.add_argument('--citas', type=int, default=100000)
+        parser.add_argument('--productos', type=int, default=5000)
+        parser.add_argument('--semilla', type=int, default=0)
+        parser.add_argument('--repeticiones', type=int, default=20, help='Mediciones por URL y formulario')
+        parser.add_argument('--sin-cache', action='store_true', help='Vacía la caché antes de cada petición')
+        parser.add_argument('--usar-bd-actual', action='store_true',
+                            help='Mide sobre la base de datos configurada, sin crear una de prueba ni datos')
+        parser.add_argument('--salida', help='Archivo JSON de salida (por defecto, la salida estándar)')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        nombre_original = None
+        if not options['usar_bd_actual']:
+            nombre_original = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            inicio = time.perf_counter()
+            totales = {}
+            if not options['usar_bd_actual']:
+                totales = generar_datos(
+                    mascotas=options['mascotas'], citas=options['citas'],
+                    productos=options['productos'], semilla=options['semilla'],
+                )
+            segundos_datos = time.perf_counter() - inicio
+            self.stderr.write(f'Datos listos en {segundos_datos:.1f} s: {totales}')
+
+            resultado = {
+                'entorno': {
+                    'django': django.get_version(),
+                    'python': platform.python_version(),
+                    'motor': connection.vendor,
+                    'fecha': timezone.now().isoformat(),
+                    'repeticiones': options['repeticiones'],
+                    'sin_cache': options['sin_cache'],
+                },
+                'datos': {
+                    'mascotas': Mascota.objects.count(),
+                    'citas': Cita.objects.count(),
+                    'productos': Producto.objects.count(),
+                    'segundos_generacion': round(segundos_datos, 2),
+                },
+                'vistas': self.medir_vistas(options),
+                'formularios': self.medir_formularios(options['repeticiones']),
+            }
+        finally:
+            if nombre_original is not None:
+                connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+
+        salida = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(salida)
+            self.stdout.write(self.style.SUCCESS(f'Resultados guardados en {options["salida"]}'))
+        else:
+            self.stdout.write(salida)
+
+    # ------------------------------------------------------------------
+    # Vistas
+    # ------------------------------------------------------------------
+
+    def urls_a_medir(self):
+        """
+        Una o más URLs concretas por cada ruta de veterinaria/urls.py, más
+        variantes con filtros y búsqueda. Avisa si alguna ruta queda sin caso.
+        """
+        categoria = Categoria.objects.filter(activo=True).order_by('id').first()
+        producto = Producto.objects.filter(activo=True).order_by('id').first()
+        mascota = Mascota.objects.filter(activo=True).order_by('id').first()
+        cita = Cita.objects.order_by('-fecha_hora').first()
+        cita_futura = Cita.objects.filter(
+            fecha_hora__gt=timezone.now(), estado__in=['programada', 'confirmada']
+        ).order_by('fecha_hora').first() or cita
+        fecha = timezone.localtime(cita.fecha_hora).date() if cita else timezone.localdate()
+        manana = timezone.localdate() + timedelta(days=1)
+
+        objetos = {'producto': producto, 'mascota': mascota, 'cita': cita}
+        casos = {
+            'cita_list': [
+                ('', {}),
+                ('?buscar=luna', {}),
+                ('?estado=completada', {}),
+                (f'?fecha={fecha.isoformat()}', {}),
+                (f'?buscar=control&estado=completada&fecha={fecha.isoformat()}', {}),
+            ],
+            'exportar_citas': [
+                ('?estado=completada', {}),
+                (f'?fecha={fecha.isoformat()}&formato=jsonl', {}),
+            ],
+            'disponibilidad_citas': [
+                (f'?desde={manana.isoformat()}', {}),
+                (f'?desde={manana.isoformat()}&hasta={(manana + timedelta(days=6)).isoformat()}&tipo_cita=cirugia', {}),
+            ],
+        }
+        if categoria:
+            casos['productos_categoria'] = [
+                ('', {'categoria_id': categoria.pk}),
+                ('?buscar=alimento', {'categoria_id': categoria.pk}),
+                ('?buscar=antiparasitario+forte', {'categoria_id': categoria.pk}),
+            ]
+            casos['mantenedor_productos'] = [('', {'categoria_id': categoria.pk})]
+        if cita_futura:
+            # La edición solo está permitida para citas futuras
+            casos['cita_update'] = [('', {'pk': cita_futura.pk})]
+
+        urls = []
+        sin_caso = []
+        for patron in urls_veterinaria.urlpatterns:
+            if not isinstance(patron, URLPattern) or not patron.name:
+                continue
+            nombre = patron.name
+            if nombre in casos:
+                variantes = casos[nombre]
+            elif 'pk' in patron.pattern.converters:
+                objeto = objetos.get(nombre.split('_')[0])
+                if objeto is None:
+                    sin_caso.append(nombre)
+                    continue
+                variantes = [('', {'pk': objeto.pk})]
+            elif patron.pattern.converters:
+                sin_caso.append(nombre)
+                continue
+            else:
+                variantes = [('', {})]
+            for consulta, argumentos in variantes:
+                urls.append((nombre, reverse(nombre, kwargs=argumentos) + consulta))
+        if sin_caso:
+            self.stderr.write(f'Rutas sin caso de medición: {", ".join(sin_caso)}')
+        return urls
+
+    def medir_vistas(self, options):
+        cliente = Client()
+        resultados = {}
+        for nombre, url in self.urls_a_medir():
+            duraciones = []
+            consultas = []
+            estado = None
+            for _ in range(options['repeticiones']):
+                if options['sin_cache']:
+                    cache.clear()
+                contador = _ContadorConsultas()
+                with connection.execute_wrapper(contador):
+                    inicio = time.perf_counter()
+                    respuesta = cliente.get(url)
+                    if respuesta.streaming:
+                        for _bloque in respuesta.streaming_content:
+                            pass
+                    duraciones.append(time.perf_counter() - inicio)
+                consultas.append(contador.total)
+                estado = respuesta.status_code
+            resultados[url] = {'vista': nombre, 'estado': estado, **_resumen(duraciones, consultas)}
+            self.stderr.write(f'{url}: p50 {resultados[url]["p50_ms"]} ms')
+        return resultados
+
+    # ------------------------------------------------------------------
+    # Formularios
+    # ------------------------------------------------------------------
+
+    def datos_formularios(self):
+        categoria = Categoria.objects.filter(activo=True).order_by('id').first()
+        tipo = TipoAnimal.objects.filter(activo=True).order_by('id').first()
+        mascota = Mascota.objects.filter(activo=True).order_by('id').first()
+        veterinario = Veterinario.objects.filter(activo=True).order_by('id').first()
+        if veterinario is None:
+            raise CommandError('No hay veterinarios activos para medir CitaForm.')
+        # Primer horario libre del veterinario desde mañana, según su agenda
+        desde = timezone.localdate() + timedelta(days=1)
+        agenda = disponibilidad(desde, desde + timedelta(days=14), veterinario.pk, 'control')
+        horarios = next(iter(agenda.values()), {}).get('horarios')
+        if not horarios:
+            raise CommandError(f'{veterinario} no tiene horarios libres en las próximas dos semanas.')
+        fecha_hora = timezone.localtime(horarios[0]).strftime('%Y-%m-%dT%H:%M')
+        return {
+            'ProductoForm': (ProductoForm, {
+                'categoria': categoria.pk, 'nombre': 'Producto de prueba de rendimiento',
+                'descripcion': 'Descripción suficientemente larga del producto',
+                'tipo_producto': 'alimento', 'precio': '12990', 'codigo': 'BENCH-001',
+                'stock': '10',
+            }),
+            'MascotaForm': (MascotaForm, {
+                'tipo_animal': tipo.pk, 'nombre': 'Firulais', 'raza': 'Mestizo', 'edad': '3',
+                'sexo': 'macho', 'peso': '12.5', 'propietario_nombre': 'Juan Pérez Soto',
+                'propietario_telefono': '+56912345678', 'propietario_email': 'juan@example.com',
+                'numero_chip': 'ABCDEF0123456789',
+            }),
+            'CitaForm': (CitaForm, {
+                'mascota': mascota.pk, 'fecha_hora': fecha_hora,
+                'tipo_cita': 'control', 'estado': 'programada',
+                'motivo': 'Control de rutina para la prueba de rendimiento',
+                'veterinario': veterinario.pk, 'precio_estimado': '15000',
+            }),
+        }
+
+    def medir_formularios(self, repeticiones):
+        resultados = {}
+        for nombre, (formulario, datos) in self.datos_formularios().items():
+            duraciones = []
+            consultas = []
+            for _ in range(repeticiones):
+                contador = _ContadorConsultas()
+                with connection.execute_wrapper(contador):
+                    inicio = time.perf_counter()
+                    instancia = formulario(data=datos)
+                    valido = instancia.is_valid()
+                    duraciones.append(time.perf_counter() - inicio)
+                consultas.append(contador.total)
+                if not valido:
+                    # Medir un formulario inválido mide la ruta de error, no la de guardado
+                    raise CommandError(f'{nombre} no es válido: {instancia.errors.as_json()}')
+            resumen = _resumen(duraciones, consultas)
+            resumen['validaciones_por_segundo'] = round(len(duraciones) / sum(duraciones), 1)
+            resultados[nombre] = resumen
+        return resultados
+
+
+class _ContadorConsultas:
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
+
+def _percentil(valores, percentil):
+    """Percentil por rango más cercano"""
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(percentil / 100 * len(ordenados)) - 1)]
+
+
+def _resumen(duraciones, consultas):
+    return {
+        'p50_ms': round(_percentil(duraciones, 50) * 1000, 2),
+        'p95_ms': round(_percentil(duraciones, 95) * 1000, 2),
+        'max_ms': round(max(duraciones) * 1000, 2),
+        'consultas': max(consultas),
+    }
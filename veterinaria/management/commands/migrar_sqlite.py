@@ -0,0 +1,144 @@
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.core.serializers import sort_dependencies
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.migrations.recorder import MigrationRecorder
+from veterinaria.busqueda import crear_indices_busqueda
+from veterinaria.cache import invalidar
+from veterinaria.models import Categoria, TipoAnimal, Veterinario
+from veterinaria.referencias import invalidar_referencias
+
+ALIAS_ORIGEN = 'sqlite_origen'
+
+class Command(BaseCommand):
+    help = (
+        'Copia todos los datos de una base SQLite a la base de datos configurada (por ejemplo '
+        'PostgreSQL vía DATABASE_URL). El destino debe tener las migraciones aplicadas'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('origen', nargs='?', default='db.sqlite3', help='Archivo SQLite de origen')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Alias de la base de datos de destino')
+        parser.add_argument('--lote', type=int, default=2000, help='Filas por INSERT')
+        parser.add_argument('--vaciar', action='store_true',
+                            help='Borra los datos que ya tenga el destino antes de copiar')
+
+    def handle(self, *args, **options):
+        destino = connections[options['database']]
+        if destino.vendor == 'sqlite':
+            raise CommandError('El destino también es SQLite: defina DATABASE_URL con la base PostgreSQL.')
+        connections.settings[ALIAS_ORIGEN] = connections.configure_settings({
+            DEFAULT_DB_ALIAS: {},
+            ALIAS_ORIGEN: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': options['origen']},
+        })[ALIAS_ORIGEN]
+        origen = connections[ALIAS_ORIGEN]
+        try:
+            self.verificar_migraciones(origen, destino)
+            modelos = self.modelos_en_orden()
+            self.verificar_destino_vacio(modelos, destino, options['vaciar'])
+
+            inicio = time.perf_counter()
+            with transaction.atomic(using=destino.alias):
+                # Los tipos de contenido y permisos que creó migrate se reemplazan
+                # por los del origen, para conservar sus ids (los usan otras tablas).
+                tablas = [modelo._meta.db_table for modelo in modelos]
+                with destino.cursor() as cursor:
+                    for sentencia in destino.ops.sql_flush(no_style(), tablas, allow_cascade=True):
+                        cursor.execute(sentencia)
+                for modelo in modelos:
+                    copiadas = self.copiar(modelo, origen, destino, max(1, options['lote']))
+                    if copiadas:
+                        self.stdout.write(f'{modelo._meta.label}: {copiadas}')
+                # Las secuencias de los ids deben continuar después de los copiados
+                with destino.cursor() as cursor:
+                    for sentencia in destino.ops.sequence_reset_sql(no_style(), modelos):
+                        cursor.execute(sentencia)
+            crear_indices_busqueda(destino)
+            # La copia no emite señales: se descartan las páginas y referencias cacheadas
+            invalidar('categorias', 'catalogo')
+            invalidar_referencias(Categoria, TipoAnimal, Veterinario)
+        finally:
+            origen.close()
+            del connections[ALIAS_ORIGEN]
+            del connections.settings[ALIAS_ORIGEN]
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Datos copiados en {time.perf_counter() - inicio:.1f} s. '
+            'Si el origen tenía imágenes, copie también la carpeta media.'
+        ))
+
+    def verificar_migraciones(self, origen, destino):
+        ejecutor = MigrationExecutor(destino)
+        if ejecutor.migration_plan(ejecutor.loader.graph.leaf_nodes()):
+            raise CommandError('El destino tiene migraciones pendientes: ejecute primero "migrate".')
+        aplicadas_origen = set(MigrationRecorder(origen).applied_migrations())
+        aplicadas_destino = set(MigrationRecorder(destino).applied_migrations())
+        if not aplicadas_origen:
+            raise CommandError(f'{origen.settings_dict["NAME"]} no es una base de datos de este proyecto.')
+        if aplicadas_origen != aplicadas_destino:
+            raise CommandError(
+                'El origen y el destino tienen migraciones distintas: ejecute "migrate" también '
+                'sobre la base SQLite antes de copiarla.'
+            )
+
+    def modelos_en_orden(self):
+        """Modelos con tabla propia, cada uno después de aquellos a los que referencia"""
+        configuraciones = [(configuracion, None) for configuracion in apps.get_app_configs()]
+        modelos = [
+            modelo for modelo in sort_dependencies(configuraciones, allow_cycles=True)
+            if modelo._meta.managed and not modelo._meta.proxy
+        ]
+        # Tablas intermedias de los ManyToMany, al final
+        for modelo in list(modelos):
+            for campo in modelo._meta.local_many_to_many:
+                intermedia = campo.remote_field.through
+                if intermedia._meta.auto_created and intermedia not in modelos:
+                    modelos.append(intermedia)
+        return modelos
+
+    def verificar_destino_vacio(self, modelos, destino, vaciar):
+        if vaciar:
+            return
+        generados_por_migrate = {'contenttypes.contenttype', 'auth.permission'}
+        for modelo in modelos:
+            if modelo._meta.label_lower in generados_por_migrate:
+                continue
+            if modelo._base_manager.using(destino.alias).exists():
+                raise CommandError(
+                    f'El destino ya tiene datos en {modelo._meta.label}. Use --vaciar para reemplazarlos.'
+                )
+
+    def copiar(self, modelo, origen, destino, tamano_lote):
+        """
+        Copia las filas con INSERT por lotes de valores crudos: no pasa por
+        save() ni bulk_create(), así que se conservan los ids y las fechas
+        auto_now/auto_now_add, y no se disparan señales.
+        """
+        campos = modelo._meta.concrete_fields
+        columnas = ', '.join(destino.ops.quote_name(campo.column) for campo in campos)
+        marcadores = ', '.join(['%s'] * len(campos))
+        sql = f'INSERT INTO {destino.ops.quote_name(modelo._meta.db_table)} ({columnas}) VALUES ({marcadores})'
+        filas = (
+            modelo._base_manager.using(origen.alias).order_by('pk')
+            .values_list(*(campo.attname for campo in campos))
+            .iterator(chunk_size=tamano_lote)
+        )
+        total = 0
+        lote = []
+        with destino.cursor() as cursor:
+            for fila in filas:
+                lote.append([
+                    campo.get_db_prep_save(valor, connection=destino) for campo, valor in zip(campos, fila)
+                ])
+                if len(lote) >= tamano_lote:
+                    cursor.executemany(sql, lote)
+                    total += len(lote)
+                    lote = []
+            if lote:
+                cursor.executemany(sql, lote)
+                total += len(lote)
+        return total
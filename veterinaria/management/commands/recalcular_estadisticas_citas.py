@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from veterinaria.resumenes import recalcular_resumen_citas
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula desde las citas el resumen diario de las estadísticas (carga inicial, cargas '
+        'masivas o reparación de desfases)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Primera fecha a recalcular (AAAA-MM-DD); por defecto, todas')
+        parser.add_argument('--hasta', help='Última fecha a recalcular (AAAA-MM-DD); por defecto, todas')
+
+    def handle(self, *args, **options):
+        fechas = {}
+        for opcion in ('desde', 'hasta'):
+            if options[opcion]:
+                try:
+                    fechas[opcion] = parse_date(options[opcion])
+                except ValueError:
+                    fechas[opcion] = None
+                if fechas[opcion] is None:
+                    raise CommandError(f'--{opcion} debe tener el formato AAAA-MM-DD.')
+        filas = recalcular_resumen_citas(**fechas)
+        self.stdout.write(self.style.SUCCESS(f'Resumen diario de citas recalculado: {filas} filas.'))
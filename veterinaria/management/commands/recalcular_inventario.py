@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from veterinaria.models import Categoria
+from veterinaria.resumenes import recalcular_resumen_inventario
+
+class Command(BaseCommand):
+    help = 'Recalcula el resumen de inventario de todas las categorías (tras cargas masivas o reparaciones)'
+
+    def handle(self, *args, **options):
+        categoria_ids = list(Categoria.objects.values_list('id', flat=True))
+        recalcular_resumen_inventario(categoria_ids)
+        self.stdout.write(
+            self.style.SUCCESS(f'Resumen de inventario recalculado para {len(categoria_ids)} categorías.')
+        )
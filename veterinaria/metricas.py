@@ -0,0 +1,122 @@
+"""
+Métricas de rendimiento por vista, en formato de texto de Prometheus.
+
+MetricasMiddleware (ver middleware.py) mide cada petición y acumula los
+valores en histogramas en memoria, que se publican en ``/metrics``. Cada
+proceso del servidor (worker de gunicorn, por ejemplo) tiene sus propios
+histogramas; Prometheus los distingue por la instancia que raspa.
+"""
+import threading
+from collections import defaultdict
+
+# Límites superiores de los buckets (segundos)
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Límites superiores de los buckets (número de consultas SQL)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histograma:
+    """Histograma acumulado por combinación de etiquetas"""
+
+    def __init__(self, nombre, ayuda, etiquetas, buckets):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.buckets = buckets
+        self._series = defaultdict(lambda: [[0] * len(self.buckets), 0.0, 0])
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *etiquetas):
+        with self._lock:
+            serie = self._series[etiquetas]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+                    break
+            serie[1] += valor
+            serie[2] += 1
+
+    def exportar(self):
+        with self._lock:
+            series = {clave: (list(c), s, t) for clave, (c, s, t) in self._series.items()}
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} histogram']
+        for valores, (conteos, suma, total) in sorted(series.items()):
+            etiquetas = ','.join(f'{e}="{_escapar(v)}"' for e, v in zip(self.etiquetas, valores))
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, conteos):
+                acumulado += conteo
+                lineas.append(f'{self.nombre}_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+            lineas.append(f'{self.nombre}_bucket{{{etiquetas},le="+Inf"}} {total}')
+            lineas.append(f'{self.nombre}_sum{{{etiquetas}}} {suma}')
+            lineas.append(f'{self.nombre}_count{{{etiquetas}}} {total}')
+        return lineas
+
+
+class Contador:
+    """Contador por combinación de etiquetas"""
+
+    def __init__(self, nombre, ayuda, etiquetas):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._series = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def incrementar(self, *etiquetas):
+        with self._lock:
+            self._series[etiquetas] += 1
+
+    def exportar(self):
+        with self._lock:
+            series = dict(self._series)
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} counter']
+        for valores, total in sorted(series.items()):
+            etiquetas = ','.join(f'{e}="{_escapar(v)}"' for e, v in zip(self.etiquetas, valores))
+            lineas.append(f'{self.nombre}_total{{{etiquetas}}} {total}')
+        return lineas
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+DURACION_PETICION = Histograma(
+    'veterinaria_peticion_segundos', 'Duración total de la petición',
+    ('vista', 'metodo'), BUCKETS_SEGUNDOS,
+)
+CONSULTAS_SQL = Histograma(
+    'veterinaria_consultas_sql', 'Consultas SQL ejecutadas por petición',
+    ('vista',), BUCKETS_CONSULTAS,
+)
+DURACION_SQL = Histograma(
+    'veterinaria_sql_segundos', 'Tiempo total en la base de datos por petición',
+    ('vista',), BUCKETS_SEGUNDOS,
+)
+DURACION_PLANTILLAS = Histograma(
+    'veterinaria_plantillas_segundos', 'Tiempo de renderizado de plantillas por petición',
+    ('vista',), BUCKETS_SEGUNDOS,
+)
+RESPUESTAS = Contador(
+    'veterinaria_respuestas', 'Respuestas por vista y código de estado',
+    ('vista', 'codigo'),
+)
+
+METRICAS = (DURACION_PETICION, CONSULTAS_SQL, DURACION_SQL, DURACION_PLANTILLAS, RESPUESTAS)
+
+
+def registrar_peticion(vista, metodo, codigo, duracion, consultas, tiempo_sql, tiempo_plantillas):
+    """Acumula las mediciones de una petición"""
+    DURACION_PETICION.observar(duracion, vista, metodo)
+    CONSULTAS_SQL.observar(consultas, vista)
+    DURACION_SQL.observar(tiempo_sql, vista)
+    DURACION_PLANTILLAS.observar(tiempo_plantillas, vista)
+    RESPUESTAS.incrementar(vista, str(codigo))
+
+
+def exportar_prometheus():
+    """Todas las métricas en formato de texto de Prometheus"""
+    lineas = []
+    for metrica in METRICAS:
+        lineas.extend(metrica.exportar())
+    return '\n'.join(lineas) + '\n'
@@ -1,21 +1,231 @@
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.utils import translation
+from django.utils.deprecation import MiddlewareMixin
 from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+from .metricas import registrar_peticion
+from .routers import (
+    COOKIE_FIJACION, SEGUNDOS_FIJACION_PRIMARIA, alias_replicas, elegir_replica, leer_desde,
+    restaurar_lectura,
+)
 
-class ForceSpanishMiddleware:
+class ForceSpanishMiddleware(MiddlewareMixin):
     """
     Middleware para forzar el idioma español en toda la aplicación
     """
-    def __init__(self, get_response):
-        self.get_response = get_response
-
-    def __call__(self, request):
+    def process_request(self, request):
         # Forzar el idioma español
         translation.activate('es')
         request.LANGUAGE_CODE = 'es'
-        
-        response = self.get_response(request)
-        
+
+    def process_response(self, request, response):
         # Asegurar que el idioma se mantiene
         response['Content-Language'] = 'es'
-        
         return response
+
+
+class _MiddlewareSincronoAsincrono:
+    """
+    Base para middleware que funciona con WSGI y con ASGI sin cambiar de
+    modo: bajo ASGI ``__call__`` devuelve la corrutina de ``__acall__``, así
+    que Django no agrega un salto a un hilo por cada middleware. Las
+    subclases redefinen ``procesar`` (WSGI) y ``__acall__`` (ASGI); por
+    defecto ambos solo pasan la petición al siguiente.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.procesar(request)
+
+    def procesar(self, request):
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+
+class ReplicaMiddleware(_MiddlewareSincronoAsincrono):
+    """
+    Decide de qué base de datos lee cada petición (ver routers.py).
+
+    Las peticiones seguras leen de una réplica disponible, salvo que el
+    navegador tenga la cookie de fijación; las demás leen y escriben en la
+    primaria y dejan la cookie, para que las lecturas siguientes (por
+    ejemplo, la redirección después de guardar) vean lo recién guardado.
+    """
+    METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS')
+
+    def _puede_usar_replica(self, request):
+        return request.method in self.METODOS_SEGUROS and COOKIE_FIJACION not in request.COOKIES
+
+    def _fijar_primaria(self, request, response):
+        if request.method not in self.METODOS_SEGUROS:
+            response.set_cookie(
+                COOKIE_FIJACION, '1', max_age=SEGUNDOS_FIJACION_PRIMARIA, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def procesar(self, request):
+        if not alias_replicas():
+            return self.get_response(request)
+
+        alias = elegir_replica() if self._puede_usar_replica(request) else None
+        token = leer_desde(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            restaurar_lectura(token)
+        return self._fijar_primaria(request, response)
+
+    async def __acall__(self, request):
+        if not alias_replicas():
+            return await self.get_response(request)
+
+        # Verificar la réplica consulta la base de datos: se hace en un hilo
+        alias = await sync_to_async(elegir_replica)() if self._puede_usar_replica(request) else None
+        token = leer_desde(alias)
+        try:
+            response = await self.get_response(request)
+        finally:
+            restaurar_lectura(token)
+        return self._fijar_primaria(request, response)
+
+
+class MetricasMiddleware(_MiddlewareSincronoAsincrono):
+    """
+    Mide cada petición: consultas SQL, tiempo en la base de datos, tiempo
+    de renderizado de plantillas y duración total, por vista.
+
+    Los valores se envían en la cabecera ``Server-Timing`` (visible en las
+    herramientas de desarrollo del navegador) y se acumulan en los
+    histogramas de metricas.py, publicados en ``/metrics``.
+    """
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        _instrumentar_plantillas()
+        _instrumentar_conexiones()
+
+    def procesar(self, request):
+        medicion = _Medicion()
+        token = _medicion_actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        return self._registrar(request, response, medicion, time.perf_counter() - inicio)
+
+    async def __acall__(self, request):
+        # Las consultas del ORM asíncrono corren en hilos con una copia del
+        # contexto, así que también ven la medición de esta petición
+        medicion = _Medicion()
+        token = _medicion_actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        return self._registrar(request, response, medicion, time.perf_counter() - inicio)
+
+    def _registrar(self, request, response, medicion, duracion):
+        coincidencia = getattr(request, 'resolver_match', None)
+        vista = (coincidencia.view_name or coincidencia._func_path) if coincidencia else 'sin_vista'
+        registrar_peticion(
+            vista, request.method, response.status_code, duracion,
+            medicion.consultas, medicion.tiempo_sql, medicion.tiempo_plantillas,
+        )
+        response['Server-Timing'] = (
+            f'db;dur={medicion.tiempo_sql * 1000:.1f};desc="{medicion.consultas} consultas", '
+            f'tpl;dur={medicion.tiempo_plantillas * 1000:.1f}, '
+            f'total;dur={duracion * 1000:.1f}'
+        )
+        return response
+
+
+class _Medicion:
+    """Acumuladores de una petición"""
+    __slots__ = ('consultas', 'tiempo_sql', 'tiempo_plantillas', 'profundidad_plantillas')
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_sql = 0.0
+        self.tiempo_plantillas = 0.0
+        self.profundidad_plantillas = 0
+
+    def medir_consulta(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo_sql += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+# Medición de la petición en curso (por hilo o tarea)
+_medicion_actual = ContextVar('veterinaria_medicion', default=None)
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    """Envoltura de ejecución de cada conexión: mide si hay una petición en curso"""
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    return medicion.medir_consulta(execute, sql, params, many, context)
+
+
+def _agregar_envoltura(sender=None, connection=None, **kwargs):
+    if _medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir_consulta)
+
+
+def _instrumentar_conexiones():
+    """
+    Agrega _medir_consulta a cada conexión al abrirse. Las conexiones son
+    por hilo, y bajo ASGI las consultas de una petición corren en un hilo
+    distinto del que ejecuta el middleware.
+    """
+    connection_created.connect(_agregar_envoltura, dispatch_uid='veterinaria_metricas')
+    # Conexiones ya abiertas en este hilo (comandos que atienden peticiones)
+    for alias in connections:
+        _agregar_envoltura(connection=connections[alias])
+
+
+def _instrumentar_plantillas():
+    """
+    Envuelve Template.render para sumar el tiempo de renderizado a la
+    medición en curso. Solo cuenta la plantilla más externa, porque
+    ``{% include %}`` y ``{% extends %}`` renderizan plantillas anidadas.
+    """
+    if getattr(Template.render, '_con_metricas', False):
+        return
+    render_original = Template.render
+
+    def render(self, context):
+        medicion = _medicion_actual.get()
+        if medicion is None:
+            return render_original(self, context)
+        medicion.profundidad_plantillas += 1
+        inicio = time.perf_counter()
+        try:
+            return render_original(self, context)
+        finally:
+            medicion.profundidad_plantillas -= 1
+            if not medicion.profundidad_plantillas:
+                medicion.tiempo_plantillas += time.perf_counter() - inicio
+
+    render._con_metricas = True
+    Template.render = render
@@ -0,0 +1,24 @@
+# Índice de texto completo para la búsqueda de productos
+
+from django.db import migrations
+
+
+def crear_indice(apps, schema_editor):
+    from veterinaria.busqueda import INDICE_PRODUCTOS
+    INDICE_PRODUCTOS.crear(schema_editor.connection)
+
+
+def eliminar_indice(apps, schema_editor):
+    from veterinaria.busqueda import INDICE_PRODUCTOS
+    INDICE_PRODUCTOS.eliminar(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veterinaria', '0006_tipoanimal_veterinario_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:26
+
+from django.db import migrations, models
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+
+
+def poblar_documentos(apps, schema_editor):
+    """Construye el documento de búsqueda de las citas existentes"""
+    Cita = apps.get_model('veterinaria', 'Cita')
+    Mascota = apps.get_model('veterinaria', 'Mascota')
+    for mascota in Mascota.objects.only('id', 'nombre', 'propietario_nombre').iterator():
+        Cita.objects.filter(mascota_id=mascota.id).update(
+            documento_busqueda=Concat(
+                Value(f"{mascota.nombre} {mascota.propietario_nombre} "),
+                F('motivo'),
+                Value(' '),
+                F('veterinario'),
+                output_field=models.TextField(),
+            )
+        )
+
+
+def crear_indice(apps, schema_editor):
+    from veterinaria.busqueda import INDICE_CITAS
+    INDICE_CITAS.crear(schema_editor.connection)
+
+
+def eliminar_indice(apps, schema_editor):
+    from veterinaria.busqueda import INDICE_CITAS
+    INDICE_CITAS.eliminar(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veterinaria', '0007_producto_busqueda_texto_completo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cita',
+            name='documento_busqueda',
+            field=models.TextField(blank=True, editable=False, verbose_name='Documento de búsqueda'),
+        ),
+        migrations.RunPython(poblar_documentos, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
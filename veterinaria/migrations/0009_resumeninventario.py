@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veterinaria', '0008_cita_documento_busqueda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_valor', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Valor total (CLP $)')),
+                ('productos_activos', models.PositiveIntegerField(default=0, verbose_name='Productos activos')),
+                ('stock_bajo', models.PositiveIntegerField(default=0, verbose_name='Productos con stock bajo')),
+                ('con_stock', models.PositiveIntegerField(default=0, verbose_name='Productos con stock')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True, verbose_name='Última actualización')),
+                ('categoria', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='resumen_inventario', to='veterinaria.categoria', verbose_name='Categoría')),
+            ],
+            options={
+                'verbose_name': 'Resumen de inventario',
+                'verbose_name_plural': 'Resúmenes de inventario',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veterinaria', '0009_resumeninventario'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['fecha_hora', 'id'], name='cita_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['estado', 'fecha_hora'], name='cita_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mascota',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['fecha_registro', 'id'], name='mascota_activa_registro_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['categoria', 'nombre'], name='producto_activo_cat_nom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['fecha_creacion'], name='producto_activo_creacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['stock'], name='producto_activo_stock_idx'),
+        ),
+    ]
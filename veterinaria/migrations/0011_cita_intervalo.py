@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:02
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+# Copia de agenda.DURACION_POR_TIPO al momento de la migración
+DURACION_POR_TIPO = {
+    'consulta_general': 30,
+    'vacunacion': 15,
+    'cirugia': 120,
+    'control': 20,
+    'emergencia': 60,
+    'estetica': 60,
+    'otros': 30,
+}
+
+
+def calcular_intervalos(apps, schema_editor):
+    """Asigna duración y hora de término a las citas existentes"""
+    Cita = apps.get_model('veterinaria', 'Cita')
+    for tipo, minutos in DURACION_POR_TIPO.items():
+        Cita.objects.filter(tipo_cita=tipo).update(
+            duracion_minutos=minutos,
+            fecha_hora_fin=F('fecha_hora') + timedelta(minutes=minutos),
+        )
+    Cita.objects.filter(fecha_hora_fin__isnull=True).update(
+        fecha_hora_fin=F('fecha_hora') + timedelta(minutes=30),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veterinaria', '0010_indices_consultas_frecuentes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cita',
+            name='duracion_minutos',
+            field=models.PositiveSmallIntegerField(default=30, editable=False, verbose_name='Duración (minutos)'),
+        ),
+        migrations.AddField(
+            model_name='cita',
+            name='fecha_hora_fin',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Fecha y hora de término'),
+        ),
+        migrations.RunPython(calcular_intervalos, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='cita',
+            name='fecha_hora_fin',
+            field=models.DateTimeField(editable=False, verbose_name='Fecha y hora de término'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['veterinario', 'fecha_hora', 'fecha_hora_fin'], name='cita_vet_intervalo_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Índice de texto completo para el autocompletado de mascotas
+
+from django.db import migrations
+
+
+def crear_indice(apps, schema_editor):
+    from veterinaria.busqueda import INDICE_MASCOTAS
+    INDICE_MASCOTAS.crear(schema_editor.connection)
+
+
+def eliminar_indice(apps, schema_editor):
+    from veterinaria.busqueda import INDICE_MASCOTAS
+    INDICE_MASCOTAS.eliminar(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veterinaria', '0011_cita_intervalo'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
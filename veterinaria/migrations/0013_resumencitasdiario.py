@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:04
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def calcular_resumen(apps, schema_editor):
+    """Resumen inicial de las citas existentes (como resumenes.recalcular_resumen_citas)"""
+    Cita = apps.get_model('veterinaria', 'Cita')
+    ResumenCitasDiario = apps.get_model('veterinaria', 'ResumenCitasDiario')
+    alias = schema_editor.connection.alias
+    filas = Cita.objects.using(alias).annotate(fecha=TruncDate('fecha_hora')).order_by().values(
+        'fecha', 'veterinario', 'tipo_cita', 'estado',
+    ).annotate(
+        cantidad=Count('id'),
+        con_precio=Count('precio_estimado'),
+        total_precio_estimado=Sum('precio_estimado'),
+    )
+    ResumenCitasDiario.objects.using(alias).bulk_create(
+        (ResumenCitasDiario(**dict(fila, total_precio_estimado=fila['total_precio_estimado'] or 0)) for fila in filas),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veterinaria', '0012_mascota_busqueda_texto_completo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenCitasDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('veterinario', models.CharField(blank=True, max_length=200, verbose_name='Veterinario')),
+                ('tipo_cita', models.CharField(choices=[('consulta_general', 'Consulta General'), ('vacunacion', 'Vacunación'), ('cirugia', 'Cirugía'), ('control', 'Control'), ('emergencia', 'Emergencia'), ('estetica', 'Estética'), ('otros', 'Otros')], max_length=20, verbose_name='Tipo de cita')),
+                ('estado', models.CharField(choices=[('programada', 'Programada'), ('confirmada', 'Confirmada'), ('en_curso', 'En Curso'), ('completada', 'Completada'), ('cancelada', 'Cancelada'), ('no_asistio', 'No Asistió')], max_length=15, verbose_name='Estado')),
+                ('cantidad', models.PositiveIntegerField(default=0, verbose_name='Citas')),
+                ('con_precio', models.PositiveIntegerField(default=0, verbose_name='Citas con precio estimado')),
+                ('total_precio_estimado', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Precio estimado total (CLP $)')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True, verbose_name='Última actualización')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario de citas',
+                'verbose_name_plural': 'Resúmenes diarios de citas',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumencitasdiario',
+            constraint=models.UniqueConstraint(fields=('fecha', 'veterinario', 'tipo_cita', 'estado'), name='resumen_citas_clave_unica'),
+        ),
+        migrations.RunPython(calcular_resumen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Cita.veterinario pasa de texto libre a clave foránea (1 de 3): el texto
+# queda en veterinario_nombre mientras se asignan los veterinarios.
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veterinaria', '0013_resumencitasdiario'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='cita',
+            name='cita_vet_intervalo_idx',
+        ),
+        migrations.RenameField(
+            model_name='cita',
+            old_name='veterinario',
+            new_name='veterinario_nombre',
+        ),
+        migrations.AddField(
+            model_name='cita',
+            name='veterinario',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='citas', to='veterinaria.veterinario', verbose_name='Veterinario asignado'),
+        ),
+    ]
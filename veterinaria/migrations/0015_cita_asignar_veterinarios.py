@@ -0,0 +1,69 @@
+# Cita.veterinario pasa de texto libre a clave foránea (2 de 3): cada texto
+# se asigna al veterinario con el mismo nombre. Va en una migración aparte
+# porque PostgreSQL no permite alterar una tabla con verificaciones de
+# claves foráneas pendientes en la misma transacción.
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Concat
+
+PREFIJOS = re.compile(r'^(dra?|doctora?)\b\.?\s*')
+
+
+def normalizar(texto):
+    """'Dra. María  Pérez - Cirugía' -> 'maria perez'"""
+    texto = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode().lower()
+    texto = texto.split(' - ')[0]  # formato de Veterinario.__str__ con especialidad
+    texto = PREFIJOS.sub('', texto.strip())
+    return ' '.join(re.sub(r'[^a-z0-9\s]', ' ', texto).split())
+
+
+def asignar_veterinarios(apps, schema_editor):
+    """
+    Busca cada texto distinto entre los veterinarios (sin tildes, mayúsculas
+    ni el prefijo Dr./Dra.; ante nombres repetidos, el activo de menor id).
+    El texto que no coincide con ninguno se conserva en las observaciones.
+    """
+    Cita = apps.get_model('veterinaria', 'Cita')
+    Veterinario = apps.get_model('veterinaria', 'Veterinario')
+    alias = schema_editor.connection.alias
+
+    por_nombre = {}
+    for veterinario_id, nombre in Veterinario.objects.using(alias).order_by('-activo', 'id').values_list('id', 'nombre'):
+        por_nombre.setdefault(normalizar(nombre), veterinario_id)
+
+    textos = Cita.objects.using(alias).exclude(veterinario_nombre='').order_by().values_list('veterinario_nombre', flat=True).distinct()
+    for texto in list(textos):
+        citas = Cita.objects.using(alias).filter(veterinario_nombre=texto)
+        veterinario_id = por_nombre.get(normalizar(texto))
+        if veterinario_id is not None:
+            citas.update(veterinario_id=veterinario_id)
+            continue
+        nota = f'Veterinario asignado (sin registro): {texto}'
+        citas.update(observaciones=Case(
+            When(observaciones='', then=Value(nota)),
+            default=Concat(F('observaciones'), Value(f'\n{nota}')),
+            output_field=models.TextField(),
+        ))
+
+
+def restaurar_nombres(apps, schema_editor):
+    Cita = apps.get_model('veterinaria', 'Cita')
+    Veterinario = apps.get_model('veterinaria', 'Veterinario')
+    alias = schema_editor.connection.alias
+    for veterinario_id, nombre in Veterinario.objects.using(alias).filter(citas__isnull=False).order_by().distinct().values_list('id', 'nombre'):
+        Cita.objects.using(alias).filter(veterinario_id=veterinario_id).update(veterinario_nombre=nombre)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veterinaria', '0014_cita_veterinario_fk'),
+    ]
+
+    operations = [
+        migrations.RunPython(asignar_veterinarios, restaurar_nombres),
+    ]
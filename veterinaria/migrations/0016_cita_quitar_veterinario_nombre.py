@@ -0,0 +1,75 @@
+# Cita.veterinario pasa de texto libre a clave foránea (3 de 3): se elimina
+# el texto, se recrea el índice de agenda sobre la clave y el resumen diario
+# de citas pasa a agruparse por veterinario_id.
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def vaciar_resumen(apps, schema_editor):
+    apps.get_model('veterinaria', 'ResumenCitasDiario').objects.using(schema_editor.connection.alias).delete()
+
+
+def calcular_resumen(apps, schema_editor):
+    """Como resumenes.recalcular_resumen_citas, ahora por veterinario_id"""
+    Cita = apps.get_model('veterinaria', 'Cita')
+    ResumenCitasDiario = apps.get_model('veterinaria', 'ResumenCitasDiario')
+    alias = schema_editor.connection.alias
+    filas = Cita.objects.using(alias).annotate(fecha=TruncDate('fecha_hora')).order_by().values(
+        'fecha', 'veterinario_id', 'tipo_cita', 'estado',
+    ).annotate(
+        cantidad=Count('id'),
+        con_precio=Count('precio_estimado'),
+        total_precio_estimado=Sum('precio_estimado'),
+    )
+    ResumenCitasDiario.objects.using(alias).bulk_create(
+        (ResumenCitasDiario(**dict(fila, total_precio_estimado=fila['total_precio_estimado'] or 0)) for fila in filas),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veterinaria', '0015_cita_asignar_veterinarios'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='cita',
+            name='veterinario_nombre',
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['veterinario', 'fecha_hora', 'fecha_hora_fin'], name='cita_vet_intervalo_idx'),
+        ),
+        migrations.RunPython(vaciar_resumen, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='resumencitasdiario',
+            name='resumen_citas_clave_unica',
+        ),
+        migrations.RemoveField(
+            model_name='resumencitasdiario',
+            name='veterinario',
+        ),
+        migrations.AddField(
+            model_name='resumencitasdiario',
+            name='veterinario',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='veterinaria.veterinario', verbose_name='Veterinario'),
+        ),
+        migrations.AddIndex(
+            model_name='resumencitasdiario',
+            index=models.Index(fields=['fecha'], name='resumen_citas_fecha_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumencitasdiario',
+            constraint=models.UniqueConstraint(condition=models.Q(('veterinario__isnull', False)), fields=('fecha', 'veterinario', 'tipo_cita', 'estado'), name='resumen_citas_clave_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumencitasdiario',
+            constraint=models.UniqueConstraint(condition=models.Q(('veterinario__isnull', True)), fields=('fecha', 'tipo_cita', 'estado'), name='resumen_citas_sin_veterinario_unica'),
+        ),
+        migrations.RunPython(calcular_resumen, vaciar_resumen),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def registrar_saldos_iniciales(apps, schema_editor):
+    """El stock actual de cada producto es su primer movimiento (como inventario.conciliar_stock)"""
+    Producto = apps.get_model('veterinaria', 'Producto')
+    MovimientoStock = apps.get_model('veterinaria', 'MovimientoStock')
+    alias = schema_editor.connection.alias
+    MovimientoStock.objects.using(alias).bulk_create(
+        (
+            MovimientoStock(producto_id=producto_id, tipo='ajuste', cantidad=stock, motivo='Saldo inicial')
+            for producto_id, stock in Producto.objects.using(alias).filter(stock__gt=0).values_list('id', 'stock').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veterinaria', '0016_cita_quitar_veterinario_nombre'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='stock_reservado',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Stock reservado'),
+        ),
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('reposicion', 'Reposición'), ('reserva', 'Reserva'), ('liberacion', 'Liberación de reserva'), ('consumo', 'Consumo'), ('ajuste', 'Ajuste')], max_length=20, verbose_name='Tipo de movimiento')),
+                ('cantidad', models.IntegerField(default=0, verbose_name='Variación del stock')),
+                ('cantidad_reservada', models.IntegerField(default=0, verbose_name='Variación del stock reservado')),
+                ('motivo', models.CharField(blank=True, max_length=200, verbose_name='Motivo')),
+                ('fecha', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+                ('producto', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='movimientos_stock', to='veterinaria.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de stock',
+                'verbose_name_plural': 'Movimientos de stock',
+                'ordering': ['-fecha', '-id'],
+                'indexes': [models.Index(fields=['producto', 'fecha'], name='movimiento_producto_fecha_idx')],
+            },
+        ),
+        migrations.RunPython(registrar_saldos_iniciales, migrations.RunPython.noop),
+    ]
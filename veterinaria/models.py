@@ -1,7 +1,32 @@
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Concat
 from django.urls import reverse
 from django.utils import timezone
 
+from .imagenes import variantes_disponibles
+
+
+class ImagenVariantesMixin:
+    """
+    Acceso a las variantes redimensionadas del campo ``imagen``
+    (ver ``imagenes.py``).
+    """
+
+    def imagen_variantes(self):
+        """Variantes disponibles por formato: ``{formato: [(url, ancho), ...]}``"""
+        nombre = self.imagen.name if self.imagen else ''
+        cache = getattr(self, '_imagen_variantes', None)
+        if cache is None or cache[0] != nombre:
+            cache = (nombre, variantes_disponibles(self.imagen))
+            self._imagen_variantes = cache
+        return cache[1]
+
+    def imagen_srcset(self, formato='webp'):
+        """Valor del atributo ``srcset`` para el formato indicado"""
+        return ', '.join(f'{url} {ancho}w' for url, ancho in self.imagen_variantes().get(formato, []))
+
+
 class Veterinario(models.Model):
     """
     Modelo para los veterinarios de la clínica.
@@ -24,7 +49,7 @@ class Veterinario(models.Model):
         especialidad_text = f" - {self.especialidad}" if self.especialidad else ""
         return f"Dr. {self.nombre}{especialidad_text}"
 
-class Categoria(models.Model):
+class Categoria(ImagenVariantesMixin, models.Model):
     """
     Modelo para las categorías de productos veterinarios.
     Solo se gestiona desde Django Admin.
@@ -64,7 +89,7 @@ class TipoAnimal(models.Model):
         return self.nombre
 
 
-class Mascota(models.Model):
+class Mascota(ImagenVariantesMixin, models.Model):
     """
     Modelo para mascotas registradas en la veterinaria.
     Se gestiona a través de formularios CRUD en la aplicación web.
@@ -111,6 +136,10 @@ class Mascota(models.Model):
         verbose_name = "Mascota"
         verbose_name_plural = "Mascotas"
         ordering = ['nombre']
+        indexes = [
+            # Listado de mascotas activas por fecha de registro (paginación keyset)
+            models.Index(fields=['fecha_registro', 'id'], condition=models.Q(activo=True), name='mascota_activa_registro_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nombre} - {self.tipo_animal.nombre} ({self.propietario_nombre})"
@@ -119,7 +148,7 @@ class Mascota(models.Model):
         return reverse('mascota_detalle', kwargs={'pk': self.pk})
 
 
-class Producto(models.Model):
+class Producto(ImagenVariantesMixin, models.Model):
     """
     Modelo para productos veterinarios (medicamentos, alimentos, servicios).
     Se gestiona a través de formularios CRUD en la aplicación web.
@@ -140,6 +169,8 @@ class Producto(models.Model):
     codigo = models.CharField(max_length=50, unique=True, verbose_name="Código del producto", blank=True)
     imagen = models.ImageField(upload_to='productos/', blank=True, null=True, verbose_name="Imagen del producto")
     stock = models.PositiveIntegerField(default=0, verbose_name="Stock disponible", blank=True)
+    # Stock y reservas solo cambian con movimientos (ver inventario.py)
+    stock_reservado = models.PositiveIntegerField(default=0, editable=False, verbose_name="Stock reservado")
     activo = models.BooleanField(default=True, verbose_name="Producto activo")
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
     fecha_modificacion = models.DateTimeField(auto_now=True, verbose_name="Última modificación")
@@ -153,6 +184,18 @@ class Producto(models.Model):
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
         ordering = ['nombre']
+        indexes = [
+            # Las vistas solo muestran productos activos, así que los índices
+            # son parciales (WHERE activo). Además de ser más pequeños, SQLite
+            # no puede usar "activo" como primera columna de un índice
+            # compuesto, porque Django filtra con WHERE "activo" y no con "= 1".
+            # Productos de una categoría (catálogo y mantenedor), ordenados por nombre
+            models.Index(fields=['categoria', 'nombre'], condition=models.Q(activo=True), name='producto_activo_cat_nom_idx'),
+            # Listado general de productos, más recientes primero
+            models.Index(fields=['fecha_creacion'], condition=models.Q(activo=True), name='producto_activo_creacion_idx'),
+            # Indicadores de stock bajo
+            models.Index(fields=['stock'], condition=models.Q(activo=True), name='producto_activo_stock_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nombre} - {self.categoria.nombre}"
@@ -160,6 +203,66 @@ class Producto(models.Model):
     def get_absolute_url(self):
         return reverse('producto_detalle', kwargs={'pk': self.pk})
 
+    @property
+    def stock_libre(self):
+        """Unidades que se pueden vender o reservar"""
+        return self.stock - self.stock_reservado
+
+
+class MovimientoStock(models.Model):
+    """
+    Movimiento de stock de un producto. La tabla es de solo inserción: el
+    stock y el stock reservado de cada producto son la suma de sus
+    movimientos (ver inventario.py y el comando conciliar_stock).
+    """
+    TIPO_CHOICES = [
+        ('reposicion', 'Reposición'),
+        ('reserva', 'Reserva'),
+        ('liberacion', 'Liberación de reserva'),
+        ('consumo', 'Consumo'),
+        ('ajuste', 'Ajuste'),
+    ]
+
+    # El índice (producto, fecha) cubre las consultas por producto
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, db_index=False, related_name='movimientos_stock', verbose_name="Producto")
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, verbose_name="Tipo de movimiento")
+    cantidad = models.IntegerField(default=0, verbose_name="Variación del stock")
+    cantidad_reservada = models.IntegerField(default=0, verbose_name="Variación del stock reservado")
+    motivo = models.CharField(max_length=200, blank=True, verbose_name="Motivo")
+    fecha = models.DateTimeField(auto_now_add=True, verbose_name="Fecha")
+
+    class Meta:
+        verbose_name = "Movimiento de stock"
+        verbose_name_plural = "Movimientos de stock"
+        ordering = ['-fecha', '-id']
+        indexes = [
+            models.Index(fields=['producto', 'fecha'], name='movimiento_producto_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} de {self.cantidad or self.cantidad_reservada} - producto {self.producto_id}"
+
+
+class ResumenInventario(models.Model):
+    """
+    Resumen de inventario por categoría (solo productos activos).
+    Se mantiene de forma incremental desde signals.py al guardar o eliminar
+    productos; ver resumenes.py.
+    """
+    categoria = models.OneToOneField(Categoria, on_delete=models.CASCADE, related_name='resumen_inventario', verbose_name="Categoría")
+    total_valor = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Valor total (CLP $)")
+    productos_activos = models.PositiveIntegerField(default=0, verbose_name="Productos activos")
+    stock_bajo = models.PositiveIntegerField(default=0, verbose_name="Productos con stock bajo")
+    con_stock = models.PositiveIntegerField(default=0, verbose_name="Productos con stock")
+    fecha_actualizacion = models.DateTimeField(auto_now=True, verbose_name="Última actualización")
+    
+    class Meta:
+        verbose_name = "Resumen de inventario"
+        verbose_name_plural = "Resúmenes de inventario"
+    
+    def __str__(self):
+        return f"Inventario {self.categoria_id}: {self.productos_activos} productos"
+
 
 class Cita(models.Model):
     """
@@ -191,9 +294,20 @@ class Cita(models.Model):
     estado = models.CharField(max_length=15, choices=ESTADO_CHOICES, default='programada', verbose_name="Estado")
     motivo = models.TextField(verbose_name="Motivo de la consulta")
     observaciones = models.TextField(verbose_name="Observaciones", blank=True)
-    veterinario = models.CharField(max_length=200, verbose_name="Veterinario asignado", blank=True)
+    # Sin índice propio: lo cubre cita_vet_intervalo_idx, que empieza por esta columna.
+    # PROTECT: un veterinario con citas se desactiva en lugar de eliminarse.
+    veterinario = models.ForeignKey(Veterinario, on_delete=models.PROTECT, null=True, blank=True, db_index=False, related_name='citas', verbose_name="Veterinario asignado")
     precio_estimado = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Precio estimado (CLP $)", blank=True, null=True)
     
+    # Intervalo que ocupa la cita en la agenda del veterinario, según la
+    # duración de su tipo. Se calcula en signals.py (ver agenda.py).
+    duracion_minutos = models.PositiveSmallIntegerField(default=30, editable=False, verbose_name="Duración (minutos)")
+    fecha_hora_fin = models.DateTimeField(editable=False, verbose_name="Fecha y hora de término")
+    
+    # Documento de búsqueda desnormalizado (mascota, propietario, motivo y
+    # veterinario). Se mantiene en signals.py y se indexa en busqueda.py.
+    documento_busqueda = models.TextField(blank=True, editable=False, verbose_name="Documento de búsqueda")
+    
     # Campos de control
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
     fecha_modificacion = models.DateTimeField(auto_now=True, verbose_name="Última modificación")
@@ -202,6 +316,14 @@ class Cita(models.Model):
         verbose_name = "Cita"
         verbose_name_plural = "Citas"
         ordering = ['fecha_hora']
+        indexes = [
+            # Listado de citas por fecha (paginación keyset) y filtro por estado
+            models.Index(fields=['fecha_hora', 'id'], name='cita_fecha_id_idx'),
+            models.Index(fields=['estado', 'fecha_hora'], name='cita_estado_fecha_idx'),
+            # Agenda y citas de cada veterinario por rango de fechas, y detección
+            # de choques (agenda.py)
+            models.Index(fields=['veterinario', 'fecha_hora', 'fecha_hora_fin'], name='cita_vet_intervalo_idx'),
+        ]
         
     def __str__(self):
         return f"Cita {self.mascota.nombre} - {self.fecha_hora.strftime('%d/%m/%Y %H:%M')} ({self.get_estado_display()})"
@@ -209,6 +331,42 @@ class Cita(models.Model):
     def get_absolute_url(self):
         return reverse('cita_detail', kwargs={'pk': self.pk})
     
+    def construir_documento_busqueda(self):
+        """Texto indexado para la búsqueda de citas"""
+        veterinario = self.veterinario.nombre if self.veterinario_id else ''
+        return f"{self.mascota.nombre} {self.mascota.propietario_nombre} {self.motivo} {veterinario}"
+    
+    @staticmethod
+    def expresion_documento_busqueda(mascota=None, veterinario=None):
+        """
+        Equivalente SQL de construir_documento_busqueda para actualizar
+        en una sola consulta todas las citas de una mascota o de un
+        veterinario. La parte que no se indica se lee de cada cita con una
+        subconsulta (UPDATE no admite JOIN).
+        """
+        if mascota is not None:
+            datos_mascota = Value(f"{mascota.nombre} {mascota.propietario_nombre} ")
+        else:
+            mascotas = Mascota.objects.filter(pk=OuterRef('mascota_id'))
+            datos_mascota = Concat(
+                Subquery(mascotas.values('nombre')[:1]), Value(' '),
+                Subquery(mascotas.values('propietario_nombre')[:1]), Value(' '),
+            )
+        if veterinario is not None:
+            nombre_veterinario = Value(veterinario.nombre)
+        else:
+            nombre_veterinario = Coalesce(
+                Subquery(Veterinario.objects.filter(pk=OuterRef('veterinario_id')).values('nombre')[:1]),
+                Value(''),
+            )
+        return Concat(
+            datos_mascota,
+            F('motivo'),
+            Value(' '),
+            nombre_veterinario,
+            output_field=models.TextField(),
+        )
+    
     @property
     def es_pasada(self):
         """Verifica si la cita ya pasó"""
@@ -218,3 +376,36 @@ class Cita(models.Model):
     def puede_modificarse(self):
         """Verifica si la cita puede modificarse (no está completada, cancelada o ya pasó)"""
         return self.estado not in ['completada', 'cancelada'] and not self.es_pasada
+
+
+class ResumenCitasDiario(models.Model):
+    """
+    Cantidad de citas y suma de precios estimados por día, veterinario,
+    tipo de cita y estado. Se mantiene de forma incremental desde
+    signals.py al guardar o eliminar citas (incluidos los cambios de
+    estado); ver resumenes.py.
+    """
+    fecha = models.DateField(verbose_name="Fecha")
+    veterinario = models.ForeignKey(Veterinario, on_delete=models.CASCADE, null=True, blank=True, db_index=False, related_name='+', verbose_name="Veterinario")
+    tipo_cita = models.CharField(max_length=20, choices=Cita.TIPO_CITA_CHOICES, verbose_name="Tipo de cita")
+    estado = models.CharField(max_length=15, choices=Cita.ESTADO_CHOICES, verbose_name="Estado")
+    cantidad = models.PositiveIntegerField(default=0, verbose_name="Citas")
+    con_precio = models.PositiveIntegerField(default=0, verbose_name="Citas con precio estimado")
+    total_precio_estimado = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Precio estimado total (CLP $)")
+    fecha_actualizacion = models.DateTimeField(auto_now=True, verbose_name="Última actualización")
+    
+    class Meta:
+        verbose_name = "Resumen diario de citas"
+        verbose_name_plural = "Resúmenes diarios de citas"
+        indexes = [
+            models.Index(fields=['fecha'], name='resumen_citas_fecha_idx'),
+        ]
+        constraints = [
+            # NULL no se compara como igual en UNIQUE: las citas sin
+            # veterinario necesitan su propia restricción
+            models.UniqueConstraint(fields=['fecha', 'veterinario', 'tipo_cita', 'estado'], condition=models.Q(veterinario__isnull=False), name='resumen_citas_clave_unica'),
+            models.UniqueConstraint(fields=['fecha', 'tipo_cita', 'estado'], condition=models.Q(veterinario__isnull=True), name='resumen_citas_sin_veterinario_unica'),
+        ]
+    
+    def __str__(self):
+        return f"Citas {self.fecha} {self.veterinario_id or '-'} {self.tipo_cita} {self.estado}: {self.cantidad}"
@@ -0,0 +1,232 @@
+"""
+Paginación por cursor (keyset) para los listados grandes.
+
+En lugar de ``OFFSET n`` cada página continúa desde la última fila de la
+anterior (``WHERE (fecha, id) < (...)``), así que una página profunda cuesta
+lo mismo que la primera. El total se calcula aparte y se guarda en caché.
+"""
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+# Segundos que se reutiliza el total de un listado
+SEGUNDOS_CACHE_CONTEO = getattr(settings, 'VETERINARIA_SEGUNDOS_CACHE_CONTEO', 60)
+
+# Mayor entero que admiten las columnas enteras de los motores soportados
+ENTERO_MAXIMO = 2 ** 63 - 1
+
+
+class PaginadorKeyset:
+    """Equivalente mínimo de Paginator (lo que usan las plantillas)"""
+
+    def __init__(self, per_page, count):
+        self.per_page = per_page
+        self.count = count
+
+
+class PaginaKeyset:
+    """Página de resultados con los cursores hacia la página vecina"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous,
+                 querystring_siguiente='', querystring_anterior=''):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.querystring_siguiente = querystring_siguiente
+        self.querystring_anterior = querystring_anterior
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+
+def codificar_cursor(direccion, valores):
+    """Serializa la dirección y los valores de la clave en un token para la URL"""
+    datos = json.dumps([direccion] + [str(v) for v in valores])
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(token):
+    """Inverso de codificar_cursor; lanza ValueError si el token no es válido"""
+    relleno = '=' * (-len(token) % 4)
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(token + relleno))
+    except (ValueError, TypeError) as error:
+        raise ValueError('Cursor inválido') from error
+    if not isinstance(datos, list) or len(datos) < 2 or datos[0] not in ('sig', 'ant'):
+        raise ValueError('Cursor inválido')
+    return datos[0], datos[1:]
+
+
+def _clave_conteo(queryset):
+    sql, params = queryset.order_by().query.sql_with_params()
+    return 'veterinaria:conteo:' + hashlib.md5(f'{sql}{params}'.encode()).hexdigest()
+
+
+def contar_con_cache(queryset):
+    """Total del queryset, reutilizado durante SEGUNDOS_CACHE_CONTEO"""
+    clave = _clave_conteo(queryset)
+    total = cache.get(clave)
+    if total is None:
+        total = queryset.count()
+        cache.set(clave, total, SEGUNDOS_CACHE_CONTEO)
+    return total
+
+
+async def acontar_con_cache(queryset):
+    """Versión asíncrona de contar_con_cache"""
+    clave = _clave_conteo(queryset)
+    total = await cache.aget(clave)
+    if total is None:
+        total = await queryset.acount()
+        await cache.aset(clave, total, SEGUNDOS_CACHE_CONTEO)
+    return total
+
+
+class KeysetPaginationMixin:
+    """
+    Reemplaza la paginación por OFFSET de ListView por paginación keyset.
+
+    ``campos_keyset`` define el orden del listado y debe terminar en un campo
+    único (normalmente ``id``). Con ``contar_total = False`` no se calcula
+    el total.
+    """
+    campos_keyset = ('-id',)
+    parametro_cursor = 'cursor'
+    contar_total = True
+
+    def get_ordering(self):
+        return self.campos_keyset
+
+    def _campos(self):
+        return [(campo.lstrip('-'), campo.startswith('-')) for campo in self.campos_keyset]
+
+    def _filtro_desde(self, valores, hacia_atras):
+        """Condición (a, b) < (x, y) expandida para cualquier número de campos"""
+        campos = self._campos()
+        condicion = Q()
+        for i, (campo, descendente) in enumerate(campos):
+            # Avanzar en el orden del listado significa "menor" en campos descendentes
+            menor = descendente != hacia_atras
+            termino = Q(**{f'{campo}__{"lt" if menor else "gt"}': valores[i]})
+            for j in range(i):
+                termino &= Q(**{campos[j][0]: valores[j]})
+            condicion |= termino
+        return condicion
+
+    def _valores(self, objeto):
+        return [getattr(objeto, campo) for campo, _ in self._campos()]
+
+    def _querystring(self, direccion, objeto):
+        parametros = self.request.GET.copy()
+        parametros.pop('page', None)
+        parametros[self.parametro_cursor] = codificar_cursor(direccion, self._valores(objeto))
+        return parametros.urlencode()
+
+    def _convertir(self, modelo, valores_texto):
+        """Convierte los valores del cursor a los tipos de cada campo"""
+        campos = self._campos()
+        if len(valores_texto) != len(campos) or not all(isinstance(valor, str) for valor in valores_texto):
+            raise ValueError('Cursor inválido')
+        try:
+            valores = [
+                modelo._meta.get_field(campo).to_python(valor)
+                for (campo, _), valor in zip(campos, valores_texto)
+            ]
+        except ValidationError as error:
+            raise ValueError('Cursor inválido') from error
+        # Un entero fuera de 64 bits haría fallar la consulta en vez de filtrar
+        if any(isinstance(valor, int) and not -ENTERO_MAXIMO <= valor <= ENTERO_MAXIMO for valor in valores):
+            raise ValueError('Cursor inválido')
+        return valores
+
+    def _preparar_pagina(self, queryset):
+        """Queryset ordenado y filtrado desde el cursor, con el token y la dirección"""
+        queryset = queryset.order_by(*self.campos_keyset)
+        token = self.request.GET.get(self.parametro_cursor)
+        direccion = 'sig'
+        if token:
+            try:
+                direccion, valores = decodificar_cursor(token)
+                valores = self._convertir(queryset.model, valores)
+            except ValueError:
+                # Cursor alterado o de otra versión del listado: se muestra la primera página
+                return queryset, None, 'sig'
+            hacia_atras = direccion == 'ant'
+            queryset = queryset.filter(self._filtro_desde(valores, hacia_atras))
+            if hacia_atras:
+                queryset = queryset.reverse()
+        return queryset, token, direccion
+
+    def _armar_pagina(self, filas, page_size, total, token, direccion):
+        hay_mas = len(filas) > page_size
+        filas = filas[:page_size]
+        if direccion == 'ant':
+            filas.reverse()
+            has_next, has_previous = True, hay_mas
+        else:
+            has_next, has_previous = hay_mas, bool(token)
+
+        pagina = PaginaKeyset(
+            filas,
+            PaginadorKeyset(page_size, total),
+            has_next,
+            has_previous,
+            querystring_siguiente=self._querystring('sig', filas[-1]) if has_next and filas else '',
+            querystring_anterior=self._querystring('ant', filas[0]) if has_previous and filas else '',
+        )
+        return pagina.paginator, pagina, pagina.object_list, pagina.has_other_pages()
+
+    def paginate_queryset(self, queryset, page_size):
+        total = contar_con_cache(queryset) if self.contar_total else None
+        queryset, token, direccion = self._preparar_pagina(queryset)
+        filas = list(queryset[:page_size + 1])
+        return self._armar_pagina(filas, page_size, total, token, direccion)
+
+    async def apaginate_queryset(self, queryset, page_size):
+        """Versión asíncrona de paginate_queryset (ORM asíncrono)"""
+        total = await acontar_con_cache(queryset) if self.contar_total else None
+        queryset, token, direccion = self._preparar_pagina(queryset)
+        filas = [fila async for fila in queryset[:page_size + 1]]
+        return self._armar_pagina(filas, page_size, total, token, direccion)
+
+
+class ListaAsincronaMixin:
+    """
+    GET asíncrono para un ListView con KeysetPaginationMixin.
+
+    La página se lee con el ORM asíncrono y la vista devuelve un
+    TemplateResponse, que Django renderiza en un hilo. Bajo ASGI el proceso
+    atiende otras peticiones mientras espera a la base de datos; bajo WSGI
+    Django ejecuta la vista con async_to_sync y el resultado es el mismo.
+    Las plantillas no deben consultar relaciones que no estén en
+    ``select_related``.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        self._pagina_asincrona = await self.apaginate_queryset(
+            self.object_list, self.get_paginate_by(self.object_list)
+        )
+        return self.render_to_response(self.get_context_data())
+
+    def paginate_queryset(self, queryset, page_size):
+        # get_context_data() pide la página: se entrega la ya leída en get()
+        return self._pagina_asincrona
@@ -0,0 +1,116 @@
+"""
+Caché en memoria del proceso para las tablas de referencia.
+
+Categorías, tipos de animal y veterinarios son tablas pequeñas que solo
+cambian desde el admin, pero cada formulario las consultaba al crearse,
+al mostrar sus opciones y al validar. Aquí se cargan completas una vez por
+proceso y se reutilizan mientras no cambie su versión, guardada en la
+caché de Django como las de cache.py: al guardar o eliminar un registro
+(ver signals.py) la versión se incrementa después del commit y cada
+proceso recarga la tabla desde la primaria en su siguiente uso. Recargarla
+antes del commit o desde una réplica atrasada dejaría datos viejos bajo la
+versión nueva hasta el próximo cambio. Con la caché en memoria local
+(desarrollo) la invalidación solo alcanza al proceso que guardó; en
+producción la caché en archivos es compartida por todos los workers.
+"""
+import copy
+import threading
+from functools import partial
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.forms.models import ModelChoiceIterator
+
+from .cache import invalidar, obtener_version
+from .models import Categoria, TipoAnimal, Veterinario
+
+MODELOS_REFERENCIA = (Categoria, TipoAnimal, Veterinario)
+
+# modelo -> (versión, registros en el orden del modelo, registros por pk)
+_tablas = {}
+_lock = threading.Lock()
+
+
+def grupo_referencias(modelo):
+    """Grupo de cache.py con la versión de la tabla (sirve también para ETags)"""
+    return f'referencias:{modelo._meta.model_name}'
+
+
+def _tabla(modelo):
+    if modelo not in MODELOS_REFERENCIA:
+        raise ValueError(f'{modelo._meta.label} no es una tabla de referencia')
+    version = obtener_version(grupo_referencias(modelo))
+    tabla = _tablas.get(modelo)
+    if tabla is None or tabla[0] != version:
+        with _lock:
+            tabla = _tablas.get(modelo)
+            if tabla is None or tabla[0] != version:
+                registros = list(
+                    modelo._default_manager.using(DEFAULT_DB_ALIAS).order_by(*modelo._meta.ordering, 'pk')
+                )
+                tabla = (version, registros, {registro.pk: registro for registro in registros})
+                _tablas[modelo] = tabla
+    return tabla
+
+
+def obtener_referencias(modelo, solo_activos=True):
+    """
+    Registros de la tabla en su orden habitual. Son compartidos por el
+    proceso: no deben modificarse.
+    """
+    _version, registros, _por_pk = _tabla(modelo)
+    if solo_activos:
+        return [registro for registro in registros if registro.activo]
+    return registros
+
+
+def obtener_referencia(modelo, pk):
+    """Registro con esa clave (activo o no), o None"""
+    return _tabla(modelo)[2].get(pk)
+
+
+def invalidar_referencias(*modelos):
+    """Fuerza a todos los procesos a recargar las tablas indicadas (al confirmarse la transacción)"""
+    transaction.on_commit(partial(invalidar, *(grupo_referencias(modelo) for modelo in modelos)))
+
+
+class _IteradorReferencias(ModelChoiceIterator):
+    """Opciones del campo a partir de la caché, sin consultar la base de datos"""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for registro in obtener_referencias(self.queryset.model):
+            yield self.choice(registro)
+
+    def __len__(self):
+        return len(obtener_referencias(self.queryset.model)) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(obtener_referencias(self.queryset.model))
+
+
+class CampoReferencia(forms.ModelChoiceField):
+    """
+    ModelChoiceField para las tablas de referencia: muestra y valida contra
+    los registros activos de la caché. El ``queryset`` del campo solo indica
+    el modelo.
+    """
+    iterator = _IteradorReferencias
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, self.queryset.model):
+            value = value.pk
+        try:
+            registro = obtener_referencia(self.queryset.model, int(value))
+        except (TypeError, ValueError):
+            registro = None
+        if registro is None or not registro.activo:
+            raise ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value},
+            )
+        # Copia: el registro de la caché no debe quedar ligado al objeto del formulario
+        return copy.copy(registro)
@@ -0,0 +1,288 @@
+"""
+Resúmenes precalculados para los encabezados de las vistas.
+
+ResumenInventario guarda por categoría los indicadores del mantenedor de
+productos. Se recalcula con una sola consulta de agregación condicional y
+se mantiene con deltas (UPDATE ... SET campo = campo + n) en cada guardado
+o eliminación de un Producto, de modo que leerlo cuesta una consulta.
+
+ResumenCitasDiario guarda por día, veterinario, tipo y estado la cantidad
+de citas y la suma de sus precios estimados. Se mantiene igual, con deltas
+en cada guardado o eliminación de una Cita (un cambio de estado resta de
+la fila del estado anterior y suma a la del nuevo), y las estadísticas de
+citas se calculan solo a partir de estas filas.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Cita, Producto, ResumenCitasDiario, ResumenInventario, Veterinario
+from .referencias import obtener_referencia
+
+# Un producto tiene stock bajo si le quedan entre 1 y STOCK_BAJO_MAXIMO unidades
+STOCK_BAJO_MAXIMO = 5
+
+CAMPOS_INVENTARIO = ('total_valor', 'productos_activos', 'stock_bajo', 'con_stock')
+
+
+def calcular_resumen_inventario(categoria_ids=None):
+    """
+    Calcula los indicadores por categoría en una sola consulta.
+
+    Devuelve un diccionario {categoria_id: {campo: valor}}; las categorías
+    sin productos activos no aparecen.
+    """
+    productos = Producto.objects.filter(activo=True)
+    if categoria_ids is not None:
+        productos = productos.filter(categoria_id__in=categoria_ids)
+    filas = productos.order_by().values('categoria_id').annotate(
+        total_valor=Sum('precio'),
+        productos_activos=Count('id'),
+        stock_bajo=Count('id', filter=Q(stock__gt=0, stock__lte=STOCK_BAJO_MAXIMO)),
+        con_stock=Count('id', filter=Q(stock__gt=0)),
+    )
+    resultado = {}
+    for fila in filas:
+        categoria_id = fila.pop('categoria_id')
+        fila['total_valor'] = fila['total_valor'] or Decimal('0')
+        resultado[categoria_id] = fila
+    return resultado
+
+
+def recalcular_resumen_inventario(categoria_ids):
+    """Recalcula desde cero el resumen de las categorías indicadas"""
+    categoria_ids = list(categoria_ids)
+    calculados = calcular_resumen_inventario(categoria_ids)
+    vacio = {campo: 0 for campo in CAMPOS_INVENTARIO}
+    for categoria_id in categoria_ids:
+        ResumenInventario.objects.update_or_create(
+            categoria_id=categoria_id,
+            defaults=calculados.get(categoria_id, vacio),
+        )
+
+
+def obtener_resumen_inventario(categoria):
+    """Resumen de una categoría, creándolo si todavía no existe"""
+    try:
+        return ResumenInventario.objects.get(categoria=categoria)
+    except ResumenInventario.DoesNotExist:
+        recalcular_resumen_inventario([categoria.pk])
+        return ResumenInventario.objects.get(categoria=categoria)
+
+
+def contribucion_producto(datos):
+    """Aporte de un producto (activo, precio, stock) a cada indicador"""
+    if not datos or not datos['activo']:
+        return {campo: 0 for campo in CAMPOS_INVENTARIO}
+    stock = datos['stock'] or 0
+    return {
+        'total_valor': datos['precio'] or Decimal('0'),
+        'productos_activos': 1,
+        'stock_bajo': 1 if 0 < stock <= STOCK_BAJO_MAXIMO else 0,
+        'con_stock': 1 if stock > 0 else 0,
+    }
+
+
+def aplicar_cambio_inventario(antes, despues):
+    """
+    Ajusta los resúmenes afectados por el cambio de un producto.
+
+    ``antes`` y ``despues`` son diccionarios con categoria_id, activo,
+    precio y stock (None si el producto no existía o fue eliminado).
+    Si el resumen de la categoría de ``despues`` aún no existe se calcula
+    completo. Si solo se descuenta (la categoría anterior o un producto
+    eliminado) y la fila no existe no se hace nada: al eliminar una
+    categoría la cascada borra su resumen antes que sus productos, y
+    recalcularlo ahí lo dejaría bajo cero con el siguiente descuento.
+    obtener_resumen_inventario lo calcula cuando se vuelva a leer.
+    """
+    deltas = {}
+    for datos, signo in ((antes, -1), (despues, 1)):
+        if not datos:
+            continue
+        delta = deltas.setdefault(datos['categoria_id'], {campo: 0 for campo in CAMPOS_INVENTARIO})
+        for campo, valor in contribucion_producto(datos).items():
+            delta[campo] += signo * valor
+
+    for categoria_id, delta in deltas.items():
+        cambios = {campo: F(campo) + valor for campo, valor in delta.items() if valor}
+        if not cambios:
+            continue
+        actualizados = ResumenInventario.objects.filter(categoria_id=categoria_id).update(
+            fecha_actualizacion=timezone.now(), **cambios
+        )
+        if not actualizados and despues and categoria_id == despues['categoria_id']:
+            recalcular_resumen_inventario([categoria_id])
+
+
+def datos_inventario(producto):
+    """Campos de un producto que afectan al resumen de inventario"""
+    return {
+        'categoria_id': producto.categoria_id,
+        'activo': producto.activo,
+        'precio': producto.precio,
+        'stock': producto.stock,
+    }
+
+
+# ============================================================================
+# RESUMEN DIARIO DE CITAS
+# ============================================================================
+
+CLAVE_CITAS = ('fecha', 'veterinario_id', 'tipo_cita', 'estado')
+
+# Estados que no cuentan para el ingreso estimado
+ESTADOS_SIN_INGRESO = ('cancelada', 'no_asistio')
+
+
+def datos_cita(cita):
+    """Campos de una cita que afectan al resumen diario"""
+    return {
+        'fecha': timezone.localtime(cita.fecha_hora).date(),
+        'veterinario_id': cita.veterinario_id,
+        'tipo_cita': cita.tipo_cita,
+        'estado': cita.estado,
+        'precio_estimado': cita.precio_estimado,
+    }
+
+
+def calcular_resumen_citas(desde=None, hasta=None):
+    """
+    Agrega las citas por día (en la zona horaria local), veterinario, tipo
+    y estado en una sola consulta; ``desde`` y ``hasta`` limitan las fechas
+    (inclusive). Devuelve una lista de diccionarios con los campos de
+    ResumenCitasDiario.
+    """
+    citas = Cita.objects.annotate(fecha=TruncDate('fecha_hora'))
+    if desde:
+        citas = citas.filter(fecha__gte=desde)
+    if hasta:
+        citas = citas.filter(fecha__lte=hasta)
+    filas = citas.order_by().values(*CLAVE_CITAS).annotate(
+        cantidad=Count('id'),
+        con_precio=Count('precio_estimado'),
+        total_precio_estimado=Sum('precio_estimado'),
+    )
+    for fila in filas:
+        fila['total_precio_estimado'] = fila['total_precio_estimado'] or Decimal('0')
+    return list(filas)
+
+
+def recalcular_resumen_citas(desde=None, hasta=None):
+    """
+    Reemplaza el resumen de las fechas indicadas (todas por defecto) por
+    uno calculado desde cero. Devuelve la cantidad de filas escritas.
+    """
+    filas = calcular_resumen_citas(desde, hasta)
+    with transaction.atomic():
+        existentes = ResumenCitasDiario.objects.all()
+        if desde:
+            existentes = existentes.filter(fecha__gte=desde)
+        if hasta:
+            existentes = existentes.filter(fecha__lte=hasta)
+        existentes.delete()
+        ResumenCitasDiario.objects.bulk_create(
+            (ResumenCitasDiario(**fila) for fila in filas), batch_size=1000,
+        )
+    return len(filas)
+
+
+def aplicar_cambio_citas(antes, despues):
+    """
+    Ajusta las filas del resumen afectadas por el cambio de una cita.
+
+    ``antes`` y ``despues`` son diccionarios como los de datos_cita (None si
+    la cita no existía o fue eliminada). Si una fila que debe descontarse
+    no existe o quedaría negativa, el resumen se desfasó y se recalcula ese
+    día completo.
+    """
+    deltas = {}
+    for datos, signo in ((antes, -1), (despues, 1)):
+        if not datos:
+            continue
+        clave = tuple(datos[campo] for campo in CLAVE_CITAS)
+        delta = deltas.setdefault(clave, {'cantidad': 0, 'con_precio': 0, 'total_precio_estimado': Decimal('0')})
+        delta['cantidad'] += signo
+        if datos['precio_estimado'] is not None:
+            delta['con_precio'] += signo
+            delta['total_precio_estimado'] += signo * datos['precio_estimado']
+
+    ahora = timezone.now()
+    desfasadas = set()
+    for clave, delta in deltas.items():
+        cambios = {campo: F(campo) + valor for campo, valor in delta.items() if valor}
+        if not cambios:
+            continue
+        filtro = dict(zip(CLAVE_CITAS, clave))
+        if delta['cantidad'] >= 0:
+            actualizados = ResumenCitasDiario.objects.filter(**filtro).update(fecha_actualizacion=ahora, **cambios)
+            if not actualizados and delta['cantidad'] > 0:
+                try:
+                    with transaction.atomic():
+                        ResumenCitasDiario.objects.create(**filtro, **delta)
+                    continue
+                except IntegrityError:
+                    # Otra petición creó la fila entre el UPDATE y el INSERT
+                    actualizados = ResumenCitasDiario.objects.filter(**filtro).update(
+                        fecha_actualizacion=ahora, **cambios
+                    )
+        else:
+            actualizados = ResumenCitasDiario.objects.filter(
+                cantidad__gte=-delta['cantidad'], con_precio__gte=-delta['con_precio'], **filtro
+            ).update(fecha_actualizacion=ahora, **cambios)
+        if not actualizados:
+            desfasadas.add(filtro['fecha'])
+    # Al final: recalcular el día reemplaza también los deltas ya aplicados en él
+    for fecha in desfasadas:
+        recalcular_resumen_citas(fecha, fecha)
+
+
+def obtener_estadisticas_citas(desde, hasta, veterinario=None):
+    """
+    Totales de citas entre ``desde`` y ``hasta`` (inclusive) por estado,
+    tipo, veterinario y día, leídos solo del resumen diario. El ingreso
+    estimado excluye las citas canceladas y las inasistencias.
+    """
+    filas = ResumenCitasDiario.objects.filter(fecha__range=(desde, hasta), cantidad__gt=0)
+    if veterinario is not None:
+        filas = filas.filter(veterinario_id=veterinario)
+
+    def acumulador():
+        return {'cantidad': 0, 'con_precio': 0, 'total_precio_estimado': Decimal('0'), 'ingreso_estimado': Decimal('0')}
+
+    totales = acumulador()
+    grupos = {campo: defaultdict(acumulador) for campo in ('estado', 'tipo_cita', 'veterinario_id', 'fecha')}
+    for fila in filas.values(*CLAVE_CITAS, 'cantidad', 'con_precio', 'total_precio_estimado').iterator():
+        ingreso = Decimal('0') if fila['estado'] in ESTADOS_SIN_INGRESO else fila['total_precio_estimado']
+        for acumulado in (totales, *(grupos[campo][fila[campo]] for campo in grupos)):
+            acumulado['cantidad'] += fila['cantidad']
+            acumulado['con_precio'] += fila['con_precio']
+            acumulado['total_precio_estimado'] += fila['total_precio_estimado']
+            acumulado['ingreso_estimado'] += ingreso
+
+    tipos = dict(Cita.TIPO_CITA_CHOICES)
+
+    def nombre_veterinario(veterinario_id):
+        registro = obtener_referencia(Veterinario, veterinario_id) if veterinario_id else None
+        return registro.nombre if registro else 'Sin asignar'
+
+    return {
+        'totales': totales,
+        'por_estado': [
+            dict(grupos['estado'][valor], clave=valor, nombre=nombre)
+            for valor, nombre in Cita.ESTADO_CHOICES if valor in grupos['estado']
+        ],
+        'por_tipo': sorted(
+            (dict(acumulado, clave=valor, nombre=tipos.get(valor, valor)) for valor, acumulado in grupos['tipo_cita'].items()),
+            key=lambda grupo: -grupo['cantidad'],
+        ),
+        'por_veterinario': sorted(
+            (dict(acumulado, clave=valor, nombre=nombre_veterinario(valor)) for valor, acumulado in grupos['veterinario_id'].items()),
+            key=lambda grupo: -grupo['cantidad'],
+        ),
+        'por_dia': [dict(grupos['fecha'][fecha], clave=fecha) for fecha in sorted(grupos['fecha'])],
+    }
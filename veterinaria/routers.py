@@ -0,0 +1,129 @@
+"""
+Enrutamiento de lecturas a réplicas de la base de datos.
+
+Las réplicas se configuran con DATABASE_REPLICA_URLS (ver
+veterinaria_sistema/basedatos.py) y quedan en DATABASES como
+``replica_1``, ``replica_2``, etc. Las escrituras siempre van a
+``default`` (la primaria). Las lecturas van a una réplica solo durante una
+petición segura (GET, HEAD, OPTIONS) que ReplicaMiddleware marcó como
+apta. Se quedan en la primaria:
+
+- las peticiones que escriben (POST, etc.) y, mediante una cookie, las que
+  el mismo navegador haga durante los segundos siguientes, para que vea
+  lo que acaba de guardar aunque la réplica aún no lo tenga;
+- el resto de una petición GET después de su primera escritura;
+- todas las peticiones mientras ninguna réplica esté disponible o todas
+  estén más atrasadas que VETERINARIA_RETRASO_MAXIMO_REPLICA;
+- todo lo que ocurra fuera de una petición (comandos, shell).
+"""
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Segundos de retraso de replicación tolerados antes de volver a la primaria
+RETRASO_MAXIMO_REPLICA = getattr(settings, 'VETERINARIA_RETRASO_MAXIMO_REPLICA', 5)
+
+# Segundos que se reutiliza la medición del retraso de cada réplica
+SEGUNDOS_VERIFICACION_REPLICA = getattr(settings, 'VETERINARIA_SEGUNDOS_VERIFICACION_REPLICA', 5)
+
+# Segundos que un navegador sigue leyendo de la primaria después de escribir
+SEGUNDOS_FIJACION_PRIMARIA = getattr(settings, 'VETERINARIA_SEGUNDOS_FIJACION_PRIMARIA', 10)
+
+COOKIE_FIJACION = 'vet_primaria'
+
+# Base de datos para las lecturas de la petición en curso (None: primaria)
+_lectura_actual = ContextVar('veterinaria_lectura_actual', default=None)
+
+_estado_replicas = {}  # alias -> (momento de la verificación, disponible)
+_lock = threading.Lock()
+
+
+def alias_replicas():
+    """Alias de las réplicas configuradas en DATABASES"""
+    return [alias for alias in settings.DATABASES if alias.startswith('replica_')]
+
+
+def retraso_replica(alias):
+    """
+    Segundos de retraso de la réplica. En PostgreSQL es 0 si ya aplicó todo
+    lo recibido de la primaria; en otros motores no se puede medir y se
+    considera 0 (solo se comprueba que responda).
+    """
+    conexion = connections[alias]
+    with conexion.cursor() as cursor:
+        if conexion.vendor != 'postgresql':
+            cursor.execute('SELECT 1')
+            return 0.0
+        cursor.execute(
+            'SELECT CASE WHEN NOT pg_is_in_recovery() '
+            'OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+            'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+        )
+        return float(cursor.fetchone()[0] or 0)
+
+
+def replica_disponible(alias):
+    """Indica si la réplica responde y está al día; se verifica cada pocos segundos"""
+    ahora = time.monotonic()
+    with _lock:
+        verificada, disponible = _estado_replicas.get(alias, (None, False))
+    if verificada is not None and ahora - verificada < SEGUNDOS_VERIFICACION_REPLICA:
+        return disponible
+    try:
+        retraso = retraso_replica(alias)
+        disponible = retraso <= RETRASO_MAXIMO_REPLICA
+        if not disponible:
+            logger.warning('Réplica %s con %.1f s de retraso; se lee de la primaria', alias, retraso)
+    except DatabaseError:
+        logger.warning('Réplica %s no disponible; se lee de la primaria', alias, exc_info=True)
+        disponible = False
+    with _lock:
+        _estado_replicas[alias] = (ahora, disponible)
+    return disponible
+
+
+def elegir_replica():
+    """Una réplica disponible al azar, o None si no hay ninguna"""
+    candidatas = [alias for alias in alias_replicas() if replica_disponible(alias)]
+    return random.choice(candidatas) if candidatas else None
+
+
+def leer_desde(alias):
+    """Fija la base de las lecturas de la petición en curso; devuelve el token para restaurarla"""
+    return _lectura_actual.set(alias)
+
+
+def restaurar_lectura(token):
+    _lectura_actual.reset(token)
+
+
+class RouterReplicas:
+    """Router de DATABASE_ROUTERS: lecturas según la petición, escrituras a la primaria"""
+
+    def db_for_read(self, model, **hints):
+        instancia = hints.get('instance')
+        if instancia is not None and instancia._state.db:
+            # Los objetos relacionados se leen de la misma base que su origen
+            return instancia._state.db
+        return _lectura_actual.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if _lectura_actual.get():
+            # Lo que la petición lea después de escribir debe incluir su escritura
+            _lectura_actual.set(None)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Todas las bases tienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por replicación
+        return db == DEFAULT_DB_ALIAS
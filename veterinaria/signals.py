@@ -0,0 +1,196 @@
+"""
+Señales de la aplicación veterinaria.
+
+Mantienen sincronizados los datos derivados (documentos de búsqueda,
+índices de texto completo y resúmenes) cuando cambian los modelos de origen.
+"""
+import logging
+from functools import partial
+
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .agenda import asignar_intervalo
+from .busqueda import crear_indices_busqueda
+from .cache import invalidar
+from .imagenes import eliminar_variantes, generar_variantes
+from .models import Categoria, Cita, Mascota, MovimientoStock, Producto, TipoAnimal, Veterinario
+from .referencias import invalidar_referencias
+from .resumenes import aplicar_cambio_citas, aplicar_cambio_inventario, datos_cita, datos_inventario
+
+logger = logging.getLogger(__name__)
+
+
+def reparar_indices_busqueda(sender, using, **kwargs):
+    """Recrea los índices de texto completo que una migración haya eliminado"""
+    crear_indices_busqueda(connections[using])
+
+
+@receiver(pre_save, sender=Cita)
+def actualizar_documento_cita(sender, instance, raw=False, **kwargs):
+    """Recalcula el documento de búsqueda antes de guardar la cita"""
+    if raw:
+        return
+    instance.documento_busqueda = instance.construir_documento_busqueda()
+
+
+@receiver(pre_save, sender=Cita)
+def calcular_intervalo_cita(sender, instance, raw=False, **kwargs):
+    """Recalcula la duración y la hora de término según el tipo de cita"""
+    if raw:
+        return
+    asignar_intervalo(instance)
+
+
+@receiver(pre_save, sender=Cita)
+def recordar_cita_previa(sender, instance, raw=False, **kwargs):
+    """Guarda los valores previos de la cita para calcular el delta del resumen"""
+    instance._resumen_previo = None
+    if raw or not instance.pk:
+        return
+    previa = Cita.objects.filter(pk=instance.pk).only(
+        'fecha_hora', 'veterinario', 'tipo_cita', 'estado', 'precio_estimado'
+    ).first()
+    if previa is not None:
+        instance._resumen_previo = datos_cita(previa)
+
+
+@receiver(post_save, sender=Cita)
+def actualizar_resumen_citas(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    aplicar_cambio_citas(getattr(instance, '_resumen_previo', None), datos_cita(instance))
+
+
+@receiver(post_delete, sender=Cita)
+def descontar_resumen_citas(sender, instance, **kwargs):
+    aplicar_cambio_citas(datos_cita(instance), None)
+
+
+@receiver(post_save, sender=Mascota)
+def propagar_documento_mascota(sender, instance, created, raw=False, **kwargs):
+    """Actualiza el documento de búsqueda de las citas de la mascota"""
+    if created or raw:
+        return
+    Cita.objects.filter(mascota=instance).update(
+        documento_busqueda=Cita.expresion_documento_busqueda(instance)
+    )
+
+
+@receiver(pre_save, sender=Veterinario)
+def recordar_nombre_veterinario(sender, instance, raw=False, **kwargs):
+    instance._nombre_previo = None
+    if raw or not instance.pk:
+        return
+    instance._nombre_previo = Veterinario.objects.filter(pk=instance.pk).values_list('nombre', flat=True).first()
+
+
+@receiver(post_save, sender=Veterinario)
+def propagar_documento_veterinario(sender, instance, created, raw=False, **kwargs):
+    """Si cambió el nombre, actualiza el documento de búsqueda de sus citas"""
+    if created or raw or getattr(instance, '_nombre_previo', None) in (None, instance.nombre):
+        return
+    Cita.objects.filter(veterinario=instance).update(
+        documento_busqueda=Cita.expresion_documento_busqueda(veterinario=instance)
+    )
+
+
+@receiver(pre_save, sender=Producto)
+def recordar_inventario_previo(sender, instance, raw=False, **kwargs):
+    """Guarda los valores previos del producto para calcular el delta"""
+    instance._inventario_previo = None
+    if raw or not instance.pk:
+        return
+    instance._inventario_previo = Producto.objects.filter(pk=instance.pk).values(
+        'categoria_id', 'activo', 'precio', 'stock'
+    ).first()
+
+
+@receiver(post_save, sender=Producto)
+def actualizar_resumen_inventario(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    aplicar_cambio_inventario(getattr(instance, '_inventario_previo', None), datos_inventario(instance))
+
+
+@receiver(post_save, sender=Producto)
+def registrar_saldo_inicial(sender, instance, created, raw=False, **kwargs):
+    """El stock con que se crea un producto es su primer movimiento"""
+    if created and not raw and (instance.stock or instance.stock_reservado):
+        MovimientoStock.objects.create(
+            producto=instance, tipo='ajuste', cantidad=instance.stock,
+            cantidad_reservada=instance.stock_reservado, motivo='Saldo inicial',
+        )
+
+
+@receiver(post_delete, sender=Producto)
+def descontar_resumen_inventario(sender, instance, **kwargs):
+    aplicar_cambio_inventario(datos_inventario(instance), None)
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def invalidar_cache_categorias(sender, **kwargs):
+    invalidar('categorias', 'catalogo')
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def invalidar_cache_catalogo(sender, **kwargs):
+    invalidar('catalogo')
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_save, sender=TipoAnimal)
+@receiver(post_delete, sender=TipoAnimal)
+@receiver(post_save, sender=Veterinario)
+@receiver(post_delete, sender=Veterinario)
+def invalidar_cache_referencias(sender, **kwargs):
+    """Las opciones de los formularios se recargan en todos los procesos"""
+    invalidar_referencias(sender)
+
+
+@receiver(pre_save, sender=Categoria)
+@receiver(pre_save, sender=Mascota)
+@receiver(pre_save, sender=Producto)
+def recordar_imagen_previa(sender, instance, raw=False, **kwargs):
+    """Guarda el nombre de la imagen anterior para borrar sus variantes si se reemplaza"""
+    instance._imagen_previa = None
+    if raw or not instance.pk:
+        return
+    instance._imagen_previa = sender._default_manager.filter(pk=instance.pk).values_list('imagen', flat=True).first()
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=Mascota)
+@receiver(post_save, sender=Producto)
+def eliminar_variantes_reemplazadas(sender, instance, raw=False, **kwargs):
+    previa = getattr(instance, '_imagen_previa', None)
+    if raw or not previa or previa == instance.imagen.name:
+        return
+    # Después del commit: si la transacción se revierte la imagen anterior sigue en uso
+    transaction.on_commit(partial(eliminar_variantes, previa, instance.imagen.storage))
+
+
+@receiver(post_delete, sender=Categoria)
+@receiver(post_delete, sender=Mascota)
+@receiver(post_delete, sender=Producto)
+def eliminar_variantes_imagen(sender, instance, **kwargs):
+    if instance.imagen:
+        transaction.on_commit(partial(eliminar_variantes, instance.imagen.name, instance.imagen.storage))
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=Mascota)
+@receiver(post_save, sender=Producto)
+def generar_variantes_imagen(sender, instance, raw=False, **kwargs):
+    """Genera las variantes redimensionadas de una imagen recién subida"""
+    if raw or not instance.imagen:
+        return
+    try:
+        generar_variantes(instance.imagen)
+    except OSError:
+        # Una imagen ilegible no debe impedir guardar el registro
+        logger.warning('No se pudieron generar variantes de %s', instance.imagen.name, exc_info=True)
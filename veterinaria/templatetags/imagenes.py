@@ -0,0 +1,44 @@
+"""
+Etiquetas para mostrar imágenes con sus variantes redimensionadas.
+
+Uso::
+
+    {% load imagenes %}
+    {% imagen_responsive producto alt=producto.nombre class="producto-imagen" sizes="33vw" %}
+"""
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+
+from ..imagenes import TIPOS_MIME
+
+register = template.Library()
+
+# Ancho con que se muestra la imagen si la plantilla no indica ``sizes``
+SIZES_POR_DEFECTO = '(min-width: 768px) 33vw, 100vw'
+
+
+@register.simple_tag
+def imagen_responsive(objeto, sizes=SIZES_POR_DEFECTO, **atributos):
+    """
+    Renderiza ``<picture>`` con un ``<source>`` por formato disponible y la
+    imagen original como respaldo. Los demás argumentos (``alt``, ``class``,
+    ``style``...) se copian en el ``<img>``.
+    """
+    atributos.setdefault('alt', '')
+    atributos.setdefault('loading', 'lazy')
+    atributos.setdefault('decoding', 'async')
+    fuentes = format_html_join(
+        '',
+        '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (TIPOS_MIME[formato], objeto.imagen_srcset(formato), sizes)
+            for formato in objeto.imagen_variantes()
+        ),
+    )
+    return format_html(
+        '<picture>{}<img src="{}"{}></picture>',
+        fuentes,
+        objeto.imagen.url,
+        flatatt(atributos),
+    )
@@ -1,3 +1,644 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+import threading
+import warnings
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import inventario
+from .agenda import buscar_conflicto, disponibilidad
+from .datos_sinteticos import generar_datos
+from .forms import CitaForm
+from .imagenes import es_variante, nombre_variante
+from .importacion import importar_mascotas, importar_productos
+from .middleware import ReplicaMiddleware
+from .paginacion import codificar_cursor
+from .routers import COOKIE_FIJACION, SEGUNDOS_FIJACION_PRIMARIA, RouterReplicas
+from .models import (
+    Categoria, Cita, Mascota, MovimientoStock, Producto, ResumenCitasDiario, ResumenInventario, TipoAnimal, Veterinario,
+)
+from .resumenes import CLAVE_CITAS, calcular_resumen_citas, calcular_resumen_inventario, obtener_resumen_inventario
+
+
+class ResumenInventarioTests(TestCase):
+    def crear_producto(self, categoria, codigo, stock=3):
+        return Producto.objects.create(
+            categoria=categoria, nombre=f'Producto {codigo}', tipo_producto='medicamento',
+            precio=Decimal('1000'), codigo=codigo, stock=stock,
+        )
+
+    def test_eliminar_categoria_con_productos(self):
+        categoria = Categoria.objects.create(nombre='Categoría eliminada')
+        for codigo in ('ELIM-1', 'ELIM-2', 'ELIM-3'):
+            self.crear_producto(categoria, codigo)
+        self.assertEqual(obtener_resumen_inventario(categoria).productos_activos, 3)
+
+        categoria.delete()
+
+        self.assertFalse(ResumenInventario.objects.filter(categoria_id=categoria.pk).exists())
+        self.assertFalse(Producto.objects.filter(codigo__startswith='ELIM-').exists())
+
+    def test_eliminar_producto_descuenta_del_resumen(self):
+        categoria = Categoria.objects.create(nombre='Categoría con productos')
+        producto = self.crear_producto(categoria, 'DESC-1')
+        self.crear_producto(categoria, 'DESC-2', stock=0)
+
+        producto.delete()
+
+        resumen = obtener_resumen_inventario(categoria)
+        esperado = calcular_resumen_inventario([categoria.pk])[categoria.pk]
+        self.assertEqual(
+            (resumen.productos_activos, resumen.con_stock, resumen.total_valor),
+            (esperado['productos_activos'], esperado['con_stock'], esperado['total_valor']),
+        )
+
+
+class VariantesImagenTests(TestCase):
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.addCleanup(cache.clear)
+
+    def imagen(self, nombre):
+        contenido = io.BytesIO()
+        Image.new('RGB', (700, 400), 'white').save(contenido, format='PNG')
+        return SimpleUploadedFile(nombre, contenido.getvalue(), content_type='image/png')
+
+    def test_reemplazar_y_eliminar_borra_variantes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            categoria = Categoria.objects.create(nombre='Con imagen', descripcion='x', imagen=self.imagen('a.png'))
+        anterior = categoria.imagen.name
+        storage = categoria.imagen.storage
+        self.assertEqual([ancho for _url, ancho in categoria.imagen_variantes()['webp']], [320, 640])
+        self.assertTrue(storage.exists(nombre_variante(anterior, 320, 'webp')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            categoria.imagen = self.imagen('b.png')
+            categoria.save()
+        self.assertFalse(storage.exists(nombre_variante(anterior, 320, 'webp')))
+        self.assertTrue(storage.exists(nombre_variante(categoria.imagen.name, 640, 'webp')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            categoria.delete()
+        self.assertFalse(storage.exists(nombre_variante(categoria.imagen.name, 640, 'webp')))
+
+    def test_mismo_nombre_con_otra_extension_no_comparte_variantes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            jpg = Categoria.objects.create(nombre='JPG', descripcion='x', imagen=self.imagen('d.jpg'))
+            png = Categoria.objects.create(nombre='PNG', descripcion='x', imagen=self.imagen('d.png'))
+        self.assertNotEqual(nombre_variante(jpg.imagen.name, 320, 'webp'), nombre_variante(png.imagen.name, 320, 'webp'))
+        self.assertTrue(es_variante(nombre_variante(jpg.imagen.name, 320, 'webp')))
+        self.assertFalse(es_variante(jpg.imagen.name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            jpg.delete()
+        storage = png.imagen.storage
+        self.assertTrue(storage.exists(nombre_variante(png.imagen.name, 320, 'webp')))
+        self.assertEqual([ancho for _url, ancho in png.imagen_variantes()['webp']], [320, 640])
+
+    def test_variantes_disponibles_no_consulta_el_storage(self):
+        categoria = Categoria.objects.create(nombre='Con imagen', descripcion='x', imagen=self.imagen('c.png'))
+        with mock.patch.object(FileSystemStorage, 'exists') as existe:
+            variantes = Categoria.objects.get(pk=categoria.pk).imagen_variantes()
+        existe.assert_not_called()
+        self.assertIn('webp', variantes)
+
+
+class InventarioTests(TestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.categoria = Categoria.objects.create(nombre='Farmacia')
+        self.producto = Producto.objects.create(
+            categoria=self.categoria, nombre='Antiparasitario', tipo_producto='medicamento',
+            precio=Decimal('5000'), codigo='INV-1', stock=8,
+        )
+
+    def test_consumo_con_stock_leido_antes_no_deja_stock_negativo(self):
+        # Dos procesos leen el producto con 8 unidades y ambos intentan vender 5
+        primero = Producto.objects.get(pk=self.producto.pk)
+        segundo = Producto.objects.get(pk=self.producto.pk)
+        inventario.consumir(primero, 5)
+        with self.assertRaises(ValidationError):
+            inventario.consumir(segundo, 5)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 3)
+        self.assertEqual(self.producto.movimientos_stock.filter(tipo='consumo').count(), 1)
+
+    def test_reservar_y_liberar(self):
+        inventario.reservar(self.producto, 6)
+        with self.assertRaises(ValidationError):
+            inventario.consumir(self.producto, 3)
+        with self.assertRaises(ValidationError):
+            inventario.liberar_reserva(self.producto, 7)
+        inventario.consumir(self.producto, 2, reservado=True)
+        inventario.liberar_reserva(self.producto, 4)
+        self.producto.refresh_from_db()
+        self.assertEqual((self.producto.stock, self.producto.stock_reservado), (6, 0))
+        self.assertEqual(inventario.conciliar_stock(registrar=False), [])
+
+    def test_conciliar_registra_ajustes(self):
+        # Cambio hecho fuera del libro de movimientos (por ejemplo, una carga masiva)
+        Producto.objects.filter(pk=self.producto.pk).update(stock=11)
+        diferencias = inventario.conciliar_stock()
+        self.assertEqual([(fila['id'], fila['stock_registrado']) for fila in diferencias], [(self.producto.pk, 8)])
+        ajuste = MovimientoStock.objects.filter(producto=self.producto, motivo='Conciliación').get()
+        self.assertEqual((ajuste.tipo, ajuste.cantidad, ajuste.cantidad_reservada), ('ajuste', 3, 0))
+        self.assertEqual(inventario.conciliar_stock(), [])
+
+    def test_movimiento_invalida_paginas_del_catalogo(self):
+        url = reverse('productos_categoria', args=[self.categoria.pk])
+        self.assertContains(self.client.get(url), '<span class="badge bg-warning">8</span>', html=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            inventario.consumir(self.producto, 5)
+        self.assertContains(self.client.get(url), '<span class="badge bg-warning">3</span>', html=True)
+
+        Producto.objects.filter(pk=self.producto.pk).update(stock=9)
+        with self.captureOnCommitCallbacks(execute=True):
+            inventario.conciliar_stock()
+        self.assertContains(self.client.get(url), '<span class="badge bg-warning">9</span>', html=True)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class InventarioConcurrenteTests(TransactionTestCase):
+    def test_consumos_simultaneos_no_dejan_stock_negativo(self):
+        categoria = Categoria.objects.create(nombre='Farmacia')
+        producto = Producto.objects.create(
+            categoria=categoria, nombre='Vacuna', tipo_producto='medicamento',
+            precio=Decimal('9000'), codigo='CONC-1', stock=5,
+        )
+        barrera = threading.Barrier(4)
+        resultados = []
+
+        def vender():
+            try:
+                barrera.wait()
+                inventario.consumir(producto.pk, 2)
+                resultados.append('ok')
+            except ValidationError:
+                resultados.append('sin stock')
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=vender) for _ in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        producto.refresh_from_db()
+        self.assertEqual(sorted(resultados), ['ok', 'ok', 'sin stock', 'sin stock'])
+        self.assertEqual(producto.stock, 1)
+
+
+class ImportacionProductosTests(TestCase):
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nombre='Farmacia')
+
+    def importar(self, contenido, **opciones):
+        return importar_productos(io.BytesIO(contenido.encode()), **opciones)
+
+    def test_aplica_las_reglas_de_medicamentos_del_formulario(self):
+        resultado = self.importar(
+            'codigo,nombre,categoria,tipo,descripcion,precio,stock\n'
+            'MED-001,Antibiótico,Farmacia,medicamento,Corta,4500,10\n'
+        )
+        columnas = {columna for _fila, columna, _mensaje in resultado.errores}
+        self.assertEqual(columnas, {'descripcion', 'principio_activo', 'concentracion', 'laboratorio'})
+        self.assertFalse(Producto.objects.filter(codigo='MED-001').exists())
+
+    def test_actualizacion_conserva_datos_de_medicamento_ausentes(self):
+        Producto.objects.create(
+            categoria=self.categoria, nombre='Antibiótico', tipo_producto='medicamento', precio=Decimal('4500'),
+            codigo='MED-002', principio_activo='Amoxicilina', concentracion='250 mg', laboratorio='Drag Pharma',
+        )
+        resultado = self.importar('codigo,nombre,categoria,tipo,precio\nMED-002,Antibiótico,Farmacia,medicamento,4990\n')
+        self.assertEqual((resultado.errores, resultado.actualizados), ([], 1))
+        self.assertEqual(Producto.objects.get(codigo='MED-002').precio, Decimal('4990'))
+
+    def test_reimportar_actualiza_sin_duplicar(self):
+        contenido = 'codigo,nombre,categoria,tipo,precio,stock\nALI-001,Alimento adulto,Farmacia,alimento,{},5\n'
+        self.assertEqual(self.importar(contenido.format('12990')).creados, 1)
+        resultado = self.importar(contenido.format('13990'))
+        self.assertEqual((resultado.creados, resultado.actualizados, resultado.errores), (0, 1, []))
+        self.assertEqual(list(Producto.objects.values_list('codigo', 'precio')), [('ALI-001', Decimal('13990'))])
+
+    def test_stock_no_puede_quedar_bajo_lo_reservado(self):
+        producto = Producto.objects.create(
+            categoria=self.categoria, nombre='Collar', tipo_producto='accesorio', precio=Decimal('3000'),
+            codigo='ACC-001', stock=10,
+        )
+        inventario.reservar(producto, 6)
+        resultado = self.importar('codigo,nombre,categoria,tipo,stock\nACC-001,Collar,Farmacia,accesorio,4\n')
+        self.assertEqual([columna for _fila, columna, _mensaje in resultado.errores], ['stock'])
+        producto.refresh_from_db()
+        self.assertEqual(producto.stock, 10)
+
+
+def proximo_dia_habil(dias=2):
+    dia = timezone.localdate() + timedelta(days=dias)
+    return dia + timedelta(days=1) if dia.weekday() == 6 else dia
+
+
+def crear_mascota(nombre='Luna'):
+    tipo, _creado = TipoAnimal.objects.get_or_create(nombre='Perro')
+    return Mascota.objects.create(
+        tipo_animal=tipo, nombre=nombre, sexo='hembra', propietario_nombre='Ana Rojas',
+        propietario_telefono='+56911112222',
+    )
+
+
+class AgendaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.mascota = crear_mascota()
+        self.veterinario = Veterinario.objects.create(nombre='Dra. Soto')
+        self.otro_veterinario = Veterinario.objects.create(nombre='Dr. Pérez')
+        self.dia = proximo_dia_habil()
+        # Cirugía de 10:00 a 12:00
+        self.cirugia = Cita.objects.create(
+            mascota=self.mascota, veterinario=self.veterinario, fecha_hora=self.hora(10),
+            tipo_cita='cirugia', motivo='Esterilización programada',
+        )
+
+    def hora(self, hora, minuto=0):
+        return timezone.make_aware(datetime.combine(self.dia, time(hora, minuto)))
+
+    def formulario(self, inicio, veterinario, instancia=None, tipo_cita='control'):
+        return CitaForm(instance=instancia, data={
+            'mascota': self.mascota.pk, 'fecha_hora': timezone.localtime(inicio).strftime('%Y-%m-%dT%H:%M'),
+            'tipo_cita': tipo_cita, 'estado': 'programada', 'motivo': 'Control posterior a la cirugía',
+            'veterinario': veterinario.pk, 'precio_estimado': '15000',
+        })
+
+    def test_solapamiento_con_el_mismo_veterinario_se_rechaza(self):
+        formulario = self.formulario(self.hora(11), self.veterinario)
+        self.assertFalse(formulario.is_valid())
+        self.assertIn('fecha_hora', formulario.errors)
+        # El intervalo es [inicio, fin): se puede empezar justo cuando termina la otra
+        self.assertEqual(buscar_conflicto(self.veterinario, self.hora(11, 59), 'control'), self.cirugia)
+        self.assertEqual(buscar_conflicto(self.veterinario, self.hora(9, 40), 'control'), None)
+        self.assertEqual(buscar_conflicto(self.veterinario, self.hora(12), 'control'), None)
+
+    def test_otro_veterinario_puede_atender_en_el_mismo_horario(self):
+        formulario = self.formulario(self.hora(11), self.otro_veterinario)
+        self.assertTrue(formulario.is_valid(), formulario.errors)
+
+    def test_cita_cancelada_libera_el_horario(self):
+        self.cirugia.estado = 'cancelada'
+        self.cirugia.save()
+        formulario = self.formulario(self.hora(11), self.veterinario)
+        self.assertTrue(formulario.is_valid(), formulario.errors)
+
+    def test_editar_una_cita_no_choca_consigo_misma(self):
+        formulario = self.formulario(self.hora(10, 30), self.veterinario, self.cirugia, tipo_cita='cirugia')
+        self.assertTrue(formulario.is_valid(), formulario.errors)
+        formulario.save()
+        self.cirugia.refresh_from_db()
+        self.assertEqual(self.cirugia.fecha_hora_fin, self.hora(12, 30))
+
+    def test_disponibilidad_omite_los_horarios_ocupados(self):
+        agenda = {
+            registro.pk: datos
+            for registro, datos in disponibilidad(self.dia, self.dia, tipo_cita='consulta_general').items()
+        }
+        horarios = agenda[self.veterinario.pk]['horarios']
+        # Una consulta de 30 minutos que empiece después de las 9:30 choca con la cirugía
+        self.assertEqual([horario for horario in horarios if self.hora(9, 31) <= horario < self.hora(12)], [])
+        self.assertIn(self.hora(9, 30), horarios)
+        self.assertIn(self.hora(12), horarios)
+        self.assertIn((self.hora(12), self.hora(20)), agenda[self.veterinario.pk]['libres'])
+        self.assertIn(self.hora(10), agenda[self.otro_veterinario.pk]['horarios'])
+
+
+class PaginacionKeysetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # 25 mascotas en dos grupos con la misma fecha de registro (paginate_by = 10)
+        ahora = timezone.now()
+        mascotas = [crear_mascota(f'Mascota {numero}') for numero in range(25)]
+        Mascota.objects.filter(pk__in=[mascota.pk for mascota in mascotas[:13]]).update(
+            fecha_registro=ahora - timedelta(days=1)
+        )
+        Mascota.objects.filter(pk__in=[mascota.pk for mascota in mascotas[13:]]).update(fecha_registro=ahora)
+        self.esperado = list(Mascota.objects.order_by('-fecha_registro', '-id').values_list('pk', flat=True))
+        self.url = reverse('mascota_list')
+
+    def pagina(self, querystring=''):
+        respuesta = self.client.get(f'{self.url}?{querystring}' if querystring else self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.context['page_obj']
+
+    def ids(self, pagina):
+        return [mascota.pk for mascota in pagina]
+
+    def test_empates_se_ordenan_por_id_sin_repetir_ni_saltar(self):
+        paginas = [self.pagina()]
+        while paginas[-1].has_next():
+            paginas.append(self.pagina(paginas[-1].querystring_siguiente))
+        self.assertEqual([len(pagina) for pagina in paginas], [10, 10, 5])
+        self.assertEqual([pk for pagina in paginas for pk in self.ids(pagina)], self.esperado)
+
+    def test_avanzar_y_retroceder_cruzando_el_cambio_de_fecha(self):
+        primera = self.pagina()
+        segunda = self.pagina(primera.querystring_siguiente)
+        tercera = self.pagina(segunda.querystring_siguiente)
+        self.assertFalse(tercera.has_next())
+        # La segunda página cruza del grupo de hoy (12) al de ayer (13)
+        self.assertEqual(self.ids(segunda), self.esperado[10:20])
+
+        anterior = self.pagina(tercera.querystring_anterior)
+        self.assertEqual(self.ids(anterior), self.esperado[10:20])
+        self.assertTrue(anterior.has_previous())
+        inicio = self.pagina(anterior.querystring_anterior)
+        self.assertEqual(self.ids(inicio), self.esperado[:10])
+        self.assertFalse(inicio.has_previous())
+
+    def test_cursor_invalido_muestra_la_primera_pagina(self):
+        for cursor in (
+            'no-es-base64!',
+            codificar_cursor('otra', ['x']),
+            codificar_cursor('sig', ['no es una fecha', '1']),
+            codificar_cursor('sig', [str(timezone.now()), '9' * 30]),
+            codificar_cursor('sig', [str(timezone.now())]),
+        ):
+            with self.subTest(cursor=cursor):
+                pagina = self.pagina(f'cursor={cursor}')
+                self.assertEqual(self.ids(pagina), self.esperado[:10])
+                self.assertFalse(pagina.has_previous())
+
+
+class ReplicasTests(TestCase):
+    def setUp(self):
+        bases = {
+            DEFAULT_DB_ALIAS: settings.DATABASES[DEFAULT_DB_ALIAS],
+            'replica_1': {**settings.DATABASES[DEFAULT_DB_ALIAS], 'TEST': {'MIRROR': DEFAULT_DB_ALIAS}},
+        }
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', 'Overriding setting DATABASES')
+            ajustes = override_settings(DATABASES=bases)
+            ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        disponible = mock.patch('veterinaria.routers.replica_disponible', return_value=True)
+        self.replica_disponible = disponible.start()
+        self.addCleanup(disponible.stop)
+        self.router = RouterReplicas()
+        self.factory = RequestFactory()
+        self.bases = []
+
+    def vista(self, request):
+        """Anota la base de cada lectura y escritura; el POST escribe y vuelve a leer"""
+        self.bases.append(('lectura', self.router.db_for_read(Mascota)))
+        if request.method == 'POST' or 'escribir' in request.GET:
+            self.bases.append(('escritura', self.router.db_for_write(Mascota)))
+            self.bases.append(('lectura', self.router.db_for_read(Mascota)))
+        return HttpResponse()
+
+    def pedir(self, request):
+        return ReplicaMiddleware(self.vista)(request)
+
+    def test_get_lee_de_la_replica(self):
+        respuesta = self.pedir(self.factory.get('/'))
+        self.assertEqual(self.bases, [('lectura', 'replica_1')])
+        self.assertNotIn(COOKIE_FIJACION, respuesta.cookies)
+        # Fuera de una petición todo va a la primaria
+        self.assertEqual(self.router.db_for_read(Mascota), DEFAULT_DB_ALIAS)
+
+    def test_post_escribe_en_la_primaria_y_fija_las_lecturas(self):
+        respuesta = self.pedir(self.factory.post('/'))
+        self.assertEqual(self.bases, [
+            ('lectura', DEFAULT_DB_ALIAS), ('escritura', DEFAULT_DB_ALIAS), ('lectura', DEFAULT_DB_ALIAS),
+        ])
+        self.assertEqual(respuesta.cookies[COOKIE_FIJACION]['max-age'], SEGUNDOS_FIJACION_PRIMARIA)
+
+    def test_get_que_escribe_sigue_leyendo_de_la_primaria(self):
+        self.pedir(self.factory.get('/', {'escribir': '1'}))
+        self.assertEqual(self.bases, [
+            ('lectura', 'replica_1'), ('escritura', DEFAULT_DB_ALIAS), ('lectura', DEFAULT_DB_ALIAS),
+        ])
+
+    def test_cookie_fija_la_primaria_hasta_que_vence(self):
+        cookie = self.pedir(self.factory.post('/')).cookies[COOKIE_FIJACION]
+        self.bases.clear()
+        siguiente = self.factory.get('/')
+        siguiente.COOKIES[COOKIE_FIJACION] = cookie.value
+        self.pedir(siguiente)
+        # Vencido el max-age el navegador ya no envía la cookie
+        self.pedir(self.factory.get('/'))
+        self.assertEqual(self.bases, [('lectura', DEFAULT_DB_ALIAS), ('lectura', 'replica_1')])
+
+    def test_replica_atrasada_o_caida_lee_de_la_primaria(self):
+        self.replica_disponible.return_value = False
+        self.pedir(self.factory.get('/'))
+        self.assertEqual(self.bases, [('lectura', DEFAULT_DB_ALIAS)])
+
+    def test_asgi_aplica_las_mismas_reglas(self):
+        async def vista(request):
+            return self.vista(request)
+
+        middleware = ReplicaMiddleware(vista)
+        async_to_sync(middleware)(self.factory.get('/'))
+        respuesta = async_to_sync(middleware)(self.factory.post('/'))
+        self.assertEqual(self.bases, [
+            ('lectura', 'replica_1'),
+            ('lectura', DEFAULT_DB_ALIAS), ('escritura', DEFAULT_DB_ALIAS), ('lectura', DEFAULT_DB_ALIAS),
+        ])
+        self.assertIn(COOKIE_FIJACION, respuesta.cookies)
+
+
+class ResumenCitasDiarioTests(TestCase):
+    def setUp(self):
+        self.mascota = crear_mascota()
+        self.veterinario = Veterinario.objects.create(nombre='Dra. Soto')
+        self.dia = proximo_dia_habil()
+
+    def hora(self, hora, minuto=0, dias=0):
+        return timezone.make_aware(datetime.combine(self.dia + timedelta(days=dias), time(hora, minuto)))
+
+    def crear_cita(self, inicio, veterinario=None, tipo_cita='consulta_general', precio=None):
+        return Cita.objects.create(
+            mascota=self.mascota, veterinario=veterinario, fecha_hora=inicio, tipo_cita=tipo_cita,
+            motivo='Consulta de rutina', precio_estimado=precio,
+        )
+
+    def assertResumenCoincide(self):
+        """El resumen incremental es igual a recalcularlo desde cero (sin filas en cero)"""
+        def ordenar(filas):
+            return sorted(filas, key=lambda fila: tuple(str(fila[campo]) for campo in CLAVE_CITAS))
+
+        campos = (*CLAVE_CITAS, 'cantidad', 'con_precio', 'total_precio_estimado')
+        actual = ResumenCitasDiario.objects.filter(cantidad__gt=0).values(*campos)
+        self.assertEqual(ordenar(actual), ordenar(calcular_resumen_citas()))
+
+    def test_crear_citas(self):
+        self.crear_cita(self.hora(9), self.veterinario, precio=Decimal('15000'))
+        self.crear_cita(self.hora(10), self.veterinario)
+        self.crear_cita(self.hora(10))
+        self.assertResumenCoincide()
+        fila = ResumenCitasDiario.objects.get(veterinario=self.veterinario)
+        self.assertEqual((fila.cantidad, fila.con_precio, fila.total_precio_estimado), (2, 1, Decimal('15000')))
+
+    def test_cambio_de_estado(self):
+        cita = self.crear_cita(self.hora(9), self.veterinario, precio=Decimal('15000'))
+        self.crear_cita(self.hora(10), self.veterinario)
+        cita.estado = 'confirmada'
+        cita.save()
+        self.assertResumenCoincide()
+        self.assertEqual(
+            dict(ResumenCitasDiario.objects.filter(cantidad__gt=0).values_list('estado', 'cantidad')),
+            {'programada': 1, 'confirmada': 1},
+        )
+
+    def test_cambio_de_dia(self):
+        # 23:30 y 00:30 locales caen en días distintos aunque en UTC sea el mismo
+        cita = self.crear_cita(self.hora(23, 30), self.veterinario, precio=Decimal('20000'))
+        self.crear_cita(self.hora(12), self.veterinario)
+        cita.fecha_hora = self.hora(0, 30, dias=1)
+        cita.save()
+        self.assertResumenCoincide()
+        self.assertEqual(
+            dict(ResumenCitasDiario.objects.filter(cantidad__gt=0).values_list('fecha', 'cantidad')),
+            {self.dia: 1, self.dia + timedelta(days=1): 1},
+        )
+
+    def test_eliminar_cita(self):
+        cita = self.crear_cita(self.hora(9), self.veterinario, precio=Decimal('15000'))
+        self.crear_cita(self.hora(10), self.veterinario, precio=Decimal('5000'))
+        cita.delete()
+        self.assertResumenCoincide()
+
+    def test_resumen_desfasado_se_recalcula(self):
+        cita = self.crear_cita(self.hora(9), self.veterinario)
+        self.crear_cita(self.hora(10), self.veterinario, tipo_cita='vacunacion')
+        ResumenCitasDiario.objects.all().delete()
+        cita.delete()
+        self.assertResumenCoincide()
+        self.assertEqual(ResumenCitasDiario.objects.get().tipo_cita, 'vacunacion')
+
+
+class ImportacionMascotasTests(TestCase):
+    ENCABEZADO = 'tipo;nombre;sexo;peso;propietario;telefono;email;chip\n'
+    VALIDA = 'Perro;Luna;hembra;12,5;Ana Rojas;+56911112222;ana@example.com;ABC1234567890\n'
+    INVALIDA = 'Perro;Toby;macho;8;Pedro Díaz;+56933334444;pedro-sin-arroba;FED1234567890\n'
+
+    def setUp(self):
+        TipoAnimal.objects.create(nombre='Perro')
+
+    def importar(self, contenido, **opciones):
+        return importar_mascotas(io.BytesIO(contenido.encode()), **opciones)
+
+    def test_fila_invalida_se_informa_y_no_se_importa_nada(self):
+        resultado = self.importar(self.ENCABEZADO + self.VALIDA + self.INVALIDA)
+        self.assertEqual([(fila, columna) for fila, columna, _mensaje in resultado.errores], [(3, 'propietario_email')])
+        self.assertEqual(resultado.creados, 0)
+        self.assertFalse(Mascota.objects.exists())
+
+    def test_fila_valida_se_importa(self):
+        resultado = self.importar(self.ENCABEZADO + self.VALIDA)
+        self.assertEqual((resultado.creados, resultado.errores), (1, []))
+        mascota = Mascota.objects.get()
+        self.assertEqual((mascota.nombre, mascota.peso, mascota.numero_chip), ('Luna', Decimal('12.5'), 'ABC1234567890'))
+
+    def test_reimportar_actualiza_sin_duplicar(self):
+        self.importar(self.ENCABEZADO + self.VALIDA)
+        cita = Cita.objects.create(
+            mascota=Mascota.objects.get(), fecha_hora=timezone.now() + timedelta(days=2),
+            tipo_cita='control', motivo='Control anual',
+        )
+        corregida = self.VALIDA.replace('Luna;', 'Luna Rojas;').replace('+56911112222', '+56955556666')
+
+        # Sin actualizar, el microchip existente es un error
+        resultado = self.importar(self.ENCABEZADO + corregida)
+        self.assertEqual([columna for _fila, columna, _mensaje in resultado.errores], ['numero_chip'])
+
+        resultado = self.importar(self.ENCABEZADO + corregida, actualizar=True)
+        self.assertEqual((resultado.creados, resultado.actualizados, resultado.errores), (0, 1, []))
+        mascota = Mascota.objects.get()
+        self.assertEqual((mascota.nombre, mascota.propietario_telefono), ('Luna Rojas', '+56955556666'))
+        cita.refresh_from_db()
+        self.assertIn('Luna Rojas', cita.documento_busqueda)
+
+
+class RespuestaCondicionalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.categoria = Categoria.objects.create(nombre='Farmacia')
+        self.producto = Producto.objects.create(
+            categoria=self.categoria, nombre='Antiparasitario', tipo_producto='accesorio',
+            precio=Decimal('5000'), codigo='ETAG-1', stock=8,
+        )
+
+    def revalidar(self, url, etag):
+        """Pide la página con el ETag anterior; devuelve la respuesta"""
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_movimiento_de_stock_cambia_el_etag(self):
+        url = reverse('producto_detail', args=[self.producto.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.revalidar(url, etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            inventario.consumir(self.producto, 5)
+        respuesta = self.revalidar(url, etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+        # La conciliación solo agrega movimientos, sin tocar el producto
+        etag = respuesta['ETag']
+        Producto.objects.filter(pk=self.producto.pk).update(stock=9)
+        with self.captureOnCommitCallbacks(execute=True):
+            inventario.conciliar_stock()
+        self.assertEqual(self.revalidar(url, etag).status_code, 200)
+
+    def test_renombrar_tipo_de_animal_cambia_el_etag_de_la_mascota(self):
+        mascota = crear_mascota()
+        url = reverse('mascota_detail', args=[mascota.pk])
+        primera = self.client.get(url)
+        self.assertNotIn('Last-Modified', primera)
+        tipo = mascota.tipo_animal
+        tipo.nombre = 'Canino'
+        with self.captureOnCommitCallbacks(execute=True):
+            tipo.save()
+        respuesta = self.revalidar(url, primera['ETag'])
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'Canino')
+
+
+class DatosSinteticosTests(TestCase):
+    def test_veterinarios_con_el_mismo_nombre_tienen_agendas_separadas(self):
+        veterinarios = [Veterinario.objects.create(nombre='Dra. Soto') for _ in range(2)]
+        generar_datos(mascotas=20, citas=60, veterinarios=2)
+        self.assertEqual(Cita.objects.filter(veterinario__in=veterinarios).count(), 60)
+
+        for veterinario in veterinarios:
+            with self.subTest(veterinario=veterinario.pk):
+                intervalos = list(
+                    Cita.objects.filter(veterinario=veterinario).order_by('fecha_hora')
+                    .values_list('fecha_hora', 'fecha_hora_fin')
+                )
+                self.assertTrue(intervalos)
+                solapados = [
+                    (anterior, siguiente) for anterior, siguiente in zip(intervalos, intervalos[1:])
+                    if siguiente[0] < anterior[1]
+                ]
+                self.assertEqual(solapados, [])
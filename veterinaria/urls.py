@@ -26,6 +26,7 @@ urlpatterns = [
     path('mascota/nueva/', views.MascotaCreateView.as_view(), name='mascota_create'),
     path('mascota/<int:pk>/editar/', views.MascotaUpdateView.as_view(), name='mascota_update'),
     path('mascota/<int:pk>/eliminar/', views.MascotaDeleteView.as_view(), name='mascota_delete'),
+    path('mascotas/autocompletar/', views.autocompletar_mascotas, name='autocompletar_mascotas'),
     
     # CRUD de citas
     path('citas/', views.CitaListView.as_view(), name='cita_list'),
@@ -33,6 +34,12 @@ urlpatterns = [
     path('cita/nueva/', views.CitaCreateView.as_view(), name='cita_create'),
     path('cita/<int:pk>/editar/', views.CitaUpdateView.as_view(), name='cita_update'),
     path('cita/<int:pk>/cancelar/', views.CitaDeleteView.as_view(), name='cita_delete'),
+    path('citas/disponibilidad/', views.disponibilidad_citas, name='disponibilidad_citas'),
+    path('citas/exportar/', views.exportar_citas, name='exportar_citas'),
+    path('citas/estadisticas/', views.estadisticas_citas, name='estadisticas_citas'),
+    
+    # Métricas de rendimiento (Prometheus)
+    path('metrics', views.metricas, name='metricas'),
 ]
 
 # Servir archivos media en desarrollo
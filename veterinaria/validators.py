@@ -43,6 +43,16 @@ def validar_password_simple(password):
 
 # Validadores adicionales para el sistema veterinario
 
+# Patrones precompilados (los usan los validadores de un valor y los de columnas)
+PATRON_NOMBRE = re.compile(r'^[a-zA-ZáéíóúñüÁÉÍÓÚÑÜ\s\-\'\.]+$')
+PATRON_CARACTERES_NO_TELEFONO = re.compile(r'[^\d\+\-\(\)\s]')
+PATRON_TELEFONO = re.compile(r'^[\+]?[\d\-\(\)\s]{7,20}$')
+PATRON_NO_DIGITO = re.compile(r'[^\d]')
+PATRON_EMAIL = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+PATRON_CARACTERES_PRODUCTO = re.compile(r'[a-zA-Z0-9\s\-_áéíóúñüÁÉÍÓÚÑÜ]')
+PATRON_CODIGO_PRODUCTO = re.compile(r'^[A-Z0-9\-_]{3,20}$')
+PATRON_CHIP = re.compile(r'^[A-F0-9]{10,20}$')
+
 def validar_nombre_mascota(value):
     """Validar nombre de mascota"""
     if not value or len(value.strip()) < 2:
@@ -51,7 +61,7 @@ def validar_nombre_mascota(value):
     if len(value) > 50:
         raise ValidationError(_('El nombre es demasiado largo (máximo 50 caracteres).'))
     
-    if not re.match(r'^[a-zA-ZáéíóúñüÁÉÍÓÚÑÜ\s\-\'\.]+$', value):
+    if not PATRON_NOMBRE.match(value):
         raise ValidationError(_('El nombre solo puede contener letras, espacios, guiones y apostrofes.'))
 
 def validar_peso_mascota(value):
@@ -70,18 +80,42 @@ def validar_edad_mascota(value):
         if value > 50:
             raise ValidationError(_('La edad parece demasiado alta (máximo 50 años).'))
 
+# Máximos recomendados por tipo de animal (nombre en minúsculas): (descripción, límite)
+PESO_MAXIMO_POR_TIPO = {'gato': ('un gato', 15), 'perro': ('un perro', 100), 'ave': ('un ave', 5), 'pájaro': ('un ave', 5)}
+EDAD_MAXIMA_POR_TIPO = {'gato': ('un gato', 25), 'perro': ('un perro', 20)}
+
+def validar_peso_por_tipo(value, tipo_animal):
+    """Validar peso según el nombre del tipo de animal"""
+    if value is not None and tipo_animal:
+        limite = PESO_MAXIMO_POR_TIPO.get(tipo_animal.lower())
+        if limite and value > limite[1]:
+            raise ValidationError(
+                _('El peso para %(animal)s parece muy alto (máximo recomendado: %(maximo)s kg).')
+                % {'animal': limite[0], 'maximo': limite[1]}
+            )
+
+def validar_edad_por_tipo(value, tipo_animal):
+    """Validar edad según el nombre del tipo de animal"""
+    if value is not None and tipo_animal:
+        limite = EDAD_MAXIMA_POR_TIPO.get(tipo_animal.lower())
+        if limite and value > limite[1]:
+            raise ValidationError(
+                _('La edad para %(animal)s parece muy alta (máximo típico: %(maximo)s años).')
+                % {'animal': limite[0], 'maximo': limite[1]}
+            )
+
 def validar_telefono(value):
     """Validar formato de teléfono"""
     if value:
         # Limpiar espacios y caracteres especiales
-        telefono_limpio = re.sub(r'[^\d\+\-\(\)\s]', '', value)
+        telefono_limpio = PATRON_CARACTERES_NO_TELEFONO.sub('', value)
         
         # Validar formato básico
-        if not re.match(r'^[\+]?[\d\-\(\)\s]{7,20}$', telefono_limpio):
+        if not PATRON_TELEFONO.match(telefono_limpio):
             raise ValidationError(_('Formato de teléfono inválido.'))
         
         # Verificar longitud mínima de dígitos
-        digitos = re.sub(r'[^\d]', '', telefono_limpio)
+        digitos = PATRON_NO_DIGITO.sub('', telefono_limpio)
         if len(digitos) < 7:
             raise ValidationError(_('El teléfono debe tener al menos 7 dígitos.'))
         if len(digitos) > 15:
@@ -90,16 +124,31 @@ def validar_telefono(value):
 def validar_email_propietario(value):
     """Validar email del propietario"""
     if value:
-        if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', value):
+        if not PATRON_EMAIL.match(value):
             raise ValidationError(_('Formato de email inválido.'))
         if len(value) > 100:
             raise ValidationError(_('El email es demasiado largo (máximo 100 caracteres).'))
 
+def validar_nombre_producto(value):
+    """Validar nombre de producto"""
+    if value:
+        # Verificar longitud mínima
+        if len(value.strip()) < 3:
+            raise ValidationError(_('El nombre debe tener al menos 3 caracteres.'))
+        
+        # Verificar que no sea solo números
+        if value.strip().isdigit():
+            raise ValidationError(_('El nombre no puede ser solo números.'))
+        
+        # Verificar caracteres especiales excesivos
+        if len(PATRON_CARACTERES_PRODUCTO.sub('', value)) > 3:
+            raise ValidationError(_('El nombre contiene demasiados caracteres especiales.'))
+
 def validar_codigo_producto(value):
     """Validar código de producto"""
     if value:
         value = value.strip().upper()
-        if not re.match(r'^[A-Z0-9\-_]{3,20}$', value):
+        if not PATRON_CODIGO_PRODUCTO.match(value):
             raise ValidationError(_('El código debe tener entre 3-20 caracteres alfanuméricos.'))
 
 def validar_precio_positivo(value):
@@ -124,7 +173,7 @@ def validar_numero_chip(value):
     """Validar número de microchip"""
     if value:
         value = value.strip().upper()
-        if not re.match(r'^[A-F0-9]{10,20}$', value):
+        if not PATRON_CHIP.match(value):
             raise ValidationError(_('El número de chip debe tener entre 10-20 caracteres alfanuméricos.'))
 
 def validar_fecha_cita_futura(value):
@@ -132,13 +181,18 @@ def validar_fecha_cita_futura(value):
     if value and value <= timezone.now():
         raise ValidationError(_('La fecha y hora de la cita debe ser en el futuro.'))
 
+# Horario de atención de la clínica (también lo usa agenda.py)
+HORA_APERTURA = 8
+HORA_CIERRE = 20
+DIAS_SIN_ATENCION = (6,)  # Domingo = 6
+
 def validar_horario_atencion(value):
     """Validar horario de atención"""
     if value:
-        if value.hour < 8 or value.hour >= 20:
+        if value.hour < HORA_APERTURA or value.hour >= HORA_CIERRE:
             raise ValidationError(_('Las citas deben programarse entre las 8:00 AM y las 8:00 PM.'))
         
-        if value.weekday() == 6:  # Domingo = 6
+        if value.weekday() in DIAS_SIN_ATENCION:
             raise ValidationError(_('No se atiende los domingos.'))
 
 def validar_nombre_propietario(value):
@@ -149,7 +203,7 @@ def validar_nombre_propietario(value):
     if len(value) > 100:
         raise ValidationError(_('El nombre es demasiado largo (máximo 100 caracteres).'))
     
-    if not re.match(r'^[a-zA-ZáéíóúñüÁÉÍÓÚÑÜ\s\-\'\.]+$', value):
+    if not PATRON_NOMBRE.match(value):
         raise ValidationError(_('El nombre solo puede contener letras, espacios, guiones y apostrofes.'))
 
 def validar_motivo_consulta(value):
@@ -167,3 +221,240 @@ def validar_descripcion_producto(value):
             raise ValidationError(_('La descripción debe tener al menos 10 caracteres.'))
         if len(value) > 1000:
             raise ValidationError(_('La descripción es demasiado larga (máximo 1000 caracteres).'))
+
+
+# ============================================================================
+# VALIDACIÓN POR COLUMNAS (importaciones, acciones masivas, auditorías)
+# ============================================================================
+#
+# Cada función recibe una columna completa (lista o cualquier secuencia) y
+# devuelve una máscara de errores del mismo largo: None en las filas válidas
+# y el mensaje en las inválidas. Aplican las mismas reglas y mensajes que
+# los validadores de un valor, pero en una sola pasada, con los patrones ya
+# compilados, los mensajes traducidos una vez por columna y sin lanzar una
+# excepción por cada fila inválida. Los valores vacíos (None o '') se
+# consideran válidos, salvo en los nombres obligatorios, igual que arriba.
+
+def filas_con_error(mascara):
+    """Posiciones de las filas inválidas de una máscara"""
+    return [indice for indice, mensaje in enumerate(mascara) if mensaje is not None]
+
+
+def combinar_mascaras(*mascaras):
+    """Primer error de cada fila entre varias máscaras del mismo largo"""
+    return [next((mensaje for mensaje in mensajes if mensaje is not None), None) for mensajes in zip(*mascaras)]
+
+
+def _columna_nombre(valores, minimo, maximo):
+    corto = _('El nombre debe tener al menos %(minimo)s caracteres.') % {'minimo': minimo}
+    largo = _('El nombre es demasiado largo (máximo %(maximo)s caracteres).') % {'maximo': maximo}
+    invalido = _('El nombre solo puede contener letras, espacios, guiones y apostrofes.')
+    coincide = PATRON_NOMBRE.match
+    return [
+        corto if not valor or len(valor.strip()) < minimo
+        else largo if len(valor) > maximo
+        else invalido if not coincide(valor)
+        else None
+        for valor in valores
+    ]
+
+
+def validar_columna_nombre_mascota(valores):
+    """validar_nombre_mascota por columnas"""
+    return _columna_nombre(valores, 2, 50)
+
+
+def validar_columna_nombre_propietario(valores):
+    """validar_nombre_propietario por columnas"""
+    return _columna_nombre(valores, 3, 100)
+
+
+def validar_columna_nombre_producto(valores):
+    """validar_nombre_producto por columnas"""
+    corto = _('El nombre debe tener al menos 3 caracteres.')
+    numeros = _('El nombre no puede ser solo números.')
+    especiales = _('El nombre contiene demasiados caracteres especiales.')
+    quitar_permitidos = PATRON_CARACTERES_PRODUCTO.sub
+    mascara = []
+    for valor in valores:
+        if not valor:
+            mascara.append(None)
+            continue
+        limpio = valor.strip()
+        mascara.append(
+            corto if len(limpio) < 3
+            else numeros if limpio.isdigit()
+            else especiales if len(quitar_permitidos('', valor)) > 3
+            else None
+        )
+    return mascara
+
+
+def validar_columna_telefono(valores):
+    """validar_telefono por columnas"""
+    formato = _('Formato de teléfono inválido.')
+    pocos = _('El teléfono debe tener al menos 7 dígitos.')
+    muchos = _('El teléfono tiene demasiados dígitos.')
+    limpiar = PATRON_CARACTERES_NO_TELEFONO.sub
+    coincide = PATRON_TELEFONO.match
+    quitar_no_digitos = PATRON_NO_DIGITO.sub
+    mascara = []
+    for valor in valores:
+        if not valor:
+            mascara.append(None)
+            continue
+        limpio = limpiar('', valor)
+        if not coincide(limpio):
+            mascara.append(formato)
+            continue
+        digitos = len(quitar_no_digitos('', limpio))
+        mascara.append(pocos if digitos < 7 else muchos if digitos > 15 else None)
+    return mascara
+
+
+def validar_columna_email(valores):
+    """validar_email_propietario por columnas"""
+    formato = _('Formato de email inválido.')
+    largo = _('El email es demasiado largo (máximo 100 caracteres).')
+    coincide = PATRON_EMAIL.match
+    return [
+        None if not valor
+        else formato if not coincide(valor)
+        else largo if len(valor) > 100
+        else None
+        for valor in valores
+    ]
+
+
+def validar_columna_codigo_producto(valores):
+    """validar_codigo_producto por columnas"""
+    invalido = _('El código debe tener entre 3-20 caracteres alfanuméricos.')
+    coincide = PATRON_CODIGO_PRODUCTO.match
+    return [None if not valor or coincide(valor.strip().upper()) else invalido for valor in valores]
+
+
+def validar_columna_numero_chip(valores):
+    """validar_numero_chip por columnas"""
+    invalido = _('El número de chip debe tener entre 10-20 caracteres alfanuméricos.')
+    coincide = PATRON_CHIP.match
+    return [None if not valor or coincide(valor.strip().upper()) else invalido for valor in valores]
+
+
+def validar_columna_peso(valores):
+    """validar_peso_mascota por columnas"""
+    bajo = _('El peso debe ser mayor a 0.')
+    alto = _('El peso parece demasiado alto (máximo 200 kg).')
+    return [
+        None if valor is None else bajo if valor <= 0 else alto if valor > 200 else None
+        for valor in valores
+    ]
+
+
+def validar_columna_edad(valores):
+    """validar_edad_mascota por columnas"""
+    negativa = _('La edad no puede ser negativa.')
+    alta = _('La edad parece demasiado alta (máximo 50 años).')
+    return [
+        None if valor is None else negativa if valor < 0 else alta if valor > 50 else None
+        for valor in valores
+    ]
+
+
+def validar_columna_precio(valores):
+    """validar_precio_positivo por columnas"""
+    negativo = _('El precio no puede ser negativo.')
+    cero = _('El precio debe ser mayor a 0.')
+    alto = _('El precio es demasiado alto.')
+    maximo = Decimal('10000000')
+    return [
+        None if valor is None
+        else negativo if valor < 0
+        else cero if valor == 0
+        else alto if valor > maximo
+        else None
+        for valor in valores
+    ]
+
+
+def validar_columna_stock(valores):
+    """validar_stock_producto por columnas"""
+    negativo = _('El stock no puede ser negativo.')
+    alto = _('El stock es demasiado alto (máximo 100,000).')
+    return [
+        None if valor is None else negativo if valor < 0 else alto if valor > 100000 else None
+        for valor in valores
+    ]
+
+
+def validar_columna_descripcion_producto(valores):
+    """validar_descripcion_producto por columnas"""
+    corta = _('La descripción debe tener al menos 10 caracteres.')
+    larga = _('La descripción es demasiado larga (máximo 1000 caracteres).')
+    return [
+        None if not valor
+        else corta if len(valor.strip()) < 10
+        else larga if len(valor) > 1000
+        else None
+        for valor in valores
+    ]
+
+
+def _columna_medicamento(valores, tipos_producto, obligatorio, minimo=0):
+    # Igual que los clean_* de ProductoForm: obligatorio solo para medicamentos
+    corto = _('El principio activo debe tener al menos %(minimo)s caracteres.') % {'minimo': minimo}
+    return [
+        obligatorio if not valor and tipo == 'medicamento'
+        else corto if valor and len(valor.strip()) < minimo
+        else None
+        for valor, tipo in zip(valores, tipos_producto)
+    ]
+
+
+def validar_columna_principio_activo(valores, tipos_producto):
+    """ProductoForm.clean_principio_activo por columnas (``tipos_producto``: fila a fila)"""
+    return _columna_medicamento(
+        valores, tipos_producto, _('El principio activo es obligatorio para medicamentos.'), minimo=3,
+    )
+
+
+def validar_columna_concentracion(valores, tipos_producto):
+    """ProductoForm.clean_concentracion por columnas (``tipos_producto``: fila a fila)"""
+    return _columna_medicamento(valores, tipos_producto, _('La concentración es obligatoria para medicamentos.'))
+
+
+def validar_columna_laboratorio(valores, tipos_producto):
+    """ProductoForm.clean_laboratorio por columnas (``tipos_producto``: fila a fila)"""
+    return _columna_medicamento(valores, tipos_producto, _('El laboratorio es obligatorio para medicamentos.'))
+
+
+def _columna_por_tipo(valores, tipos_animal, limites, mensaje):
+    # Un mensaje por especie, no por fila
+    mensajes = {
+        tipo: mensaje % {'animal': descripcion, 'maximo': maximo}
+        for tipo, (descripcion, maximo) in limites.items()
+    }
+    mascara = []
+    for valor, tipo in zip(valores, tipos_animal):
+        if valor is None or not tipo:
+            mascara.append(None)
+            continue
+        tipo = tipo.lower()
+        limite = limites.get(tipo)
+        mascara.append(mensajes[tipo] if limite and valor > limite[1] else None)
+    return mascara
+
+
+def validar_columna_peso_por_tipo(valores, tipos_animal):
+    """validar_peso_por_tipo por columnas (``tipos_animal``: nombres, fila a fila)"""
+    return _columna_por_tipo(
+        valores, tipos_animal, PESO_MAXIMO_POR_TIPO,
+        _('El peso para %(animal)s parece muy alto (máximo recomendado: %(maximo)s kg).'),
+    )
+
+
+def validar_columna_edad_por_tipo(valores, tipos_animal):
+    """validar_edad_por_tipo por columnas (``tipos_animal``: nombres, fila a fila)"""
+    return _columna_por_tipo(
+        valores, tipos_animal, EDAD_MAXIMA_POR_TIPO,
+        _('La edad para %(animal)s parece muy alta (máximo típico: %(maximo)s años).'),
+    )
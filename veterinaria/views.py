@@ -1,50 +1,134 @@
+from datetime import timedelta
+
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.response import TemplateResponse
 from django.urls import reverse_lazy
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib import messages
-from django.db.models import Q
-from .models import Categoria, Producto, TipoAnimal, Mascota, Cita
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, router
+from django.utils.cache import patch_cache_control
+from django.utils import timezone
+from django.views.decorators.http import condition, require_GET
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date
+from .models import Categoria, Producto, TipoAnimal, Mascota, Cita, Veterinario
 from .forms import ProductoForm, MascotaForm, CitaForm
-from django.db.models import Sum, Count, Q
+from .busqueda import buscar_productos, buscar_citas, buscar_mascotas
+from .paginacion import KeysetPaginationMixin, ListaAsincronaMixin
+from .resumenes import obtener_estadisticas_citas, obtener_resumen_inventario
+from .cache import cache_por_version, aobtener_version, obtener_version, SEGUNDOS_CACHE_PAGINAS
+from .agenda import disponibilidad, duracion_para, MAX_DIAS_DISPONIBILIDAD
+from .metricas import exportar_prometheus
+from .referencias import grupo_referencias, obtener_referencia, obtener_referencias
+from .exportacion import contenido_exportacion, contenido_exportacion_asincrono, FORMATOS_EXPORTACION
 
 # Vista principal - Home con categorías
-def home(request):
+async def home(request):
     """
     Vista principal que muestra todas las categorías activas.
     Cada categoría se muestra en un card de Bootstrap.
+    La grilla se cachea como fragmento; el queryset es perezoso y solo se
+    consulta cuando cambió la versión de las categorías (al renderizar la
+    plantilla, que Django hace en un hilo). Se lee de la primaria: el
+    fragmento queda guardado bajo la versión nueva y una réplica atrasada
+    lo llenaría con datos viejos.
     """
-    categorias = Categoria.objects.filter(activo=True).order_by('nombre')
+    categorias = Categoria.objects.using(DEFAULT_DB_ALIAS).filter(activo=True).order_by('nombre')
     context = {
         'categorias': categorias,
+        'version_categorias': await aobtener_version('categorias'),
+        'segundos_cache': SEGUNDOS_CACHE_PAGINAS,
         'titulo': 'Sistema de Gestión Veterinaria',
     }
-    return render(request, 'veterinaria/home.html', context)
+    return TemplateResponse(request, 'veterinaria/home.html', context)
 
 # Vista de productos por categoría
-def productos_por_categoria(request, categoria_id):
+@cache_por_version('catalogo')
+async def productos_por_categoria(request, categoria_id):
     """
     Vista que muestra todos los productos de una categoría específica.
-    Incluye funcionalidad de búsqueda por nombre de producto.
+    Incluye búsqueda de texto completo por nombre, descripción y código,
+    con resultados ordenados por relevancia.
     """
-    categoria = get_object_or_404(Categoria, id=categoria_id, activo=True)
+    try:
+        categoria = await Categoria.objects.aget(id=categoria_id, activo=True)
+    except Categoria.DoesNotExist:
+        raise Http404('Categoría no encontrada')
     productos = Producto.objects.filter(categoria=categoria, activo=True)
     
-    # Funcionalidad de búsqueda
+    # Funcionalidad de búsqueda (índice de texto completo, ver busqueda.py)
     query = request.GET.get('buscar')
     if query:
-        productos = productos.filter(
-            Q(nombre__icontains=query) | 
-            Q(descripcion__icontains=query) |
-            Q(codigo__icontains=query)
-        )
+        productos = buscar_productos(productos, query)
     
     context = {
         'categoria': categoria,
-        'productos': productos,
+        'productos': [producto async for producto in productos],
         'query': query,
         'titulo': f'Productos - {categoria.nombre}',
     }
-    return render(request, 'veterinaria/productos_categoria.html', context)
+    return TemplateResponse(request, 'veterinaria/productos_categoria.html', context)
+
+class RespuestaCondicionalMixin:
+    """
+    Soporte de peticiones condicionales (ETag / Last-Modified) para vistas
+    de detalle.
+
+    Antes de cargar el objeto se consulta solo su fecha de modificación;
+    si el cliente ya tiene esa versión se responde 304 sin renderizar la
+    plantilla. Las vistas cuya plantilla depende de otros datos agregan
+    grupos de caché a ``grupos_version`` o redefinen ``version_condicional``.
+    Esos grupos cambian sin mover la fecha de modificación, así que en esas
+    vistas solo se usa el ETag y no se envía Last-Modified.
+    """
+    # Grupos de cache.py cuya versión forma parte del ETag
+    grupos_version = ()
+
+    def version_condicional(self, pk):
+        """
+        Devuelve ``(ultima_modificacion, etag)`` del objeto, o None si no
+        existe (la vista responderá 404 como siempre).
+        """
+        modificado = self.model._default_manager.filter(pk=pk).values_list('fecha_modificacion', flat=True).first()
+        if modificado is None:
+            return None
+        return modificado, self.etag_condicional(pk, modificado.timestamp())
+
+    def etag_condicional(self, pk, *partes):
+        """ETag con el modelo, la clave, ``partes`` y las versiones de ``grupos_version``"""
+        versiones = [obtener_version(grupo) for grupo in self.grupos_version]
+        return '-'.join(str(parte) for parte in (self.model._meta.model_name, pk, *partes, *versiones))
+
+    def _version(self, request, *args, **kwargs):
+        if not hasattr(self, '_version_condicional'):
+            self._version_condicional = self.version_condicional(kwargs['pk'])
+        return self._version_condicional
+
+    def _etag(self, request, *args, **kwargs):
+        version = self._version(request, *args, **kwargs)
+        return version[1] if version else None
+
+    def _ultima_modificacion(self, request, *args, **kwargs):
+        version = self._version(request, *args, **kwargs)
+        return version[0] if version else None
+
+    def dispatch(self, request, *args, **kwargs):
+        # Con mensajes pendientes hay que renderizar para mostrarlos
+        if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+            return super().dispatch(request, *args, **kwargs)
+        vista = condition(
+            etag_func=self._etag,
+            last_modified_func=None if self.grupos_version else self._ultima_modificacion,
+        )(super().dispatch)
+        response = vista(request, *args, **kwargs)
+        # Obligar al navegador a revalidar en vez de usar una copia vencida
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
 
 # Vistas CRUD para Productos
 class ProductoListView(ListView):
@@ -57,11 +141,21 @@ class ProductoListView(ListView):
     def get_queryset(self):
         return Producto.objects.filter(activo=True).order_by('-fecha_creacion')
 
-class ProductoDetailView(DetailView):
+class ProductoDetailView(RespuestaCondicionalMixin, DetailView):
     """Detalle de un producto específico"""
     model = Producto
     template_name = 'veterinaria/producto_detail.html'
     context_object_name = 'producto'
+    movimientos_mostrados = 10
+    # La versión del catálogo cubre cambios en el nombre de la categoría y
+    # los ajustes de conciliar_stock, que solo agregan movimientos. Los demás
+    # movimientos de stock también actualizan fecha_modificacion.
+    grupos_version = ('catalogo',)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['movimientos'] = self.object.movimientos_stock.all()[:self.movimientos_mostrados]
+        return context
 
 class ProductoCreateView(CreateView):
     """Crear nuevo producto"""
@@ -99,8 +193,14 @@ class ProductoUpdateView(UpdateView):
         return reverse_lazy('producto_list')
 
     def form_valid(self, form):
+        try:
+            respuesta = super().form_valid(form)
+        except ValidationError as error:
+            # Se reservó o vendió stock mientras se editaba y el ajuste ya no cabe
+            form.add_error('stock', error)
+            return self.form_invalid(form)
         messages.success(self.request, 'Producto actualizado exitosamente.')
-        return super().form_valid(form)
+        return respuesta
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -132,46 +232,48 @@ def mantenedor_productos(request, categoria_id):
     """
     Vista del mantenedor de productos para una categoría específica.
     Desde aquí se pueden agregar, modificar y eliminar productos.
+    Los indicadores del encabezado se leen del resumen precalculado.
     """
     categoria = get_object_or_404(Categoria, id=categoria_id, activo=True)
     productos = Producto.objects.filter(categoria=categoria, activo=True).order_by('nombre')
-    
-    total_valor = productos.aggregate(Sum('precio'))['precio__sum'] or 0
-    stock_bajo = productos.filter(stock__lte=5, stock__gt=0).count()
-    activos_con_stock = productos.filter(stock__gt=0).count()  #  solo los que tienen stock > 0
+    resumen = obtener_resumen_inventario(categoria)
 
     context = {
         'categoria': categoria,
         'productos': productos,
-        'total_valor': total_valor,
-        'stock_bajo': stock_bajo,
-        'activos_con_stock': activos_con_stock, 
+        'total_productos': resumen.productos_activos,
+        'total_valor': resumen.total_valor,
+        'stock_bajo': resumen.stock_bajo,
+        'activos_con_stock': resumen.con_stock,  # solo los que tienen stock > 0
         'titulo': f'Mantenedor - {categoria.nombre}',
     }
     return render(request, 'veterinaria/mantenedor_productos.html', context)
 
 
 # Vistas CRUD para Mascotas
-class MascotaListView(ListView):
-    """Lista todas las mascotas"""
+class MascotaListView(ListaAsincronaMixin, KeysetPaginationMixin, ListView):
+    """Lista todas las mascotas (paginación por cursor sobre fecha de registro, ORM asíncrono)"""
     model = Mascota
     template_name = 'veterinaria/mascota_list.html'
     context_object_name = 'mascotas'
     paginate_by = 10
+    campos_keyset = ('-fecha_registro', '-id')
     
     def get_queryset(self):
-        return Mascota.objects.filter(activo=True).order_by('-fecha_registro')
+        return Mascota.objects.filter(activo=True).select_related('tipo_animal')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['titulo'] = 'Lista de Mascotas'
         return context
 
-class MascotaDetailView(DetailView):
+class MascotaDetailView(RespuestaCondicionalMixin, DetailView):
     """Detalle de una mascota específica"""
     model = Mascota
     template_name = 'veterinaria/mascota_detail.html'
     context_object_name = 'mascota'
+    # La plantilla muestra el nombre del tipo de animal
+    grupos_version = (grupo_referencias(TipoAnimal),)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -236,37 +338,39 @@ class MascotaDeleteView(DeleteView):
 # VISTAS CRUD PARA CITAS
 # ============================================================================
 
-class CitaListView(ListView):
-    """Listar todas las citas con funcionalidad de búsqueda y filtrado"""
+def filtrar_citas(queryset, parametros):
+    """
+    Filtros del listado de citas (también los usa la exportación): texto
+    en ``buscar``, ``estado`` y ``fecha`` (AAAA-MM-DD).
+    """
+    # Filtrar por búsqueda (mascota, propietario, motivo o veterinario)
+    query = parametros.get('buscar')
+    if query:
+        queryset = buscar_citas(queryset, query)
+    
+    # Filtrar por estado
+    estado = parametros.get('estado')
+    if estado:
+        queryset = queryset.filter(estado=estado)
+    
+    # Filtrar por fecha
+    fecha = parametros.get('fecha')
+    if fecha:
+        queryset = queryset.filter(fecha_hora__date=fecha)
+    
+    return queryset
+
+class CitaListView(ListaAsincronaMixin, KeysetPaginationMixin, ListView):
+    """Listar todas las citas con funcionalidad de búsqueda y filtrado (ORM asíncrono)"""
     model = Cita
     template_name = 'veterinaria/cita_list.html'
     context_object_name = 'citas'
     paginate_by = 20
+    campos_keyset = ('-fecha_hora', '-id')
     
     def get_queryset(self):
-        queryset = Cita.objects.select_related('mascota', 'mascota__tipo_animal').order_by('-fecha_hora')
-        
-        # Filtrar por búsqueda
-        query = self.request.GET.get('buscar')
-        if query:
-            queryset = queryset.filter(
-                Q(mascota__nombre__icontains=query) |
-                Q(mascota__propietario_nombre__icontains=query) |
-                Q(motivo__icontains=query) |
-                Q(veterinario__icontains=query)
-            )
-        
-        # Filtrar por estado
-        estado = self.request.GET.get('estado')
-        if estado:
-            queryset = queryset.filter(estado=estado)
-        
-        # Filtrar por fecha
-        fecha = self.request.GET.get('fecha')
-        if fecha:
-            queryset = queryset.filter(fecha_hora__date=fecha)
-        
-        return queryset
+        queryset = Cita.objects.select_related('mascota', 'mascota__tipo_animal', 'veterinario')
+        return filtrar_citas(queryset, self.request.GET)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -277,11 +381,24 @@ class CitaListView(ListView):
         context['estados'] = Cita.ESTADO_CHOICES
         return context
 
-class CitaDetailView(DetailView):
+class CitaDetailView(RespuestaCondicionalMixin, DetailView):
     """Vista detallada de una cita específica"""
     model = Cita
     template_name = 'veterinaria/cita_detail.html'
     context_object_name = 'cita'
+    # La plantilla muestra el nombre del veterinario y el tipo de animal
+    grupos_version = (grupo_referencias(Veterinario), grupo_referencias(TipoAnimal))
+    
+    def version_condicional(self, pk):
+        fila = Cita.objects.filter(pk=pk).values_list(
+            'fecha_modificacion', 'mascota__fecha_modificacion', 'fecha_hora'
+        ).first()
+        if fila is None:
+            return None
+        modificado = max(fila[0], fila[1])
+        # La plantilla cambia cuando la cita pasa (ya no se puede editar)
+        pasada = int(fila[2] < timezone.now())
+        return modificado, self.etag_condicional(pk, fila[0].timestamp(), fila[1].timestamp(), pasada)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -349,3 +466,167 @@ class CitaDeleteView(DeleteView):
         context['titulo'] = f'Cancelar Cita - {self.object.mascota.nombre}'
         return context
 
+
+@require_GET
+def disponibilidad_citas(request):
+    """
+    Horarios libres para agendar, en JSON.
+
+    Parámetros: ``desde`` y ``hasta`` (AAAA-MM-DD, por defecto hoy),
+    ``veterinario`` (id, opcional; sin él se listan todos los activos) y
+    ``tipo_cita``, que define la duración del horario buscado.
+    """
+    try:
+        desde = parse_date(request.GET.get('desde') or timezone.localdate().isoformat())
+        hasta = parse_date(request.GET['hasta']) if request.GET.get('hasta') else desde
+    except ValueError:
+        desde = hasta = None
+    if not desde or not hasta:
+        return JsonResponse({'error': 'Las fechas deben tener el formato AAAA-MM-DD.'}, status=400)
+    if hasta < desde:
+        return JsonResponse({'error': 'La fecha final no puede ser anterior a la inicial.'}, status=400)
+    if (hasta - desde).days >= MAX_DIAS_DISPONIBILIDAD:
+        return JsonResponse(
+            {'error': f'Se pueden consultar como máximo {MAX_DIAS_DISPONIBILIDAD} días.'}, status=400
+        )
+
+    tipo_cita = request.GET.get('tipo_cita') or 'consulta_general'
+    if tipo_cita not in dict(Cita.TIPO_CITA_CHOICES):
+        return JsonResponse({'error': 'Tipo de cita inválido.'}, status=400)
+    veterinario = request.GET.get('veterinario', '').strip()
+    if veterinario and not veterinario.isdigit():
+        return JsonResponse({'error': 'Veterinario inválido.'}, status=400)
+
+    def formato(valor):
+        return timezone.localtime(valor).isoformat(timespec='minutes')
+
+    resultado = disponibilidad(desde, hasta, int(veterinario) if veterinario else None, tipo_cita)
+    return JsonResponse({
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'tipo_cita': tipo_cita,
+        'duracion_minutos': duracion_para(tipo_cita),
+        'veterinarios': [
+            {
+                'veterinario_id': registro.pk,
+                'veterinario': registro.nombre,
+                'intervalos_libres': [
+                    {'inicio': formato(inicio), 'fin': formato(fin)} for inicio, fin in datos['libres']
+                ],
+                'horarios': [formato(inicio) for inicio in datos['horarios']],
+            }
+            for registro, datos in resultado.items()
+        ],
+    })
+
+
+# Período máximo de las estadísticas de citas
+MAX_DIAS_ESTADISTICAS = 366
+
+@require_GET
+def estadisticas_citas(request):
+    """
+    Panel de estadísticas de citas por estado, tipo, veterinario y día.
+
+    Parámetros: ``desde`` y ``hasta`` (AAAA-MM-DD, por defecto el mes en
+    curso) y ``veterinario`` (id, opcional). Solo lee el resumen diario
+    (ResumenCitasDiario), nunca la tabla de citas.
+    """
+    hoy = timezone.localdate()
+    try:
+        desde = parse_date(request.GET.get('desde') or '')
+        hasta = parse_date(request.GET.get('hasta') or '')
+    except ValueError:
+        desde = hasta = None
+    if not desde or not hasta or hasta < desde:
+        if desde or hasta or request.GET.get('desde') or request.GET.get('hasta'):
+            messages.warning(request, 'Fechas inválidas: se muestra el mes en curso.')
+        desde = hoy.replace(day=1)
+        hasta = (desde + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+    if (hasta - desde).days >= MAX_DIAS_ESTADISTICAS:
+        messages.warning(request, f'Se pueden consultar como máximo {MAX_DIAS_ESTADISTICAS} días.')
+        hasta = desde + timedelta(days=MAX_DIAS_ESTADISTICAS - 1)
+    veterinario = request.GET.get('veterinario', '').strip()
+    veterinario_id = int(veterinario) if veterinario.isdigit() else None
+
+    context = {
+        'titulo': 'Estadísticas de Citas',
+        'desde': desde,
+        'hasta': hasta,
+        'veterinario_seleccionado': obtener_referencia(Veterinario, veterinario_id) if veterinario_id else None,
+        'veterinarios': obtener_referencias(Veterinario, solo_activos=False),
+        **obtener_estadisticas_citas(desde, hasta, veterinario_id),
+    }
+    return render(request, 'veterinaria/cita_estadisticas.html', context)
+
+
+# Resultados del autocompletado de mascotas
+MAX_RESULTADOS_AUTOCOMPLETAR = 20
+
+@require_GET
+def autocompletar_mascotas(request):
+    """
+    Mascotas activas cuyo nombre, propietario o microchip empiezan con lo
+    escrito en ``q`` (índice de texto completo, ver busqueda.py). Lo usa el
+    selector de mascota del formulario de citas.
+    """
+    texto = request.GET.get('q', '').strip()
+    resultados = []
+    if len(texto) >= 2:
+        mascotas = buscar_mascotas(Mascota.objects.filter(activo=True), texto).order_by('nombre', 'id').values_list(
+            'id', 'nombre', 'tipo_animal__nombre', 'propietario_nombre', 'numero_chip',
+        )[:MAX_RESULTADOS_AUTOCOMPLETAR]
+        for pk, nombre, tipo_animal, propietario, chip in mascotas:
+            # Mismo texto que Mascota.__str__, más el microchip si lo tiene
+            etiqueta = f'{nombre} - {tipo_animal} ({propietario})'
+            resultados.append({'id': pk, 'texto': f'{etiqueta} · {chip}' if chip else etiqueta})
+    response = JsonResponse({'resultados': resultados})
+    patch_cache_control(response, private=True, max_age=30)
+    return response
+
+
+@require_GET
+def exportar_citas(request):
+    """
+    Descarga de las citas filtradas igual que en el listado, en CSV
+    (``formato=csv``, por defecto) o JSON Lines (``formato=jsonl``).
+
+    La respuesta se transmite por partes (ver exportacion.py); bajo ASGI
+    con un iterador asíncrono para no leerla completa antes de enviarla.
+    """
+    formato = request.GET.get('formato') or 'csv'
+    if formato not in FORMATOS_EXPORTACION:
+        return HttpResponse('Formato no soportado', status=400, content_type='text/plain; charset=utf-8')
+    tipo_contenido, extension = FORMATOS_EXPORTACION[formato]
+    # La respuesta se recorre después de salir de los middleware: se fija ya
+    # la base de lectura que corresponde a esta petición (ver routers.py)
+    citas = filtrar_citas(Cita.objects.using(router.db_for_read(Cita)), request.GET)
+    if isinstance(request, ASGIRequest):
+        contenido = contenido_exportacion_asincrono(citas, formato)
+    else:
+        contenido = contenido_exportacion(citas, formato)
+    response = StreamingHttpResponse(contenido, content_type=tipo_contenido)
+    nombre = f'citas-{timezone.localdate():%Y%m%d}.{extension}'
+    response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    patch_cache_control(response, no_store=True)
+    return response
+
+
+@require_GET
+def metricas(request):
+    """
+    Métricas de rendimiento en formato de texto de Prometheus.
+
+    Si METRICAS_TOKEN está definido se exige como token Bearer; si no,
+    la vista solo está disponible con DEBUG activo.
+    """
+    token = getattr(settings, 'METRICAS_TOKEN', '')
+    if token:
+        autorizacion = request.headers.get('Authorization', '')
+        if not constant_time_compare(autorizacion, f'Bearer {token}'):
+            return HttpResponse('No autorizado', status=401, content_type='text/plain; charset=utf-8')
+    elif not settings.DEBUG:
+        raise Http404('Página no encontrada')
+    response = HttpResponse(exportar_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    patch_cache_control(response, no_store=True)
+    return response
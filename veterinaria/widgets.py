@@ -0,0 +1,45 @@
+"""
+Widgets de formulario de la aplicación veterinaria.
+"""
+from django import forms
+
+
+class SelectAutocompletar(forms.Select):
+    """
+    Select que solo renderiza la opción seleccionada. Las demás se buscan
+    con ``url`` (JSON ``{"resultados": [{"id", "texto"}]}``, ver
+    static/js/autocompletar.js), así que el formulario pesa lo mismo con
+    diez registros que con cien mil.
+
+    Debe usarse con un ModelChoiceField: la opción seleccionada se lee de
+    su queryset con una sola consulta.
+    """
+
+    class Media:
+        js = ('js/autocompletar.js',)
+
+    def __init__(self, url, attrs=None, minimo_caracteres=2):
+        self.url = url
+        self.minimo_caracteres = minimo_caracteres
+        super().__init__(attrs)
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs'].update({
+            'data-autocompletar': str(self.url),
+            'data-minimo': str(self.minimo_caracteres),
+        })
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        opciones = []
+        campo = getattr(self.choices, 'field', None)
+        if campo is not None and campo.empty_label is not None:
+            opciones.append(self.create_option(name, '', campo.empty_label, not any(value), 0))
+        ids = [valor for valor in value if str(valor).isdigit()]
+        if campo is not None and ids:
+            for indice, registro in enumerate(self.choices.queryset.filter(pk__in=ids), start=len(opciones)):
+                opciones.append(self.create_option(
+                    name, registro.pk, campo.label_from_instance(registro), True, indice,
+                ))
+        return [(None, opciones, 0)]
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 
+from .basedatos import configuracion_base_datos, replicas_base_datos
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -46,9 +48,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'veterinaria.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'veterinaria.middleware.ForceSpanishMiddleware',
+    'veterinaria.middleware.MetricasMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -80,13 +84,16 @@ WSGI_APPLICATION = 'veterinaria_sistema.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Base de datos: PostgreSQL si se define DATABASE_URL (ver basedatos.py);
+# SQLite solo sirve con un worker, porque serializa todas las escrituras.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': configuracion_base_datos(BASE_DIR / 'db.sqlite3'),
+    **replicas_base_datos(),
 }
 
+# Lecturas de las peticiones GET desde las réplicas, si hay (ver veterinaria/routers.py)
+DATABASE_ROUTERS = ['veterinaria.routers.RouterReplicas']
+
 
 # Password validation - Configuración simplificada para el proyecto
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -147,6 +154,21 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Caché (páginas y fragmentos del catálogo, ver veterinaria/cache.py)
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'veterinaria',
+    }
+}
+
+# Métricas de rendimiento (ver veterinaria/metricas.py). Con DEBUG = False
+# /metrics solo responde si se define METRICAS_TOKEN, que Prometheus envía
+# como "Authorization: Bearer <token>".
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
+
 # Crispy Forms configuration
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
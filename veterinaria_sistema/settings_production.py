@@ -2,6 +2,7 @@
 import os
 from pathlib import Path
 from .settings import *
+from .basedatos import configuracion_base_datos, replicas_base_datos
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -12,12 +13,10 @@ DEBUG = False
 # Permitir todos los hosts (configurar específicamente en producción)
 ALLOWED_HOSTS = ['*']  # Cambiar por tu dominio específico
 
-# Database para producción (puedes usar PostgreSQL en AWS RDS)
+# Database para producción: PostgreSQL (por ejemplo AWS RDS) mediante DATABASE_URL
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': configuracion_base_datos(BASE_DIR / 'db.sqlite3'),
+    **replicas_base_datos(),
 }
 
 # Configuración de archivos estáticos para producción
@@ -31,6 +30,15 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Caché compartida entre los workers de gunicorn: con la caché en memoria
+# local cada proceso tendría sus propias versiones y no vería invalidaciones.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('DJANGO_CACHE_DIR', '/tmp/veterinaria_cache'),
+    }
+}
+
 # Configuración de seguridad para producción
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
@@ -1,6 +1,8 @@
 import os
 from pathlib import Path
 
+from .basedatos import configuracion_base_datos, replicas_base_datos
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -30,9 +32,11 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Para archivos estáticos
+    'veterinaria.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'veterinaria.middleware.ForceSpanishMiddleware',
+    'veterinaria.middleware.MetricasMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -60,14 +64,15 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'veterinaria_sistema.wsgi.application'
 
-# Database
+# Database: Railway define DATABASE_URL al agregar un servicio PostgreSQL
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': configuracion_base_datos(BASE_DIR / 'db.sqlite3'),
+    **replicas_base_datos(),
 }
 
+# Lecturas de las peticiones GET desde las réplicas, si hay (ver veterinaria/routers.py)
+DATABASE_ROUTERS = ['veterinaria.routers.RouterReplicas']
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -117,6 +122,20 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Caché compartida entre los workers de gunicorn: con la caché en memoria
+# local cada proceso tendría sus propias versiones y no vería invalidaciones.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('DJANGO_CACHE_DIR', '/tmp/veterinaria_cache'),
+    }
+}
+
+# Métricas de rendimiento (ver veterinaria/metricas.py). Con DEBUG = False
+# /metrics solo responde si se define METRICAS_TOKEN, que Prometheus envía
+# como "Authorization: Bearer <token>".
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
+
 # Crispy Forms configuration
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"